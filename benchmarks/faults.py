@@ -0,0 +1,158 @@
+"""
+Детерминированные задержки и отказы для локальных заглушек.
+
+Сценарий описывается JSON-файлом (пример - benchmarks/scenarios/degraded.json):
+
+    {
+      "seed": 42,
+      "rules": [
+        {"service": "jupiter", "method": "quote",
+         "latency": {"distribution": "lognormal", "median_ms": 120, "sigma": 0.6},
+         "rate_limit_bursts": {"every": 50, "length": 5, "retry_after": 1},
+         "error_rate": 0.01},
+        {"service": "rpc", "method": "*", "latency": {"distribution": "uniform", "min_ms": 20, "max_ms": 80}}
+      ],
+      "rpc": {
+        "drop_transaction_rate": 0.05,
+        "confirm_delay_ms": {"distribution": "fixed", "value_ms": 1500},
+        "slot_lag": {"rate": 0.1, "slots": 30}
+      }
+    }
+
+Задержки и ошибки запросов решаются по номеру запроса к данному сервису и
+методу с отдельным генератором случайных чисел на каждый запрос
+(seed:service:method:номер): последовательность решений в каждом запуске
+одна и та же, но при конкурентных сессиях то, какой запрос получит какой
+номер, зависит от их чередования.
+
+Потеря и задержка подтверждения транзакции решаются по сессии (кошелек
+пользователя бенчмарка, см. StandIns.bind_session) и номеру ее собственного
+вызова sendTransaction (seed:transaction:сессия:номер), поэтому каждая
+сессия получает одинаковую судьбу своих транзакций независимо от того, как
+сессии перемешались во времени.
+"""
+import asyncio
+import json
+import random
+from collections import defaultdict
+from typing import Dict, Optional
+
+from aiohttp import web
+
+DEFAULT_SEED = 0
+
+
+def sample_ms(spec: Optional[dict], rng: random.Random) -> float:
+    """Значение из распределения задержки в миллисекундах"""
+    if not spec:
+        return 0.0
+    kind = spec.get('distribution', 'fixed')
+    if kind == 'fixed':
+        value = spec.get('value_ms', 0)
+    elif kind == 'uniform':
+        value = rng.uniform(spec.get('min_ms', 0), spec['max_ms'])
+    elif kind == 'normal':
+        value = rng.gauss(spec['mean_ms'], spec.get('stddev_ms', 0))
+    elif kind == 'lognormal':
+        # median_ms - медиана, sigma - параметр формы (чем больше, тем тяжелее хвост)
+        value = spec['median_ms'] * rng.lognormvariate(0, spec.get('sigma', 0.5))
+    elif kind == 'exponential':
+        value = rng.expovariate(1 / spec['mean_ms'])
+    else:
+        raise ValueError(f"Unknown latency distribution: {kind}")
+    return max(0.0, min(value, spec.get('max_cap_ms', float('inf'))))
+
+
+class Scenario:
+    """Набор правил задержек и отказов, загруженный из JSON"""
+    def __init__(self, data: dict):
+        self.seed = data.get('seed', DEFAULT_SEED)
+        self.rules = data.get('rules', [])
+        self.rpc = data.get('rpc', {})
+        self._counters: Dict[tuple, int] = defaultdict(int)
+
+    @classmethod
+    def load(cls, path: str) -> 'Scenario':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _rng(self, *key) -> random.Random:
+        return random.Random(':'.join(str(k) for k in (self.seed,) + key))
+
+    def _rule(self, service: str, method: str) -> Optional[dict]:
+        for rule in self.rules:
+            if rule.get('service') in (service, '*') and rule.get('method', '*') in (method, '*'):
+                return rule
+        return None
+
+    def _next_index(self, *key) -> int:
+        index = self._counters[key]
+        self._counters[key] += 1
+        return index
+
+    async def apply(self, service: str, method: str) -> Optional[web.Response]:
+        """
+        Применяет правило к запросу: ждет задержку и, если запрос попал в
+        окно 429 или в долю ошибок, возвращает готовый ответ с ошибкой
+        """
+        rule = self._rule(service, method)
+        if rule is None:
+            return None
+        index = self._next_index(service, method)
+        rng = self._rng(service, method, index)
+
+        delay = sample_ms(rule.get('latency'), rng)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        bursts = rule.get('rate_limit_bursts')
+        if bursts and index % bursts['every'] < bursts.get('length', 1):
+            return rate_limited(service, bursts.get('retry_after', 1))
+        if rng.random() < rule.get('error_rate', 0):
+            return server_error(service)
+        return None
+
+    def transaction_delay(self, session: str) -> Optional[float]:
+        """
+        Через сколько секунд после отправки очередная транзакция сессии
+        получает статус; None - транзакция потеряна. Решение зависит от сессии
+        и номера ее вызова sendTransaction, а не от подписи (подпись меняется
+        от запуска к запуску) и не от общего порядка вызовов
+        """
+        index = self._next_index('transaction', session)
+        rng = self._rng('transaction', session, index)
+        rate = self.rpc.get('drop_transaction_rate', 0)
+        if rate > 0 and rng.random() < rate:
+            return None
+        return sample_ms(self.rpc.get('confirm_delay_ms'), rng) / 1000
+
+    def slot_lag(self) -> int:
+        lag = self.rpc.get('slot_lag')
+        if not lag:
+            return 0
+        index = self._next_index('slot_lag')
+        if self._rng('slot_lag', index).random() < lag.get('rate', 1):
+            return int(lag.get('slots', 0))
+        return 0
+
+
+def rate_limited(service: str, retry_after: int) -> web.Response:
+    if service == 'telegram':
+        return web.json_response({
+            "ok": False,
+            "error_code": 429,
+            "description": f"Too Many Requests: retry after {retry_after}",
+            "parameters": {"retry_after": retry_after}
+        }, status=429)
+    if service == 'rpc':
+        return web.json_response({
+            "jsonrpc": "2.0", "id": None,
+            "error": {"code": 429, "message": "Too many requests for a specific RPC call"}
+        }, status=429, headers={"Retry-After": str(retry_after)})
+    return web.json_response({"error": "Too Many Requests"}, status=429, headers={"Retry-After": str(retry_after)})
+
+
+def server_error(service: str) -> web.Response:
+    if service == 'telegram':
+        return web.json_response({"ok": False, "error_code": 500, "description": "Internal Server Error"}, status=500)
+    return web.json_response({"error": "Service Unavailable"}, status=503)
@@ -0,0 +1,298 @@
+"""
+Микро-бенчмарки горячих участков на чистом Python: поиск символа токена,
+разбор токен-аккаунтов, перевод сумм, шифрование ключей, подпись транзакции
+свопа и сборка клавиатур.
+
+Запуск:
+    python -m benchmarks.micro                     # замер и отчет
+    python -m benchmarks.micro --save              # сохранить базовую линию
+    python -m benchmarks.micro --compare           # сравнить с базовой линией
+    python -m benchmarks.micro --filter lamports   # только подходящие по имени
+
+Базовая линия хранится в benchmarks/baselines/micro.json. При --compare
+бенчмарк считается регрессией, если его минимальное время на операцию
+выросло больше чем на --threshold (по умолчанию 10%); тогда код выхода 1.
+Сравнивать имеет смысл только замеры с одной и той же машины.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import struct
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines', 'micro.json')
+DEFAULT_THRESHOLD = 0.10
+
+# имя -> фабрика; фабрика выполняет подготовку и возвращает замеряемую функцию без аргументов
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+class SkipBenchmark(Exception):
+    """Бенчмарк нельзя выполнить в текущем окружении"""
+
+
+def bench(name: str):
+    """Регистрирует фабрику бенчмарка"""
+    def decorator(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+def _prepare_environment():
+    """Минимальное окружение, чтобы модули бота импортировались без .env"""
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456789:benchmark-token')
+    os.environ.setdefault('TRACING_ENABLED', 'false')
+    if not os.getenv('ENCRYPTION_KEY'):
+        from cryptography.fernet import Fernet
+        os.environ['ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+
+
+# --- Поиск символа токена (handlers/buy.py: process_token) ---
+
+@bench('resolve_token_symbol.exact')
+def _resolve_exact():
+    from utils import resolve_token_symbol
+    return lambda: resolve_token_symbol('bonk')
+
+
+@bench('resolve_token_symbol.partial')
+def _resolve_partial():
+    from utils import resolve_token_symbol
+    return lambda: resolve_token_symbol('JU')
+
+
+@bench('resolve_token_symbol.miss')
+def _resolve_miss():
+    from utils import resolve_token_symbol
+    return lambda: resolve_token_symbol('DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263')
+
+
+# --- Разбор ответа getTokenAccountsByOwner (SolanaService.get_wallet_tokens) ---
+
+def _token_accounts_response(count: int, mints: int) -> dict:
+    from services.spl_token_decoder import TOKEN_ACCOUNT_LAYOUT
+    import base58
+    owner = bytes(range(32))
+    value = []
+    for i in range(count):
+        mint = struct.pack('<I', i % mints) * 8
+        data = TOKEN_ACCOUNT_LAYOUT.pack(
+            mint, owner, 0 if i % 10 == 0 else 1_000_000 + i,
+            0, b'\x00' * 32, 1, 0, 0, 0, 0, b'\x00' * 32
+        )
+        value.append({
+            "pubkey": base58.b58encode(struct.pack('<I', i) * 8).decode(),
+            "account": {"data": [base64.b64encode(data).decode(), "base64"]}
+        })
+    return {"jsonrpc": "2.0", "id": 1, "result": {"value": value}}
+
+
+@bench('spl_token.parse_and_group_300')
+def _parse_token_accounts():
+    from services.spl_token_decoder import group_by_mint, parse_token_accounts
+    response = _token_accounts_response(300, 40)
+    return lambda: group_by_mint(parse_token_accounts(response))
+
+
+# --- Перевод сумм (utils.py) ---
+
+@bench('utils.to_lamports')
+def _to_lamports():
+    from utils import to_lamports
+    return lambda: to_lamports(1.23456789)
+
+
+@bench('utils.from_lamports')
+def _from_lamports():
+    from utils import from_lamports
+    return lambda: from_lamports(1_234_567_890)
+
+
+@bench('utils.format_token_amount')
+def _format_token_amount():
+    from utils import format_token_amount
+    return lambda: format_token_amount(1_234_567_890, 6)
+
+
+# --- Шифрование приватных ключей (services/utils.py) ---
+
+@bench('crypto.encrypt_private_key')
+def _encrypt():
+    from solana.keypair import Keypair
+    import base58
+    from services.utils import encrypt_private_key
+    private_key = base58.b58encode(Keypair().secret_key).decode()
+    return lambda: encrypt_private_key(private_key)
+
+
+@bench('crypto.decrypt_private_key')
+def _decrypt():
+    from solana.keypair import Keypair
+    import base58
+    from services.utils import decrypt_private_key, encrypt_private_key
+    encrypted = encrypt_private_key(base58.b58encode(Keypair().secret_key).decode())
+    return lambda: decrypt_private_key(encrypted)
+
+
+# --- Десериализация и подпись транзакции (JupiterService._send_swap_transaction) ---
+
+@bench('transaction.deserialize_sign')
+def _deserialize_sign():
+    from solana.keypair import Keypair
+    from solana.system_program import TransferParams, transfer
+    from solana.transaction import Transaction
+    wallet = Keypair()
+    tx = Transaction(fee_payer=wallet.public_key)
+    tx.recent_blockhash = '11111111111111111111111111111111'
+    tx.add(transfer(TransferParams(from_pubkey=wallet.public_key, to_pubkey=wallet.public_key, lamports=1)))
+    raw = base64.b64encode(tx.serialize(verify_signatures=False)).decode()
+
+    def run():
+        signed = Transaction.deserialize(base64.b64decode(raw))
+        signed.sign(wallet)
+        return signed.serialize()
+    return run
+
+
+# --- Сборка клавиатур (keyboards/inline.py) ---
+
+def _import_keyboards():
+    try:
+        from keyboards import inline
+    except Exception as e:
+        # Модуль тянет за собой хэндлеры и клиенты Solana/Firebase
+        raise SkipBenchmark(f"keyboards.inline import failed: {e}")
+    return inline
+
+
+@bench('keyboards.main')
+def _main_keyboard():
+    return _import_keyboards().get_main_keyboard
+
+
+@bench('keyboards.tokens_20')
+def _tokens_keyboard():
+    inline = _import_keyboards()
+    tokens = [{"symbol": f"TKN{i}", "amount": float(i), "usd": i * 1.5} for i in range(20)]
+    return lambda: inline.get_tokens_keyboard(tokens)
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    """Время одной операции в наносекундах: минимум и медиана по repeat сериям"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = [elapsed / number * 1e9 for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return {"min_ns": round(min(runs), 1), "median_ns": round(statistics.median(runs), 1), "loops": number}
+
+
+def run(names: List[str], repeat: int) -> Dict[str, dict]:
+    results = {}
+    for name in names:
+        try:
+            func = BENCHMARKS[name]()
+        except SkipBenchmark as e:
+            results[name] = {"skipped": str(e)}
+            continue
+        results[name] = measure(func, repeat)
+    return results
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, dict]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {name: r for name, r in results.items() if 'skipped' not in r}
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def _format_ns(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f} ms"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f} us"
+    return f"{value:.0f} ns"
+
+
+def report(results: Dict[str, dict], baseline: Optional[dict], threshold: float) -> List[str]:
+    """Печатает таблицу и возвращает имена регрессировавших бенчмарков"""
+    previous = (baseline or {}).get('results', {})
+    regressions = []
+    header = f"{'benchmark':<34} {'min':>11} {'median':>11} {'baseline':>11} {'change':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        if 'skipped' in r:
+            print(f"{name:<34} skipped: {r['skipped']}")
+            continue
+        base = previous.get(name)
+        if base:
+            change = r['min_ns'] / base['min_ns'] - 1
+            mark = '  REGRESSION' if change > threshold else ''
+            if mark:
+                regressions.append(name)
+            print(f"{name:<34} {_format_ns(r['min_ns']):>11} {_format_ns(r['median_ns']):>11} "
+                  f"{_format_ns(base['min_ns']):>11} {change:>+7.1%}{mark}")
+        else:
+            print(f"{name:<34} {_format_ns(r['min_ns']):>11} {_format_ns(r['median_ns']):>11} {'-':>11} {'-':>8}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for hot pure-Python paths")
+    parser.add_argument('--filter', default='', help="run only benchmarks whose name contains this substring")
+    parser.add_argument('--repeat', type=int, default=5, help="timing series per benchmark")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="store results as the new baseline")
+    parser.add_argument('--compare', action='store_true', help="exit with code 1 on regressions against the baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of min time per op (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    _prepare_environment()
+    # Логи горячих функций не должны попадать в вывод замеров
+    from loguru import logger
+    logger.remove()
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if not names:
+        print(f"No benchmarks match {args.filter!r}", file=sys.stderr)
+        return 2
+    results = run(names, args.repeat)
+    baseline = load_baseline(args.baseline)
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+    if args.compare:
+        if baseline is None:
+            print(f"\nNo baseline at {args.baseline}: run with --save first", file=sys.stderr)
+            return 2
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
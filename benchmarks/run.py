@@ -0,0 +1,188 @@
+"""
+Офлайн-бенчмарк бота: воспроизводит сценарии пользователей против локальных
+заглушек Jupiter, CoinGecko, Solana RPC и Telegram Bot API.
+
+Хранилище пользователей - эмулятор Firestore (FIRESTORE_EMULATOR_HOST),
+например: gcloud emulators firestore start --host-port=localhost:8085
+
+Запуск:
+    FIRESTORE_EMULATOR_HOST=localhost:8085 python -m benchmarks.run --users 50 --concurrency 20
+    FIRESTORE_EMULATOR_HOST=localhost:8085 python -m benchmarks.run --scenario benchmarks/scenarios/degraded.json
+
+Для каждого сценария выводятся пропускная способность (апдейтов в секунду),
+p50/p99 времени обработки апдейта и число внешних запросов на апдейт.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.faults import Scenario
+from benchmarks.sessions import SESSIONS, build_update
+from benchmarks.standins import StandIns
+
+BENCH_USER_ID_BASE = 7_000_000_000
+# Сколько ждать отправки исходящих сообщений фазы, секунды
+DRAIN_TIMEOUT = 120
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def prepare_environment(standins: StandIns):
+    """Направляет бота на заглушки; вызывается до импорта модулей бота"""
+    os.environ.update(standins.env())
+    os.environ['TELEGRAM_BOT_TOKEN'] = '123456789:benchmark-token'
+    os.environ['OPS_HTTP_PORT'] = '0'
+    os.environ.setdefault('TRACING_ENABLED', 'false')
+    if not os.getenv('ENCRYPTION_KEY'):
+        from cryptography.fernet import Fernet
+        os.environ['ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+
+
+async def run_session(dp, bot, user_id: int, steps, latencies: List[float], errors: Counter,
+                      bind: Callable[[int], Awaitable[bool]]):
+    bound = False
+    for step in steps:
+        update = build_update(user_id, step)
+        started = time.perf_counter()
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+        if not bound:
+            # Кошелек появляется после /start; до первой транзакции связываем его с сессией
+            bound = await bind(user_id)
+
+
+async def run_phase(dp, bot, standins: StandIns, name: str, users: int, concurrency: int) -> dict:
+    steps = SESSIONS[name]
+    latencies: List[float] = []
+    errors: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    from services.firebase_service import FirebaseService
+    from services.registry import service_registry
+    from services.telegram_sender import telegram_sender
+    firebase = service_registry.get(FirebaseService)
+
+    async def bind(user_id: int) -> bool:
+        """Судьба транзакций пользователя решается по его сессии (см. benchmarks/faults.py)"""
+        wallet = await firebase.get_user_wallet(user_id)
+        if not wallet or not wallet.get('public_key'):
+            return False
+        standins.bind_session(wallet['public_key'], f"{name}:{user_id}")
+        return True
+
+    async def user_task(index: int):
+        async with semaphore:
+            await run_session(dp, bot, BENCH_USER_ID_BASE + index, steps, latencies, errors, bind)
+
+    calls_before = standins.snapshot()
+    started = time.perf_counter()
+    await asyncio.gather(*(user_task(i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+    # Ответы из очереди telegram_sender уходят после обработки апдейтов:
+    # дожидаемся их, чтобы запросы к Bot API попали в счетчики своей фазы
+    drain_started = time.perf_counter()
+    drained = await telegram_sender.drain(DRAIN_TIMEOUT)
+    drain_elapsed = time.perf_counter() - drain_started
+    calls = standins.snapshot() - calls_before
+
+    updates = len(latencies)
+    by_service: Dict[str, int] = defaultdict(int)
+    for (service, _), count in calls.items():
+        by_service[service] += count
+    return {
+        "session": name,
+        "users": users,
+        "updates": updates,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ups": round(updates / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+        "drain_s": round(drain_elapsed, 3),
+        "unsent_messages": 0 if drained else telegram_sender.pending,
+        "outbound_per_update": {s: round(c / updates, 2) for s, c in sorted(by_service.items())} if updates else {},
+        "outbound_calls": {f"{s}.{m}": c for (s, m), c in sorted(calls.items())},
+        "errors": dict(errors)
+    }
+
+
+def print_report(results: List[dict]):
+    header = f"{'session':<10} {'updates':>8} {'upd/s':>8} {'p50 ms':>9} {'p99 ms':>9}  outbound per update"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        outbound = ', '.join(f"{s}={c}" for s, c in r['outbound_per_update'].items())
+        print(f"{r['session']:<10} {r['updates']:>8} {r['throughput_ups']:>8} {r['p50_ms']:>9} {r['p99_ms']:>9}  {outbound}")
+        if r['errors']:
+            print(f"{'':<10} errors: {r['errors']}")
+        if r['unsent_messages']:
+            print(f"{'':<10} unsent messages after {DRAIN_TIMEOUT}s: {r['unsent_messages']}")
+
+
+async def main(args) -> List[dict]:
+    if not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        print("FIRESTORE_EMULATOR_HOST is not set: start the Firestore emulator first", file=sys.stderr)
+        sys.exit(2)
+
+    scenario = Scenario.load(args.scenario) if args.scenario else None
+    standins = StandIns(scenario=scenario)
+    await standins.start()
+    prepare_environment(standins)
+
+    # Модули бота читают конфигурацию при импорте - импортируем после настройки окружения
+    import main as bot_main
+    from loguru import logger
+    from services.telegram_sender import telegram_sender
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    results = []
+    await telegram_sender.start(bot_main.bot)
+    try:
+        for name in args.sessions:
+            results.append(await run_phase(bot_main.dp, bot_main.bot, standins, name, args.users, args.concurrency))
+    finally:
+        await telegram_sender.stop()
+        await bot_main.bot.session.close()
+        await standins.stop()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark against local stand-ins")
+    parser.add_argument('--users', type=int, default=20, help="simulated users per session type")
+    parser.add_argument('--concurrency', type=int, default=10, help="users running at the same time")
+    parser.add_argument('--sessions', type=lambda s: s.split(','), default=list(SESSIONS),
+                        help=f"comma separated: {','.join(SESSIONS)}")
+    parser.add_argument('--scenario', help="JSON file with latency/fault injection rules (see benchmarks/faults.py)")
+    parser.add_argument('--json', dest='json_path', help="write results to this file")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.sessions if s not in SESSIONS]
+    if unknown:
+        parser.error(f"unknown sessions: {unknown}")
+    return args
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    report = asyncio.run(main(arguments))
+    print_report(report)
+    if arguments.json_path:
+        with open(arguments.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
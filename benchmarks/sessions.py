@@ -0,0 +1,86 @@
+"""
+Сценарии пользовательских сессий для бенчмарков.
+
+Сессия - список шагов ("message", текст) или ("callback", данные кнопки),
+которые превращаются в сырые апдейты Telegram и подаются в диспетчер.
+"""
+import itertools
+import time
+from typing import Dict, List, Tuple
+
+BONK_MINT = 'DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263'
+# Адрес получателя для вывода (любой валидный публичный ключ)
+WITHDRAW_ADDRESS = '9WzDXwBbmkg8ZTbNMqUxvQRAyrZzDsGYdLVL9zYtAWWM'
+
+Step = Tuple[str, str]
+
+SESSIONS: Dict[str, List[Step]] = {
+    "balance": [
+        ("message", "/start"),
+        ("callback", "balance"),
+        ("callback", "refresh"),
+        ("message", "/balance"),
+    ],
+    "buy": [
+        ("message", "/start"),
+        ("message", "/buy"),
+        ("message", "BONK"),
+        ("callback", f"buy_0.1_{BONK_MINT}"),
+    ],
+    "sell": [
+        ("message", "/start"),
+        ("callback", "sell"),
+        ("callback", "sell_token_USDC"),
+        ("callback", "sell_percent_25_USDC"),
+    ],
+    "withdraw": [
+        ("message", "/start"),
+        ("message", "/withdraw"),
+        ("callback", "withdraw_token:SOL"),
+        ("message", WITHDRAW_ADDRESS),
+        ("message", "0.01"),
+        ("callback", "withdraw_confirm"),
+    ],
+}
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1_000_000)
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"bench{user_id}", "language_code": "ru"}
+
+
+def _message(user_id: int, text: str) -> dict:
+    return {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+        "text": text
+    }
+
+
+def build_update(user_id: int, step: Step) -> dict:
+    """Собирает сырой апдейт Telegram для шага сессии"""
+    kind, payload = step
+    update = {"update_id": next(_update_ids)}
+    if kind == "message":
+        message = _message(user_id, payload)
+        if payload.startswith('/'):
+            command = payload.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        update["message"] = message
+    elif kind == "callback":
+        message = _message(user_id, "menu")
+        message["from"] = {"id": 1, "is_bot": True, "first_name": "bench"}
+        update["callback_query"] = {
+            "id": str(update["update_id"]),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "message": message,
+            "data": payload
+        }
+    else:
+        raise ValueError(f"Unknown step kind: {kind}")
+    return update
@@ -0,0 +1,379 @@
+"""
+Локальные заглушки внешних сервисов для бенчмарков:
+Jupiter (quote/swap/tokens/price), CoinGecko, Solana JSON-RPC и Telegram Bot API.
+
+Каждая заглушка - aiohttp-приложение на свободном порту 127.0.0.1. Ответы
+имеют ту же форму, что и у настоящих API, поэтому бот работает с ними без
+изменений (адреса подставляются через переменные окружения). Все запросы
+считаются по сервисам и методам.
+"""
+import base64
+import hashlib
+import itertools
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+import base58
+from aiohttp import web
+from solana.publickey import PublicKey
+from solana.system_program import TransferParams, transfer
+from solana.transaction import Transaction
+
+from benchmarks.faults import DEFAULT_SEED, Scenario
+from services.spl_token_decoder import TOKEN_ACCOUNT_LAYOUT, TOKEN_PROGRAM_ID
+
+SOL_MINT = 'So11111111111111111111111111111111111111112'
+
+# Цены и decimals токенов, которые знает заглушка
+TOKENS = {
+    SOL_MINT: {"symbol": "SOL", "decimals": 9, "price": 150.0},
+    'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v': {"symbol": "USDC", "decimals": 6, "price": 1.0},
+    'Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB': {"symbol": "USDT", "decimals": 6, "price": 1.0},
+    'DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263': {"symbol": "BONK", "decimals": 5, "price": 0.00002},
+    '4k3Dyjzvzp8eMZWUXbBCjEvwSkkk59S5iCNLY3QrkX6R': {"symbol": "RAY", "decimals": 6, "price": 2.0},
+}
+
+# Балансы каждого кошелька: 5 SOL и немного токенов
+WALLET_LAMPORTS = 5 * 10 ** 9
+WALLET_TOKENS = {
+    'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v': 250 * 10 ** 6,
+    'DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263': 10_000_000 * 10 ** 5,
+}
+
+
+def fee_payer(raw: bytes) -> str:
+    """Плательщик комиссии (первый ключ сообщения) сериализованной транзакции"""
+    # compact-u16 числа подписей (< 128 - один байт), подписи по 64 байта
+    offset = 1 + raw[0] * 64
+    if raw[offset] & 0x80:
+        # Версионированное сообщение: байт версии перед заголовком
+        offset += 1
+    # Заголовок (3 байта) и compact-u16 числа ключей (< 128 - один байт)
+    offset += 4
+    return base58.b58encode(raw[offset:offset + 32]).decode()
+
+
+class StandIns:
+    """Запускает и останавливает все заглушки, хранит счетчики запросов"""
+    def __init__(self, host: str = '127.0.0.1', scenario: Optional[Scenario] = None):
+        self.host = host
+        self.scenario = scenario
+        # Отправленные транзакции: подпись -> время, когда у нее появится статус (None - потеряна)
+        self._transactions: Dict[str, Optional[float]] = {}
+        # Кошелек -> сессия бенчмарка (ключ решений о потере транзакций)
+        self._sessions: Dict[str, str] = {}
+        self.calls: Counter = Counter()
+        self.slot = 250_000_000
+        self._message_ids = itertools.count(1)
+        self._runners = []
+        self.urls: Dict[str, str] = {}
+        # Постоянный blockhash от seed сценария - одинаковые транзакции в каждом запуске
+        seed = scenario.seed if scenario else DEFAULT_SEED
+        self._blockhash = base58.b58encode(hashlib.sha256(f'{seed}:blockhash'.encode()).digest()).decode()
+
+    async def start(self) -> Dict[str, str]:
+        """Запускает заглушки и возвращает их базовые URL"""
+        apps = {
+            'jupiter': self._jupiter_app(),
+            'coingecko': self._coingecko_app(),
+            'rpc': self._rpc_app(),
+            'telegram': self._telegram_app(),
+        }
+        for name, app in apps.items():
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, self.host, 0)
+            await site.start()
+            port = runner.addresses[-1][1]
+            self._runners.append(runner)
+            self.urls[name] = f'http://{self.host}:{port}'
+        return self.urls
+
+    async def stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners.clear()
+
+    def env(self) -> Dict[str, str]:
+        """Переменные окружения, направляющие бота на заглушки"""
+        return {
+            'SOLANA_RPC_URL': self.urls['rpc'],
+            'JUPITER_API_URL': self.urls['jupiter'] + '/',
+            'JUPITER_PRICE_API_URL': self.urls['jupiter'] + '/price',
+            'COINGECKO_API_URL': self.urls['coingecko'],
+            'TELEGRAM_API_URL': self.urls['telegram'],
+        }
+
+    def snapshot(self) -> Counter:
+        return Counter(self.calls)
+
+    def bind_session(self, public_key: str, session: str):
+        """Связывает кошелек с сессией: транзакции с этим плательщиком комиссии считаются ее транзакциями"""
+        self._sessions[public_key] = session
+
+    async def before_request(self, service: str, method: str) -> Optional[web.Response]:
+        """Учитывает запрос и применяет задержки/отказы сценария (ответ с ошибкой или None)"""
+        self.calls[(service, method)] += 1
+        if self.scenario is None:
+            return None
+        response = await self.scenario.apply(service, method)
+        if response is not None:
+            self.calls[(service, f'{method}:{response.status}')] += 1
+        return response
+
+    # ---------- Jupiter ----------
+
+    def _jupiter_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/quote', self._jupiter_quote)
+        app.router.add_post('/swap', self._jupiter_swap)
+        app.router.add_get('/tokens', self._jupiter_tokens)
+        app.router.add_get('/price', self._jupiter_price)
+        return app
+
+    async def _jupiter_quote(self, request: web.Request) -> web.Response:
+        early = await self.before_request('jupiter', 'quote')
+        if early is not None:
+            return early
+        params = request.query
+        input_mint, output_mint = params['inputMint'], params['outputMint']
+        amount = int(params['amount'])
+        source, target = TOKENS.get(input_mint), TOKENS.get(output_mint)
+        if source is None or target is None:
+            return web.json_response({"error": "Could not find any route"}, status=400)
+        usd = amount / 10 ** source['decimals'] * source['price']
+        out_amount = int(usd / target['price'] * 10 ** target['decimals'])
+        fee_bps = int(params.get('platformFeeBps') or 0)
+        fee = out_amount * fee_bps // 10_000
+        return web.json_response({
+            "inputMint": input_mint,
+            "inAmount": str(amount),
+            "outputMint": output_mint,
+            "outAmount": str(out_amount - fee),
+            "otherAmountThreshold": str(out_amount - fee),
+            "swapMode": "ExactIn",
+            "slippageBps": int(params.get('slippageBps') or 50),
+            "platformFee": {"amount": str(fee), "feeBps": fee_bps},
+            "priceImpactPct": "0",
+            "routePlan": [],
+            "contextSlot": self.slot,
+            "timeTaken": 0.001
+        })
+
+    async def _jupiter_swap(self, request: web.Request) -> web.Response:
+        early = await self.before_request('jupiter', 'swap')
+        if early is not None:
+            return early
+        body = await request.json()
+        user = PublicKey(body['userPublicKey'])
+        # Простая legacy-транзакция с плательщиком комиссии = пользователь, чтобы бот мог ее подписать
+        tx = Transaction(fee_payer=user)
+        tx.recent_blockhash = self._blockhash
+        tx.add(transfer(TransferParams(from_pubkey=user, to_pubkey=user, lamports=1)))
+        raw = tx.serialize(verify_signatures=False)
+        return web.json_response({
+            "swapTransaction": base64.b64encode(raw).decode(),
+            "lastValidBlockHeight": self.slot + 150
+        })
+
+    async def _jupiter_tokens(self, request: web.Request) -> web.Response:
+        early = await self.before_request('jupiter', 'tokens')
+        if early is not None:
+            return early
+        return web.json_response(list(TOKENS))
+
+    async def _jupiter_price(self, request: web.Request) -> web.Response:
+        early = await self.before_request('jupiter', 'price')
+        if early is not None:
+            return early
+        ids = [i for i in request.query.get('ids', '').split(',') if i]
+        data = {mint: {"id": mint, "type": "derivedPrice", "price": str(TOKENS[mint]['price'])}
+                for mint in ids if mint in TOKENS}
+        return web.json_response({"data": data, "timeTaken": 0.001})
+
+    # ---------- CoinGecko ----------
+
+    def _coingecko_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/simple/price', self._coingecko_price)
+        app.router.add_get('/simple/token_price/solana', self._coingecko_token_price)
+        return app
+
+    async def _coingecko_price(self, request: web.Request) -> web.Response:
+        early = await self.before_request('coingecko', 'simple_price')
+        if early is not None:
+            return early
+        return web.json_response({"solana": {"usd": TOKENS[SOL_MINT]['price']}})
+
+    async def _coingecko_token_price(self, request: web.Request) -> web.Response:
+        early = await self.before_request('coingecko', 'token_price')
+        if early is not None:
+            return early
+        addresses = request.query.get('contract_addresses', '').split(',')
+        return web.json_response({
+            mint.lower(): {"usd": TOKENS[mint]['price']} for mint in addresses if mint in TOKENS
+        })
+
+    # ---------- Solana JSON-RPC ----------
+
+    def _rpc_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/', self._rpc)
+        return app
+
+    async def _rpc(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if isinstance(body, list):
+            responses = [await self._rpc_call(item) for item in body]
+            if any(isinstance(r, web.Response) for r in responses):
+                return next(r for r in responses if isinstance(r, web.Response))
+            return web.json_response(responses)
+        response = await self._rpc_call(body)
+        if isinstance(response, web.Response):
+            return response
+        return web.json_response(response)
+
+    async def _rpc_call(self, body: dict):
+        method = body.get('method')
+        early = await self.before_request('rpc', method)
+        if early is not None:
+            return early
+        self.slot += 1
+        params = body.get('params') or []
+        handler = getattr(self, f'_rpc_{method}', None)
+        if handler is None:
+            return {"jsonrpc": "2.0", "id": body.get('id'),
+                    "error": {"code": -32601, "message": f"Method not found: {method}"}}
+        return {"jsonrpc": "2.0", "id": body.get('id'), "result": handler(params)}
+
+    def _observed_slot(self) -> int:
+        # Отставание узла RPC от сети
+        return self.slot - (self.scenario.slot_lag() if self.scenario else 0)
+
+    def _context(self, value):
+        return {"context": {"slot": self._observed_slot(), "apiVersion": "1.18.0"}, "value": value}
+
+    def _token_amount(self, amount: int, decimals: int) -> dict:
+        ui = amount / 10 ** decimals
+        return {"amount": str(amount), "decimals": decimals, "uiAmount": ui, "uiAmountString": str(ui)}
+
+    def _rpc_getBalance(self, params):
+        return self._context(WALLET_LAMPORTS)
+
+    def _rpc_getSlot(self, params):
+        return self._observed_slot()
+
+    def _rpc_getHealth(self, params):
+        return "ok"
+
+    def _rpc_getLatestBlockhash(self, params):
+        return self._context({"blockhash": self._blockhash, "lastValidBlockHeight": self.slot + 150})
+
+    def _rpc_getMinimumBalanceForRentExemption(self, params):
+        return 2039280
+
+    def _rpc_getFeeForMessage(self, params):
+        return self._context(5000)
+
+    def _rpc_getTokenSupply(self, params):
+        token = TOKENS.get(params[0], {"decimals": 9})
+        return self._context(self._token_amount(10 ** 15, token['decimals']))
+
+    def _rpc_getTokenAccountBalance(self, params):
+        # Адрес токен-аккаунта не связан с mint - отдаем баланс USDC
+        return self._context(self._token_amount(WALLET_TOKENS['EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v'], 6))
+
+    def _rpc_getAccountInfo(self, params):
+        return self._context({
+            "data": ["", "base64"],
+            "executable": False,
+            "lamports": WALLET_LAMPORTS,
+            "owner": "11111111111111111111111111111111",
+            "rentEpoch": 0,
+            "space": 0
+        })
+
+    def _rpc_getTokenAccountsByOwner(self, params):
+        owner, filters = params[0], params[1]
+        if filters.get('programId') != TOKEN_PROGRAM_ID:
+            return self._context([])
+        owner_bytes = base58.b58decode(owner)
+        accounts = []
+        for index, (mint, amount) in enumerate(WALLET_TOKENS.items()):
+            data = TOKEN_ACCOUNT_LAYOUT.pack(
+                base58.b58decode(mint), owner_bytes, amount,
+                0, bytes(32), 1, 0, 0, 0, 0, bytes(32)
+            )
+            accounts.append({
+                "pubkey": base58.b58encode(bytes([index + 1]) * 32).decode(),
+                "account": {
+                    "data": [base64.b64encode(data).decode(), "base64"],
+                    "executable": False,
+                    "lamports": 2039280,
+                    "owner": TOKEN_PROGRAM_ID,
+                    "rentEpoch": 0,
+                    "space": len(data)
+                }
+            })
+        return self._context(accounts)
+
+    def _rpc_sendTransaction(self, params):
+        raw = base64.b64decode(params[0])
+        # Первый байт - количество подписей (compact-u16), затем 64-байтные подписи
+        signature = base58.b58encode(raw[1:65]).decode()
+        if self.scenario is None:
+            self._transactions[signature] = 0.0
+            return signature
+        payer = fee_payer(raw)
+        delay = self.scenario.transaction_delay(self._sessions.get(payer, payer))
+        self._transactions[signature] = None if delay is None else time.monotonic() + delay
+        return signature
+
+    def _rpc_getSignatureStatuses(self, params):
+        now = time.monotonic()
+        statuses = []
+        for signature in params[0]:
+            # Неизвестные подписи считаем подтвержденными (транзакции, отправленные не через заглушку)
+            ready_at = self._transactions.get(signature, 0.0)
+            if ready_at is None or ready_at > now:
+                statuses.append(None)
+                continue
+            statuses.append({
+                "slot": self.slot - 1,
+                "confirmations": None,
+                "err": None,
+                "status": {"Ok": None},
+                "confirmationStatus": "confirmed"
+            })
+        return self._context(statuses)
+
+    # ---------- Telegram Bot API ----------
+
+    def _telegram_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._telegram)
+        return app
+
+    async def _telegram(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        early = await self.before_request('telegram', method)
+        if early is not None:
+            return early
+        if request.content_type == 'application/json':
+            data = await request.json()
+        else:
+            data = dict(await request.post())
+        if method in ('sendMessage', 'editMessageText', 'editMessageReplyMarkup'):
+            chat_id = int(data.get('chat_id') or 0)
+            result = {
+                "message_id": int(data.get('message_id') or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get('text', '')
+            }
+        elif method == 'getMe':
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
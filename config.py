@@ -6,6 +6,7 @@ load_dotenv()
 # Bot settings
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 ADMIN_IDS = [int(id) for id in os.getenv('ADMIN_IDS', '').split(',') if id]
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')  # свой Bot API сервер (или локальная заглушка для бенчмарков)
 
 # Solana settings
 SOLANA_RPC_URL = os.getenv('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
@@ -33,8 +34,92 @@ JUPITER_API_KEY = os.getenv('JUPITER_API_KEY', 'QN_e7a3914f4cb94a8bb5cbf7ca29314
 JUPITER_PLATFORM_FEE_BPS = 90  # 0.9%
 JUPITER_PLATFORM_FEE_ACCOUNT = 'CSBQ7WT45JS8nrn9nXi2K4FVmpxd2Bq7BDT1x3ECi5p4'
 
+# Price feed settings
+SOL_MINT = 'So11111111111111111111111111111111111111112'
+USDC_MINT = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v'
+COINGECKO_API_URL = os.getenv('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')
+PRICE_FEED_INTERVAL = float(os.getenv('PRICE_FEED_INTERVAL', '30'))  # секунды между обновлениями SOL/USD
+PRICE_FEED_MAX_AGE = float(os.getenv('PRICE_FEED_MAX_AGE', '300'))  # после этого цена считается устаревшей
+JUPITER_PRICE_API_URL = os.getenv('JUPITER_PRICE_API_URL') or f'{JUPITER_API_URL}price'
+TOKEN_PRICE_CACHE_TTL = float(os.getenv('TOKEN_PRICE_CACHE_TTL', '60'))  # TTL общего кэша цен токенов, секунды
+
+# Portfolio settings
+PORTFOLIO_MAX_AGE = float(os.getenv('PORTFOLIO_MAX_AGE', '60'))  # через сколько секунд снимок балансов перечитывается из сети
+PORTFOLIO_SETTLE_DELAY = float(os.getenv('PORTFOLIO_SETTLE_DELAY', '15'))  # сверка с сетью после сделки, секунды
+PORTFOLIO_MAX_USERS = int(os.getenv('PORTFOLIO_MAX_USERS', '10000'))  # сколько снимков держать в памяти
+
+# Account subscription settings (websocket)
+SUBSCRIPTION_IDLE_TIMEOUT = float(os.getenv('SUBSCRIPTION_IDLE_TIMEOUT', '600'))  # отписка после бездействия пользователя, секунды
+SUBSCRIPTION_MAX_USERS = int(os.getenv('SUBSCRIPTION_MAX_USERS', '500'))  # максимум одновременно отслеживаемых кошельков
+
+# Ops HTTP server settings (метрики)
+OPS_HTTP_HOST = os.getenv('OPS_HTTP_HOST', '0.0.0.0')
+OPS_HTTP_PORT = int(os.getenv('OPS_HTTP_PORT', '9100'))  # 0 - не запускать сервер
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '30'))  # период проверок готовности, секунды
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '5'))
+HEALTH_MAX_LOOP_LAG = float(os.getenv('HEALTH_MAX_LOOP_LAG', '1.0'))  # допустимая задержка event loop, секунды
+HEALTH_SLOT_STALE_AFTER = float(os.getenv('HEALTH_SLOT_STALE_AFTER', '60'))  # слот RPC не растет дольше - не готов
+
+# Event loop monitor settings
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.1'))  # период heartbeat, секунды
+LOOP_SLOW_CALLBACK_THRESHOLD = float(os.getenv('LOOP_SLOW_CALLBACK_THRESHOLD', '0.1'))  # блокировка дольше - в лог и метрики
+
+# Profiler settings (/profile N для ADMIN_IDS, SIGUSR2)
+PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', '0.005'))  # период семплирования, секунды
+PROFILER_DEFAULT_SECONDS = float(os.getenv('PROFILER_DEFAULT_SECONDS', '30'))
+PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', '300'))
+PROFILER_DIR = os.getenv('PROFILER_DIR', 'logs/profiles')
+
+# Order settings (лимитные и стоп-ордера, /order и /orders)
+PRICE_STREAM_INTERVAL = float(os.getenv('PRICE_STREAM_INTERVAL', '10'))  # период общего опроса цен отслеживаемых токенов, секунды
+ORDER_EXECUTION_CONCURRENCY = int(os.getenv('ORDER_EXECUTION_CONCURRENCY', '4'))  # одновременно исполняемых ордеров
+ORDERS_MAX_PER_USER = int(os.getenv('ORDERS_MAX_PER_USER', '20'))
+
+# DCA settings (регулярные покупки, /dca)
+DCA_TICK_INTERVAL = float(os.getenv('DCA_TICK_INTERVAL', '5'))  # период проверки расписания, секунды
+DCA_JITTER = float(os.getenv('DCA_JITTER', '60'))  # случайная задержка запуска до N секунд
+DCA_MIN_INTERVAL = float(os.getenv('DCA_MIN_INTERVAL', '300'))  # минимальный период покупок, секунды
+DCA_EXECUTION_CONCURRENCY = int(os.getenv('DCA_EXECUTION_CONCURRENCY', '4'))  # одновременных свопов
+DCA_MAX_PER_USER = int(os.getenv('DCA_MAX_PER_USER', '10'))
+DCA_MAX_FAILURES = int(os.getenv('DCA_MAX_FAILURES', '3'))  # ошибок подряд до остановки плана
+DCA_MAX_PRICE_IMPACT = float(os.getenv('DCA_MAX_PRICE_IMPACT', '5'))  # проценты; выше - покупки тика пропускаются
+DCA_SLIPPAGE = float(os.getenv('DCA_SLIPPAGE', '1.0'))
+
+# Price alert settings (/alert, /alerts)
+ALERTS_MAX_PER_USER = int(os.getenv('ALERTS_MAX_PER_USER', '50'))
+
+# Telegram send queue settings (исходящие сообщения через services/telegram_sender.py)
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))  # сообщений в секунду на бота (лимит Bot API ~30)
+TELEGRAM_GLOBAL_BURST = float(os.getenv('TELEGRAM_GLOBAL_BURST', '25'))  # емкость общей корзины
+TELEGRAM_PER_CHAT_INTERVAL = float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', '1.0'))  # секунд между сообщениями в один чат
+TELEGRAM_PER_CHAT_BURST = float(os.getenv('TELEGRAM_PER_CHAT_BURST', '3'))  # короткая серия в один чат без ожидания
+TELEGRAM_SEND_QUEUE_SIZE = int(os.getenv('TELEGRAM_SEND_QUEUE_SIZE', '100000'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))  # повторов после RetryAfter
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv('TELEGRAM_SEND_CONCURRENCY', '32'))  # одновременных запросов к Bot API
+
+# Broadcast settings (/broadcast для ADMIN_IDS)
+BROADCAST_PAGE_SIZE = int(os.getenv('BROADCAST_PAGE_SIZE', '200'))  # пользователей на страницу (и контрольную точку)
+
+# Batch sell settings (продажа всех или выбранных токенов одной операцией)
+BATCH_SELL_CONCURRENCY = int(os.getenv('BATCH_SELL_CONCURRENCY', '5'))  # одновременных запросов котировок и транзакций Jupiter
+BATCH_SELL_CONFIRM_INTERVAL = float(os.getenv('BATCH_SELL_CONFIRM_INTERVAL', '2'))  # период опроса статусов всех подписей, секунды
+BATCH_SELL_CONFIRM_TIMEOUT = float(os.getenv('BATCH_SELL_CONFIRM_TIMEOUT', '60'))  # после - транзакция считается неподтвержденной
+
+# Tracing settings
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TRACE_SAMPLE_RATIO = float(os.getenv('TRACE_SAMPLE_RATIO', '1.0'))  # доля апдейтов, чьи трассы экспортируются
+TRACE_EXPORT_FILE = os.getenv('TRACE_EXPORT_FILE', '')  # например logs/traces.jsonl; пусто - не писать в файл
+TRACE_EXPORT_MAX_BYTES = int(os.getenv('TRACE_EXPORT_MAX_BYTES', str(100 * 1024 * 1024)))  # размер файла трасс до ротации
+TRACE_EXPORT_BACKUPS = int(os.getenv('TRACE_EXPORT_BACKUPS', '3'))  # сколько ротированных файлов хранить
+TRACE_OTLP_ENDPOINT = os.getenv('TRACE_OTLP_ENDPOINT', '')  # например http://otel-collector:4318/v1/traces
+
 # Helius API settings
 HELIUS_API_KEY = os.getenv('HELIUS_API_KEY', '38cd5b26-9e90-4be9-bde3-a0139463ec0c')
 
 # Logging settings
-LOG_FILE = 'logs/transactions.log' 
\ No newline at end of file
+LOG_FILE = 'logs/transactions.log'
+APP_LOG_FILE = os.getenv('APP_LOG_FILE', 'logs/bot.log')  # журнал приложения (без журнала транзакций)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')  # уровни подсистем: aiogram=WARNING,services.jupiter_service=INFO
+LOG_JSON = os.getenv('LOG_JSON', 'false').lower() in ('1', 'true', 'yes')  # файловые логи в JSON (по строке на запись)
+LOG_DEBUG_SAMPLE_EVERY = max(1, int(os.getenv('LOG_DEBUG_SAMPLE_EVERY', '100')))  # из частых debug-событий пишется каждое N-е
@@ -1,172 +1,213 @@
+import argparse
 import asyncio
+import json
 import os
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from cryptography.fernet import InvalidToken
 from loguru import logger
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения из .env
 load_dotenv()
 
+from services.utils import KeyRing, get_encryption_keys, is_plaintext_key
+
 # Проверяем ключ шифрования
-if not os.getenv("ENCRYPTION_KEY"):
+if not get_encryption_keys():
     logger.error("ENCRYPTION_KEY не найден в переменных окружения.")
-    print("Ошибка: ENCRYPTION_KEY отсутствует в .env файле. Добавьте этот ключ для шифрования.")
+    print("Ошибка: ENCRYPTION_KEY (или ENCRYPTION_KEYS) отсутствует в .env файле. Добавьте этот ключ для шифрования.")
     sys.exit(1)
 
 from services.firebase_service import FirebaseService
-from services.utils import encrypt_private_key
 
-async def encrypt_user_private_key(user_id: int):
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_CHECKPOINT = 'logs/encrypt_keys.checkpoint.json'
+
+# Результаты обработки ключа
+CURRENT = 'current'      # уже зашифрован текущим ключом (запись с его меткой)
+ROTATED = 'rotated'      # был зашифрован старым ключом или без метки, перешифрован текущим
+ENCRYPTED = 'encrypted'  # был в открытом виде, зашифрован
+INVALID = 'invalid'      # не расшифровывается ни одним ключом и не похож на ключ base58
+
+# Шифр процесса-обработчика (создается один раз в initializer пула)
+_cipher: Optional[KeyRing] = None
+
+
+def _init_worker(keys: Sequence[str]):
+    """keys[0] - текущий ключ, остальные - старые ключи для ротации"""
+    global _cipher
+    _cipher = KeyRing(keys)
+
+
+def migrate_key(private_key: str) -> Tuple[str, Optional[str]]:
+    """
+    Приводит приватный ключ к шифрованию текущим ключом
+
+    Returns:
+        Tuple[str, Optional[str]]: (результат, новое значение или None, если запись не нужна)
+    """
+    if _cipher.is_current(private_key):
+        return CURRENT, None
+    try:
+        return ROTATED, _cipher.encrypt(_cipher.decrypt(private_key))
+    except InvalidToken:
+        pass
+    if is_plaintext_key(private_key):
+        return ENCRYPTED, _cipher.encrypt(private_key)
+    return INVALID, None
+
+
+def _migrate_chunk(items: List[Tuple[str, str]]) -> List[Tuple[str, str, Optional[str]]]:
+    """Обработка части страницы в процессе пула: [(user_id, результат, новое значение)]"""
+    return [(user_id, *migrate_key(private_key)) for user_id, private_key in items]
+
+
+def _load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_checkpoint(path: str, state: dict):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def encrypt_user_private_key(user_id: int, keys: Sequence[str]) -> bool:
     """
-    Шифрует приватный ключ пользователя, если он еще не зашифрован
-    
+    Шифрует (или перешифровывает текущим ключом) приватный ключ одного пользователя
+
     Args:
         user_id: ID пользователя
+        keys: Текущий ключ и старые ключи для ротации
     """
     firebase = FirebaseService()
-    
-    # Получаем данные кошелька
     wallet_data = await firebase.get_user_wallet(user_id)
-    
-    if not wallet_data:
-        logger.error(f"Кошелек пользователя {user_id} не найден")
+    if not wallet_data or not wallet_data.get('private_key'):
+        logger.error(f"Кошелек или приватный ключ пользователя {user_id} не найден")
         print(f"Ошибка: Кошелек пользователя {user_id} не найден в базе данных")
         return False
-    
-    # Проверяем наличие приватного ключа
-    if 'private_key' not in wallet_data:
-        logger.error(f"Приватный ключ не найден в данных кошелька пользователя {user_id}")
-        print(f"Ошибка: Приватный ключ отсутствует в данных кошелька")
+
+    _init_worker(keys)
+    status, new_value = migrate_key(wallet_data['private_key'])
+    if status == INVALID:
+        print(f"Ошибка: Ключ пользователя {user_id} не расшифровывается ни одним из ключей")
         return False
-    
-    private_key = wallet_data['private_key']
-    
-    try:
-        # Проверяем, возможно ключ уже зашифрован
-        # Зашифрованные ключи обычно начинаются с 'g' для Fernet и имеют определенную длину
-        if len(private_key) > 100 and private_key.startswith('g'):
-            logger.info(f"Ключ пользователя {user_id} уже зашифрован")
-            print(f"Ключ пользователя {user_id} уже зашифрован")
-            return True
-        
-        # Шифруем приватный ключ
-        encrypted_key = encrypt_private_key(private_key)
-        logger.info(f"Ключ пользователя {user_id} успешно зашифрован")
-        
-        # Обновляем данные в wallet_data
-        wallet_data['private_key'] = encrypted_key
-        
-        # Сохраняем обновленные данные в Firebase
-        success = await firebase.save_user_wallet(user_id, wallet_data)
-        
-        if success:
-            logger.info(f"Зашифрованный ключ пользователя {user_id} успешно сохранен в базе данных")
-            print(f"Успех: Ключ пользователя {user_id} зашифрован и сохранен в базе данных")
-            return True
-        else:
-            logger.error(f"Ошибка при сохранении зашифрованного ключа пользователя {user_id}")
-            print(f"Ошибка: Не удалось сохранить зашифрованный ключ в базе данных")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Ошибка при шифровании ключа пользователя {user_id}: {e}")
-        print(f"Ошибка: {e}")
+    if status == CURRENT:
+        print(f"Ключ пользователя {user_id} уже зашифрован текущим ключом")
+        return True
+    if not await firebase.save_private_keys({str(user_id): new_value}):
+        print("Ошибка: Не удалось сохранить зашифрованный ключ в базе данных")
         return False
+    print(f"Успех: Ключ пользователя {user_id} {'перешифрован' if status == ROTATED else 'зашифрован'} и сохранен")
+    return True
 
-async def encrypt_all_users_keys():
+
+async def migrate_all_keys(
+    keys: Sequence[str],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    workers: Optional[int] = None,
+    checkpoint_path: str = DEFAULT_CHECKPOINT,
+    restart: bool = False,
+    dry_run: bool = False
+):
     """
-    Шифрует приватные ключи всех пользователей в базе данных
+    Шифрует и перешифровывает ключи всех пользователей.
+
+    Пользователи читаются страницами курсором Firestore (только поле
+    wallet.private_key), страница делится между процессами пула, измененные
+    ключи записываются пакетами Firestore. После каждой страницы курсор и
+    счетчики сохраняются в checkpoint_path - повторный запуск продолжает с
+    места остановки. Повторная обработка страницы безопасна: уже
+    зашифрованные текущим ключом записи пропускаются.
     """
     firebase = FirebaseService()
-    
-    # Получаем список всех пользователей
-    try:
-        users = await firebase.get_all_users()
-        if not users:
-            print("Не найдено пользователей в базе данных")
-            return
-            
-        print(f"Найдено {len(users)} пользователей в базе данных")
-        
-        success_count = 0
-        error_count = 0
-        already_encrypted_count = 0
-        no_wallet_count = 0
-        
-        for user_id in users:
-            print(f"\nОбработка пользователя {user_id}...")
-            
-            # Получаем данные кошелька
-            wallet_data = await firebase.get_user_wallet(user_id)
-            
-            if not wallet_data:
-                print(f"  Кошелек не найден")
-                no_wallet_count += 1
-                continue
-                
-            if 'private_key' not in wallet_data:
-                print(f"  Приватный ключ отсутствует в данных кошелька")
-                error_count += 1
-                continue
-                
-            private_key = wallet_data['private_key']
-            
-            # Проверяем, зашифрован ли уже ключ
-            if len(private_key) > 100 and private_key.startswith('g'):
-                print(f"  Ключ уже зашифрован")
-                already_encrypted_count += 1
-                continue
-                
-            try:
-                # Шифруем приватный ключ
-                encrypted_key = encrypt_private_key(private_key)
-                
-                # Обновляем данные в wallet_data
-                wallet_data['private_key'] = encrypted_key
-                
-                # Сохраняем обновленные данные в Firebase
-                success = await firebase.save_user_wallet(user_id, wallet_data)
-                
-                if success:
-                    print(f"  Ключ успешно зашифрован и сохранен")
-                    success_count += 1
+    state = {} if restart else _load_checkpoint(checkpoint_path)
+    counts = Counter(state.get('counts', {}))
+    if state.get('cursor'):
+        print(f"Продолжение с пользователя после {state['cursor']} (обработано ранее: {sum(counts.values())})")
+
+    workers = workers or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(list(keys),)) as pool:
+        async for docs in firebase.iter_user_pages(page_size, start_after=state.get('cursor'), fields=['wallet.private_key']):
+            items = []
+            for doc in docs:
+                private_key = ((doc.to_dict() or {}).get('wallet') or {}).get('private_key')
+                if private_key:
+                    items.append((doc.id, private_key))
                 else:
-                    print(f"  Ошибка при сохранении зашифрованного ключа")
-                    error_count += 1
-            except Exception as e:
-                print(f"  Ошибка при шифровании: {e}")
-                error_count += 1
-        
-        # Выводим итоговую статистику
-        print("\nИтоги обработки:")
-        print(f"  Всего пользователей: {len(users)}")
-        print(f"  Успешно зашифровано: {success_count}")
-        print(f"  Уже были зашифрованы: {already_encrypted_count}")
-        print(f"  Без кошелька: {no_wallet_count}")
-        print(f"  Ошибки: {error_count}")
-        
-    except Exception as e:
-        logger.error(f"Ошибка при обработке пользователей: {e}")
-        print(f"Ошибка при обработке пользователей: {e}")
+                    counts['no_wallet'] += 1
+
+            chunk_size = max(1, -(-len(items) // workers))
+            chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+            results = await asyncio.gather(*(loop.run_in_executor(pool, _migrate_chunk, chunk) for chunk in chunks))
+
+            updates = {}
+            for user_id, status, new_value in (row for chunk in results for row in chunk):
+                counts[status] += 1
+                if status == INVALID:
+                    logger.warning(f"Ключ пользователя {user_id} не расшифровывается ни одним из ключей")
+                elif new_value is not None:
+                    updates[user_id] = new_value
+
+            if updates and not dry_run and not await firebase.save_private_keys(updates):
+                # Контрольная точка не сдвигается - страница будет обработана повторно
+                print(f"Ошибка записи страницы после {state.get('cursor')}, запустите скрипт снова для продолжения")
+                return
+
+            processed += len(docs)
+            state = {'cursor': docs[-1].id, 'counts': dict(counts)}
+            if not dry_run:
+                _save_checkpoint(checkpoint_path, state)
+            rate = processed / max(time.monotonic() - started, 1e-6)
+            print(f"Обработано {processed} пользователей ({rate:.0f}/с), записано на странице: {len(updates)}")
+
+    if not dry_run and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    print("\nИтоги обработки:" + (" (пробный запуск, без записи)" if dry_run else ""))
+    print(f"  Зашифровано: {counts[ENCRYPTED]}")
+    print(f"  Перешифровано новым ключом: {counts[ROTATED]}")
+    print(f"  Уже зашифрованы текущим ключом: {counts[CURRENT]}")
+    print(f"  Без кошелька: {counts['no_wallet']}")
+    print(f"  Не расшифровываются: {counts[INVALID]}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Шифрование и ротация приватных ключей пользователей")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--user', type=int, help="ID одного пользователя")
+    target.add_argument('--all', action='store_true', help="все пользователи (постранично, с контрольными точками)")
+    parser.add_argument('--old-key', action='append', default=[],
+                        help="старый ключ, которого нет в ENCRYPTION_KEYS, для перешифрования текущим (можно несколько)")
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="процессов шифрования (по умолчанию - число CPU)")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="файл контрольной точки")
+    parser.add_argument('--restart', action='store_true', help="начать сначала, игнорируя контрольную точку")
+    parser.add_argument('--dry-run', action='store_true', help="только подсчитать, ничего не записывать")
+    return parser.parse_args(argv)
+
 
 async def main():
-    print("Запуск процесса шифрования ключей всех пользователей...")
-    
-    # Выберите один из вариантов:
-    
-    # 1. Шифрование ключа конкретного пользователя
-    user_id = 1620950118  # Замените на ID нужного пользователя
-    print(f"\nШифрование ключа пользователя {user_id}...")
-    result = await encrypt_user_private_key(user_id)
-    
-    if result:
-        print(f"Ключ пользователя {user_id} успешно зашифрован!")
+    args = parse_args()
+    keys = get_encryption_keys()
+    keys += [key for key in args.old_key if key not in keys]
+    if args.user:
+        await encrypt_user_private_key(args.user, keys)
     else:
-        print(f"Ошибка при шифровании ключа пользователя {user_id}")
-    
-    # 2. Шифрование ключей всех пользователей
-    # Раскомментируйте следующую строку, чтобы запустить шифрование для всех пользователей
-    # await encrypt_all_users_keys()
+        await migrate_all_keys(keys, args.page_size, args.workers, args.checkpoint, args.restart, args.dry_run)
 
 if __name__ == "__main__":
     asyncio.run(main())
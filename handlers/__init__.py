@@ -1,5 +1,5 @@
 from aiogram import Router
-from handlers import start, buy, sell, withdraw, export_keys, balance
+from handlers import start, buy, sell, withdraw, export_keys, balance, admin, orders, dca, alerts, batch_sell
 from keyboards import inline
 
 router = Router()
@@ -11,4 +11,9 @@ router.include_router(sell.router)
 router.include_router(withdraw.router)
 router.include_router(export_keys.router)
 router.include_router(balance.router)
+router.include_router(admin.router)
+router.include_router(orders.router)
+router.include_router(dca.router)
+router.include_router(alerts.router)
+router.include_router(batch_sell.router)
 router.include_router(inline.router)  # Добавляем роутер для обработки callback-кнопок
\ No newline at end of file
@@ -0,0 +1,108 @@
+import html
+
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile
+from loguru import logger
+
+from config import ADMIN_IDS, PROFILER_DEFAULT_SECONDS, PROFILER_MAX_SECONDS
+from services.broadcast import BroadcastBusy, broadcaster
+from services.profiler import ProfilerBusy, profiler
+
+router = Router(name='admin')
+
+# Сколько строк сводки показывать в сообщении
+SUMMARY_ROWS = 10
+
+
+def _format_summary(summary: dict) -> str:
+    lines = [f"📊 Профиль за {summary['seconds']:.0f} с, семплов: {summary['samples']}", "", "Хэндлеры:"]
+    for row in summary['handlers'][:SUMMARY_ROWS]:
+        lines.append(f"{row['share']:>6.1%}  {row['handler']}")
+    lines += ["", "Задачи asyncio (среднее / максимум):"]
+    for row in summary['tasks'][:SUMMARY_ROWS]:
+        lines.append(f"{row['avg']:>6} / {row['max']:<4} {row['coroutine']}")
+    return '\n'.join(lines)
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: types.Message, command: CommandObject):
+    """Обработчик команды /profile N - семплирующий профиль процесса на N секунд (только для админов)"""
+    if message.from_user.id not in ADMIN_IDS:
+        logger.warning(f"User {message.from_user.id} tried to run /profile")
+        return
+
+    try:
+        seconds = float(command.args) if command.args else PROFILER_DEFAULT_SECONDS
+    except ValueError:
+        await message.answer(f"Использование: /profile N (секунд, до {PROFILER_MAX_SECONDS:.0f})")
+        return
+
+    await message.answer(f"⏳ Профилирую {min(seconds, PROFILER_MAX_SECONDS):.0f} с...")
+    try:
+        summary = await profiler.profile(seconds)
+    except ProfilerBusy:
+        await message.answer("❌ Профилирование уже выполняется")
+        return
+    except Exception as e:
+        logger.error(f"Error profiling: {e}")
+        await message.answer("❌ Не удалось выполнить профилирование")
+        return
+
+    await message.answer(f"<pre>{html.escape(_format_summary(summary))}</pre>")
+    with open(summary['collapsed_file'], 'rb') as f:
+        data = f.read()
+    await message.answer_document(
+        BufferedInputFile(data, filename=summary['collapsed_file'].rsplit('/', 1)[-1]),
+        caption="Свернутые стеки (flamegraph.pl / speedscope)"
+    )
+
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: types.Message, command: CommandObject):
+    """Обработчик команды /broadcast текст - рассылка всем пользователям (только для админов)"""
+    if message.from_user.id not in ADMIN_IDS:
+        logger.warning(f"User {message.from_user.id} tried to run /broadcast")
+        return
+    if not command.args:
+        await message.answer(
+            "Использование: /broadcast текст (форматирование сохраняется)\n"
+            "/broadcast_status - прогресс, /broadcast_cancel - остановить"
+        )
+        return
+    if broadcaster.is_running:
+        await message.answer("❌ Рассылка уже выполняется: /broadcast_status")
+        return
+
+    # Текст с форматированием Telegram, без самой команды
+    text = message.html_text.split(maxsplit=1)[1]
+    status = await message.answer("📣 Рассылка запускается...")
+    try:
+        await broadcaster.begin(message.from_user.id, text, status.chat.id, status.message_id)
+    except BroadcastBusy:
+        await status.edit_text("❌ Рассылка уже выполняется")
+    except Exception as e:
+        logger.error(f"Error starting broadcast: {e}")
+        await status.edit_text("❌ Не удалось запустить рассылку")
+
+
+@router.message(Command("broadcast_status"))
+async def cmd_broadcast_status(message: types.Message):
+    """Прогресс текущей или последней рассылки (только для админов)"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    if broadcaster.current is None:
+        await message.answer("Рассылок еще не было")
+        return
+    await message.answer(broadcaster.format_progress(broadcaster.current))
+
+
+@router.message(Command("broadcast_cancel"))
+async def cmd_broadcast_cancel(message: types.Message):
+    """Остановка рассылки после текущей страницы пользователей (только для админов)"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    if broadcaster.cancel():
+        await message.answer("⏹ Рассылка будет остановлена после текущей страницы")
+    else:
+        await message.answer("Нет активной рассылки")
@@ -0,0 +1,102 @@
+import html
+from decimal import Decimal, InvalidOperation
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from loguru import logger
+
+from config import PRICE_STREAM_INTERVAL
+from handlers.orders import resolve_token_input
+from services.price_alerts import AlertError, price_alerts
+from services.price_service import PriceService
+from services.price_stream import price_stream
+from services.registry import service_registry
+
+router = Router(name='alerts')
+price_service = service_registry.lazy(PriceService)
+
+ALERT_USAGE = (
+    "Использование: /alert &lt;токен&gt; &lt;цена USD&gt;\n\n"
+    "Пример: /alert BONK 0.00003 - уведомить, когда цена BONK дойдет до $0.00003.\n"
+    "Список алертов: /alerts"
+)
+
+
+def _format_alert(alert: dict) -> str:
+    sign = "≥" if alert['direction'] == 'above' else "≤"
+    return f"<b>{html.escape(alert['symbol'])}</b> {sign} ${alert['target_price']:.8g}"
+
+
+@router.message(Command("alert"))
+async def cmd_alert(message: types.Message, command: CommandObject):
+    """Обработчик команды /alert - ценовой алерт по токену"""
+    args = (command.args or '').split()
+    if len(args) != 2:
+        await message.answer(ALERT_USAGE)
+        return
+    try:
+        target_price = Decimal(args[1].replace(',', '.').lstrip('$'))
+    except InvalidOperation:
+        await message.answer(ALERT_USAGE)
+        return
+    if not target_price.is_finite():
+        await message.answer(ALERT_USAGE)
+        return
+
+    resolved = resolve_token_input(args[0])
+    if not resolved:
+        await message.answer(f"❌ Токен {html.escape(args[0])} не найден")
+        return
+    symbol, mint = resolved
+
+    try:
+        current_price = price_stream.latest(mint, max_age=PRICE_STREAM_INTERVAL * 2)
+        if current_price is None:
+            current_price = await price_service.get_cached_token_price(mint)
+        alert = await price_alerts.create_alert(
+            user_id=message.from_user.id,
+            mint=mint,
+            symbol=symbol,
+            target_price=float(target_price),
+            current_price=current_price
+        )
+    except AlertError as e:
+        await message.answer(f"❌ {html.escape(str(e))}")
+        return
+    except Exception as e:
+        logger.error(f"Error creating alert for user {message.from_user.id}: {e}")
+        await message.answer("❌ Не удалось создать алерт, попробуйте позже")
+        return
+
+    await message.answer(
+        f"🔔 Алерт создан: {_format_alert(alert)}\n"
+        f"Текущая цена: ${alert['created_price']:.8g}"
+    )
+
+
+@router.message(Command("alerts"))
+async def cmd_alerts(message: types.Message):
+    """Обработчик команды /alerts - список алертов с кнопками удаления"""
+    alerts = price_alerts.user_alerts(message.from_user.id)
+    if not alerts:
+        await message.answer("У вас нет активных алертов.\n\n" + ALERT_USAGE)
+        return
+
+    lines = ["🔔 <b>Ваши алерты:</b>", ""]
+    buttons = []
+    for i, alert in enumerate(alerts, 1):
+        lines.append(f"{i}. {_format_alert(alert)}")
+        buttons.append([InlineKeyboardButton(text=f"🗑 Удалить {i}", callback_data=f"alert_delete:{alert['id']}")])
+    await message.answer('\n'.join(lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
+
+
+@router.callback_query(F.data.startswith("alert_delete:"))
+async def process_alert_delete(callback: types.CallbackQuery):
+    """Удаление алерта по кнопке из /alerts"""
+    alert_id = callback.data.split(':', 1)[1]
+    if await price_alerts.delete_alert(callback.from_user.id, alert_id):
+        await callback.answer("Алерт удален")
+        await callback.message.answer("✅ Алерт удален")
+    else:
+        await callback.answer("Алерт уже сработал или удален", show_alert=True)
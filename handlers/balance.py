@@ -2,11 +2,11 @@ from aiogram import Router, types
 from aiogram.filters import Command
 from loguru import logger
 from services.wallet import WalletService
-from services.solana_service import SolanaService
+from services.portfolio_service import portfolio_service
+from services.registry import service_registry
 
 router = Router()
-wallet_service = WalletService()
-solana_service = SolanaService()
+wallet_service = service_registry.lazy(WalletService)
 
 @router.message(Command("balance"))
 async def cmd_balance(message: types.Message, state=None):
@@ -21,18 +21,8 @@ async def cmd_balance(message: types.Message, state=None):
             return
 
         public_key = wallet['public_key']
-        # Получаем баланс SOL
-        sol_balance = await solana_service.get_sol_balance(public_key)
-        from services.price_service import PriceService
-        sol_price_usd = 0.0
-        try:
-            sol_price_usd = await PriceService().get_sol_price()
-        except Exception:
-            pass
-        usd_value = float(sol_balance) * sol_price_usd if sol_price_usd else 0.0
-
-        # Получаем токены с ненулевым балансом
-        tokens = await solana_service.get_wallet_tokens(public_key)
+        # Получаем оценку портфеля (из памяти, если снимок свежий)
+        portfolio = await portfolio_service.get_portfolio(user_id, public_key)
 
         # Формируем сообщение
         text = (
@@ -40,15 +30,10 @@ async def cmd_balance(message: types.Message, state=None):
             f"`{public_key}`\n\n"
             f"💰 Балансы:\n"
         )
-        text += f"- SOL: {sol_balance} (~${usd_value:.2f})\n"
+        text += f"- SOL: {round(portfolio['sol'], 2)} (~${portfolio['sol_usd']:.2f})\n"
 
-        # Сопоставляем mint-адреса с тикерами (если возможно)
-        from config import SOLANA_TOKEN_ADDRESSES
-        mint_to_ticker = {v: k for k, v in SOLANA_TOKEN_ADDRESSES.items()}
-        for mint, raw_amount in tokens.items():
-            balance = await solana_service.get_token_balance(public_key, mint)
-            ticker = mint_to_ticker.get(mint, mint[:6])
-            text += f"- {ticker}: {balance}\n"
+        for token in portfolio['tokens']:
+            text += f"- {token['symbol']}: {round(token['amount'], 2)}\n"
 
         text += "\nЧтобы увидеть новые токены — сначала купите их через бота."
 
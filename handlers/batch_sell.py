@@ -0,0 +1,177 @@
+import html
+from typing import List, Optional
+
+from aiogram import F, Router, types
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from loguru import logger
+
+from services.batch_sell import BatchSellError, batch_seller
+from services.firebase_service import FirebaseService
+from services.portfolio_service import portfolio_service
+from services.registry import service_registry
+from services.telegram_sender import PRIORITY_HIGH, telegram_sender
+
+router = Router(name='batch_sell')
+firebase = service_registry.lazy(FirebaseService)
+
+# Ключи данных FSM для выбора токенов
+TOKENS_KEY = 'batch_sell_tokens'
+SELECTED_KEY = 'batch_sell_selected'
+
+
+async def _held_tokens(user_id: int) -> Optional[List[dict]]:
+    """Токены с ненулевым балансом из портфеля; None - кошелек не найден"""
+    wallet = await firebase.get_user_wallet(user_id)
+    if not wallet:
+        return None
+    portfolio = await portfolio_service.get_portfolio(user_id, wallet['public_key'])
+    return [t for t in portfolio['tokens'] if t['amount'] > 0]
+
+
+def _selection_keyboard(tokens: List[dict], selected: List[int]) -> InlineKeyboardMarkup:
+    buttons = []
+    row = []
+    for i, token in enumerate(tokens):
+        mark = "✅" if i in selected else "⬜"
+        row.append(InlineKeyboardButton(text=f"{mark} {token['symbol']}", callback_data=f"sell_pick:{i}"))
+        if len(row) == 2:
+            buttons.append(row)
+            row = []
+    if row:
+        buttons.append(row)
+    buttons.append([
+        InlineKeyboardButton(text=f"Продать выбранные ({len(selected)})", callback_data="sell_selected_confirm"),
+        InlineKeyboardButton(text="Отмена", callback_data="sell_batch_cancel")
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+@router.callback_query(F.data == "sell_all")
+async def process_sell_all(callback: types.CallbackQuery):
+    """Подтверждение продажи всех токенов"""
+    try:
+        tokens = await _held_tokens(callback.from_user.id)
+    except Exception as e:
+        logger.error(f"Error getting tokens for batch sell: {e}")
+        await callback.answer("Не удалось получить список токенов", show_alert=True)
+        return
+    if tokens is None:
+        await callback.answer("Кошелек не найден. Используйте /start", show_alert=True)
+        return
+    if not tokens:
+        await callback.answer("У вас нет токенов для продажи", show_alert=True)
+        return
+
+    lines = [f"<b>Продать все токены ({len(tokens)}) за SOL?</b>", ""]
+    for t in tokens:
+        lines.append(f"💰 {html.escape(t['symbol'])}: {t['amount']:.6g}" + (f" (${t['usd']:.2f})" if t['price'] else ""))
+    lines.extend(["", f"Всего: ~<b>${sum(t['usd'] for t in tokens):.2f}</b>"])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ Продать все", callback_data="sell_all_confirm"),
+        InlineKeyboardButton(text="Отмена", callback_data="sell_batch_cancel")
+    ]])
+    await callback.message.answer('\n'.join(lines), reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "sell_select")
+async def process_sell_select(callback: types.CallbackQuery, state: FSMContext):
+    """Выбор нескольких токенов для продажи"""
+    try:
+        tokens = await _held_tokens(callback.from_user.id)
+    except Exception as e:
+        logger.error(f"Error getting tokens for batch sell: {e}")
+        await callback.answer("Не удалось получить список токенов", show_alert=True)
+        return
+    if not tokens:
+        await callback.answer("У вас нет токенов для продажи", show_alert=True)
+        return
+    tokens = [{'mint': t['mint'], 'symbol': t['symbol']} for t in tokens]
+    await state.update_data(**{TOKENS_KEY: tokens, SELECTED_KEY: []})
+    await callback.message.answer(
+        "<b>Выберите токены для продажи:</b>",
+        reply_markup=_selection_keyboard(tokens, [])
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("sell_pick:"))
+async def process_sell_pick(callback: types.CallbackQuery, state: FSMContext):
+    """Отметка токена в списке выбора"""
+    data = await state.get_data()
+    tokens = data.get(TOKENS_KEY)
+    if not tokens:
+        await callback.answer("Список устарел, откройте его заново", show_alert=True)
+        return
+    try:
+        index = int(callback.data.split(':', 1)[1])
+    except ValueError:
+        index = -1
+    if not 0 <= index < len(tokens):
+        await callback.answer("Токен не найден, откройте список заново", show_alert=True)
+        return
+    selected = list(data.get(SELECTED_KEY, []))
+    if index in selected:
+        selected.remove(index)
+    else:
+        selected.append(index)
+    await state.update_data(**{SELECTED_KEY: selected})
+    await callback.message.edit_reply_markup(reply_markup=_selection_keyboard(tokens, selected))
+    await callback.answer()
+
+
+@router.callback_query(F.data == "sell_selected_confirm")
+async def process_sell_selected(callback: types.CallbackQuery, state: FSMContext):
+    """Продажа отмеченных токенов"""
+    data = await state.get_data()
+    tokens = data.get(TOKENS_KEY) or []
+    mints = [tokens[i]['mint'] for i in data.get(SELECTED_KEY, []) if 0 <= i < len(tokens)]
+    if not mints:
+        await callback.answer("Отметьте хотя бы один токен", show_alert=True)
+        return
+    await state.update_data(**{TOKENS_KEY: None, SELECTED_KEY: None})
+    await _run_batch_sell(callback, mints)
+
+
+@router.callback_query(F.data == "sell_all_confirm")
+async def process_sell_all_confirm(callback: types.CallbackQuery):
+    await _run_batch_sell(callback, None)
+
+
+@router.callback_query(F.data == "sell_batch_cancel")
+async def process_sell_batch_cancel(callback: types.CallbackQuery, state: FSMContext):
+    await state.update_data(**{TOKENS_KEY: None, SELECTED_KEY: None})
+    await callback.message.edit_text("Продажа отменена")
+    await callback.answer()
+
+
+async def _run_batch_sell(callback: types.CallbackQuery, mints: Optional[List[str]]):
+    await callback.answer()
+    message = callback.message
+    count = f"{len(mints)} токенов" if mints else "всех токенов"
+    await telegram_sender.edit_text(message, f"⏳ Продажа {count}: получаем котировки...", priority=PRIORITY_HIGH)
+
+    async def progress(items):
+        await telegram_sender.edit_text(
+            message, batch_seller.format_report(items), priority=PRIORITY_HIGH, disable_web_page_preview=True
+        )
+
+    try:
+        items = await batch_seller.sell(callback.from_user.id, mints, progress=progress)
+    except BatchSellError as e:
+        await telegram_sender.edit_text(message, f"❌ {html.escape(str(e))}", priority=PRIORITY_HIGH)
+        return
+    except Exception as e:
+        logger.error(f"Batch sell failed for user {callback.from_user.id}: {e}")
+        await telegram_sender.edit_text(message, "❌ Ошибка при продаже, попробуйте позже", priority=PRIORITY_HIGH)
+        return
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="← К токенам", callback_data="sell")]])
+    await telegram_sender.edit_text(
+        message,
+        batch_seller.format_report(items),
+        priority=PRIORITY_HIGH,
+        reply_markup=keyboard,
+        disable_web_page_preview=True
+    )
@@ -7,12 +7,15 @@ from datetime import datetime
 from loguru import logger
 from services.jupiter_service import JupiterService
 from services.firebase_service import FirebaseService
-from config import SOLANA_RPC_URL, SOLANA_TOKEN_ADDRESSES
-from utils import log_transaction
+from services.portfolio_service import portfolio_service
+from services.registry import service_registry
+from services.telegram_sender import PRIORITY_HIGH, telegram_sender
+from config import SOLANA_RPC_URL, SOL_MINT
+from utils import log_transaction, resolve_token_symbol
 
 router = Router()
-jupiter = JupiterService()
-firebase = FirebaseService()
+jupiter = service_registry.lazy(JupiterService)
+firebase = service_registry.lazy(FirebaseService)
 
 # Обработчик для команды отмены текущей операции
 @router.message(F.text == "/cancel")
@@ -103,64 +106,43 @@ async def process_token(message: Message, state: FSMContext):
         return
     
     # Определяем адрес токена с учетом регистра и синонимов
-    normalized_input = token_input.replace(' ', '').upper()
-    token_address = None
-    for symbol, address in SOLANA_TOKEN_ADDRESSES.items():
-        if normalized_input == symbol.replace(' ', '').upper():
-            token_address = address
-            logger.info(f"🔍 Найден адрес для символа {symbol}: {token_address}")
-            break
-    if not token_address:
-        # Пытаемся найти частичное совпадение
-        for symbol, address in SOLANA_TOKEN_ADDRESSES.items():
-            if normalized_input in symbol.replace(' ', '').upper():
-                token_address = address
-                logger.info(f"🔍 Найдено частичное совпадение: символ {symbol}, адрес {address}")
-                break
-    if not token_address:
+    resolved = resolve_token_symbol(token_input)
+    if resolved:
+        symbol, token_address = resolved
+        logger.info(f"🔍 Найден адрес для символа {symbol}: {token_address}")
+    else:
         token_address = token_input
         logger.info(f"🔍 Начальный адрес токена: {token_address}")
-    # Если не найдено точное совпадение — продолжаем старую логику
-    if token_address == token_input:
-        # Пытаемся найти известный токен по его символу
-        found = False
-        for symbol, address in SOLANA_TOKEN_ADDRESSES.items():
-            if token_input.upper() in symbol:
-                token_address = address
-                logger.info(f"🔍 Найдено частичное совпадение: символ {symbol}, адрес {address}")
-                found = True
-                break
-        if not found:
-            # Если не найдено среди известных — ищем через Jupiter API
-            try:
-                tokens_list = await jupiter.get_all_tokens()
-            except Exception as e:
-                logger.error(f"Ошибка при получении списка токенов Jupiter: {str(e)}")
-                await message.answer("❌ Не удалось получить список токенов с Jupiter API. Попробуйте позже.")
+        # Если не найдено среди известных — ищем через Jupiter API
+        try:
+            tokens_list = await jupiter.get_all_tokens()
+        except Exception as e:
+            logger.error(f"Ошибка при получении списка токенов Jupiter: {str(e)}")
+            await message.answer("❌ Не удалось получить список токенов с Jupiter API. Попробуйте позже.")
+            return
+        # Более гибкий поиск по символу
+        normalized_input = token_input.replace(' ', '').upper()
+        matches = [
+            t for t in tokens_list
+            if isinstance(t, dict) and t.get('symbol', '').replace(' ', '').upper() == normalized_input
+        ]
+        if matches:
+            token_data = matches[0]
+            logger.opt(lazy=True).debug("Структура найденного токена: {}", lambda: token_data)
+            token_address = (
+                token_data.get('address') or
+                token_data.get('mintAddress') or
+                token_data.get('mint')
+            )
+            if not token_address:
+                logger.error(f"Токен найден, но не содержит address/mintAddress/mint: {token_data}")
+                await message.answer(f"❌ Токен найден через Jupiter, но не содержит адреса. Попробуйте ввести mint-адрес вручную.")
                 return
-            # Более гибкий поиск по символу
-            normalized_input = token_input.replace(' ', '').upper()
-            matches = [
-                t for t in tokens_list
-                if isinstance(t, dict) and t.get('symbol', '').replace(' ', '').upper() == normalized_input
-            ]
-            if matches:
-                token_data = matches[0]
-                logger.info(f"Структура найденного токена: {token_data}")
-                token_address = (
-                    token_data.get('address') or
-                    token_data.get('mintAddress') or
-                    token_data.get('mint')
-                )
-                if not token_address:
-                    logger.error(f"Токен найден, но не содержит address/mintAddress/mint: {token_data}")
-                    await message.answer(f"❌ Токен найден через Jupiter, но не содержит адреса. Попробуйте ввести mint-адрес вручную.")
-                    return
-                logger.info(f"🔍 Найден токен через Jupiter API: {token_address}")
-            # --- ВАЖНО ---
-            # Если не найдено ни одного совпадения — НЕ делаем return, а просто используем введённый текст как адрес токена
-            # и продолжаем выполнение, чтобы показать карточку токена
-            # (ошибку показываем только если не проходит базовую валидацию)
+            logger.info(f"🔍 Найден токен через Jupiter API: {token_address}")
+        # --- ВАЖНО ---
+        # Если не найдено ни одного совпадения — НЕ делаем return, а просто используем введённый текст как адрес токена
+        # и продолжаем выполнение, чтобы показать карточку токена
+        # (ошибку показываем только если не проходит базовую валидацию)
         logger.info(f"🔍 Используем введенный текст как адрес токена: {token_address}")
 
     
@@ -393,7 +375,7 @@ async def process_buy_callback(callback: CallbackQuery, state: FSMContext):
                 status="error",
                 error=error_msg
             )
-            await callback.message.answer(tx_url)
+            await telegram_sender.answer(callback.message, tx_url, priority=PRIORITY_HIGH)
         else:
             # Извлекаем сигнатуру транзакции из URL
             tx_signature = tx_url.split('/')[-1]
@@ -408,10 +390,18 @@ async def process_buy_callback(callback: CallbackQuery, state: FSMContext):
                 tx_signature=tx_signature
             )
             
-            await callback.message.answer(
+            # Сразу отражаем покупку в снимке портфеля
+            portfolio_service.record_swap(
+                user_id, SOL_MINT, int(amount * 1000000000),
+                token_address, int(route.get('outAmount') or 0) if route else None
+            )
+            
+            await telegram_sender.answer(
+                callback.message,
                 f"✅ Покупка выполнена успешно!\n"
                 f"Количество: {amount} SOL\n"
-                f"Транзакция: {tx_url}"
+                f"Транзакция: {tx_url}",
+                priority=PRIORITY_HIGH
             )
             
     except Exception as e:
@@ -428,7 +418,7 @@ async def process_buy_callback(callback: CallbackQuery, state: FSMContext):
             error=error_msg
         )
         
-        await callback.message.answer(f"❌ Ошибка при выполнении покупки: {error_msg}")
+        await telegram_sender.answer(callback.message, f"❌ Ошибка при выполнении покупки: {error_msg}", priority=PRIORITY_HIGH)
     finally:
         await state.clear()
 
@@ -486,7 +476,7 @@ async def process_custom_amount(message: Message, state: FSMContext):
                 status="error",
                 error=error_msg
             )
-            await message.answer(tx_url)
+            await telegram_sender.answer(message, tx_url, priority=PRIORITY_HIGH)
         else:
             # Извлекаем сигнатуру транзакции из URL
             tx_signature = tx_url.split('/')[-1]
@@ -501,10 +491,18 @@ async def process_custom_amount(message: Message, state: FSMContext):
                 tx_signature=tx_signature
             )
             
-            await message.answer(
+            # Сразу отражаем покупку в снимке портфеля
+            portfolio_service.record_swap(
+                user_id, SOL_MINT, int(amount * 1000000000),
+                token_address, int(route.get('outAmount') or 0) if route else None
+            )
+            
+            await telegram_sender.answer(
+                message,
                 f"✅ Покупка выполнена успешно!\n"
                 f"Количество: {amount} SOL\n"
-                f"Транзакция: {tx_url}"
+                f"Транзакция: {tx_url}",
+                priority=PRIORITY_HIGH
             )
             
     except Exception as e:
@@ -521,6 +519,6 @@ async def process_custom_amount(message: Message, state: FSMContext):
             error=error_msg
         )
         
-        await message.answer(f"❌ Ошибка при выполнении покупки: {error_msg}")
+        await telegram_sender.answer(message, f"❌ Ошибка при выполнении покупки: {error_msg}", priority=PRIORITY_HIGH)
     finally:
         await state.clear() 
\ No newline at end of file
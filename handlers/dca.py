@@ -0,0 +1,100 @@
+import html
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from loguru import logger
+
+from handlers.orders import resolve_token_input
+from services.dca_scheduler import DcaError, dca_scheduler
+
+router = Router(name='dca')
+
+DCA_USAGE = (
+    "Использование: /dca &lt;токен&gt; &lt;сумма SOL&gt; &lt;интервал, мин&gt; [число покупок]\n\n"
+    "Пример: /dca BONK 0.1 60 24 - покупать BONK на 0.1 SOL каждый час, 24 раза.\n"
+    "Без аргументов - список ваших планов."
+)
+
+
+def _format_plan(plan: dict) -> str:
+    runs = f"{plan['runs']}/{plan['max_runs']}" if plan['max_runs'] else f"{plan['runs']}"
+    next_run = datetime.fromtimestamp(plan['next_run']).strftime('%d.%m %H:%M')
+    return (
+        f"<b>{html.escape(plan['symbol'])}</b>: {plan['amount_sol']:g} SOL каждые {plan['interval'] / 60:g} мин, "
+        f"покупок {runs}, следующая ~{next_run}"
+    )
+
+
+async def _list_plans(message: types.Message):
+    plans = dca_scheduler.user_plans(message.from_user.id)
+    if not plans:
+        await message.answer("У вас нет активных планов DCA.\n\n" + DCA_USAGE)
+        return
+    lines = ["📆 <b>Ваши планы DCA:</b>", ""]
+    buttons = []
+    for i, plan in enumerate(plans, 1):
+        lines.append(f"{i}. {_format_plan(plan)}")
+        buttons.append([InlineKeyboardButton(text=f"❌ Остановить {i}", callback_data=f"dca_cancel:{plan['id']}")])
+    await message.answer('\n'.join(lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
+
+
+@router.message(Command("dca"))
+async def cmd_dca(message: types.Message, command: CommandObject):
+    """Обработчик команды /dca - создание плана регулярных покупок или список планов"""
+    args = (command.args or '').split()
+    if not args:
+        await _list_plans(message)
+        return
+    if len(args) not in (3, 4):
+        await message.answer(DCA_USAGE)
+        return
+
+    try:
+        amount_sol = Decimal(args[1].replace(',', '.'))
+        interval_minutes = Decimal(args[2].replace(',', '.'))
+        max_runs = int(args[3]) if len(args) == 4 else None
+    except (InvalidOperation, ValueError):
+        await message.answer(DCA_USAGE)
+        return
+    if not (amount_sol.is_finite() and interval_minutes.is_finite()):
+        await message.answer(DCA_USAGE)
+        return
+
+    resolved = resolve_token_input(args[0])
+    if not resolved:
+        await message.answer(f"❌ Токен {html.escape(args[0])} не найден")
+        return
+    symbol, mint = resolved
+
+    try:
+        plan = await dca_scheduler.create_plan(
+            user_id=message.from_user.id,
+            mint=mint,
+            symbol=symbol,
+            amount_sol=float(amount_sol),
+            interval=float(interval_minutes) * 60,
+            max_runs=max_runs
+        )
+    except DcaError as e:
+        await message.answer(f"❌ {html.escape(str(e))}")
+        return
+    except Exception as e:
+        logger.error(f"Error creating DCA plan for user {message.from_user.id}: {e}")
+        await message.answer("❌ Не удалось создать план, попробуйте позже")
+        return
+
+    await message.answer(f"✅ План DCA создан:\n{_format_plan(plan)}\n\nСписок планов: /dca")
+
+
+@router.callback_query(F.data.startswith("dca_cancel:"))
+async def process_dca_cancel(callback: types.CallbackQuery):
+    """Остановка плана по кнопке из /dca"""
+    plan_id = callback.data.split(':', 1)[1]
+    if await dca_scheduler.cancel_plan(callback.from_user.id, plan_id):
+        await callback.answer("План остановлен")
+        await callback.message.answer("✅ План DCA остановлен")
+    else:
+        await callback.answer("План уже завершен или остановлен", show_alert=True)
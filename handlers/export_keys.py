@@ -3,13 +3,14 @@ from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from loguru import logger
 from services.wallet import WalletService
+from services.registry import service_registry
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from datetime import datetime
 import asyncio
 
 router = Router()
-wallet_service = WalletService()
+wallet_service = service_registry.lazy(WalletService)
 
 class ExportStates(StatesGroup):
     waiting_for_confirmation = State()
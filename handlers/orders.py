@@ -0,0 +1,126 @@
+import html
+from decimal import Decimal, InvalidOperation
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from loguru import logger
+from solana.publickey import PublicKey
+
+from services.order_engine import STATUS_OPEN, OrderError, order_engine
+from services.registry import service_registry
+from services.solana_service import SolanaService
+from utils import resolve_token_symbol, to_lamports
+
+router = Router(name='orders')
+solana_service = service_registry.lazy(SolanaService)
+
+ORDER_USAGE = (
+    "Использование: /order &lt;buy|sell&gt; &lt;limit|stop&gt; &lt;токен&gt; &lt;сумма&gt; &lt;цена USD&gt;\n\n"
+    "buy - сумма в SOL, sell - количество токенов.\n"
+    "limit buy / stop sell срабатывают при падении цены до указанной,\n"
+    "stop buy / limit sell - при росте.\n\n"
+    "Пример: /order buy limit BONK 0.5 0.00002"
+)
+
+
+def resolve_token_input(token_input: str):
+    """(символ, адрес) по символу известного токена или адресу mint"""
+    resolved = resolve_token_symbol(token_input)
+    if resolved:
+        return resolved
+    try:
+        PublicKey(token_input)
+    except Exception:
+        return None
+    return f"{token_input[:4]}…{token_input[-4:]}", token_input
+
+
+def _format_order(order: dict) -> str:
+    unit = html.escape(order['symbol']) if order['side'] == 'sell' else 'SOL'
+    state = "" if order['status'] == STATUS_OPEN else " ⏳ исполняется"
+    return (
+        f"{order['kind']} {order['side']} <b>{html.escape(order['symbol'])}</b>: "
+        f"{order['ui_amount']:g} {unit} @ ${order['trigger_price']:.8g}{state}"
+    )
+
+
+@router.message(Command("order"))
+async def cmd_order(message: types.Message, command: CommandObject):
+    """Обработчик команды /order - создание лимитного или стоп-ордера"""
+    args = (command.args or '').split()
+    if len(args) != 5:
+        await message.answer(ORDER_USAGE)
+        return
+    side, kind, token_input, amount_input, price_input = args
+    side, kind = side.lower(), kind.lower()
+
+    try:
+        ui_amount = Decimal(amount_input.replace(',', '.'))
+        trigger_price = Decimal(price_input.replace(',', '.').lstrip('$'))
+    except InvalidOperation:
+        await message.answer(ORDER_USAGE)
+        return
+    if not (ui_amount.is_finite() and trigger_price.is_finite()):
+        await message.answer(ORDER_USAGE)
+        return
+
+    resolved = resolve_token_input(token_input)
+    if not resolved:
+        await message.answer(f"❌ Токен {html.escape(token_input)} не найден")
+        return
+    symbol, mint = resolved
+
+    try:
+        if side == 'sell':
+            decimals = await solana_service.get_token_decimals(mint)
+            amount = to_lamports(ui_amount, decimals)
+        else:
+            amount = to_lamports(ui_amount, 9)
+        order = await order_engine.place_order(
+            user_id=message.from_user.id,
+            mint=mint,
+            side=side,
+            kind=kind,
+            trigger_price=float(trigger_price),
+            amount=amount,
+            ui_amount=float(ui_amount),
+            symbol=symbol
+        )
+    except OrderError as e:
+        await message.answer(f"❌ {html.escape(str(e))}")
+        return
+    except Exception as e:
+        logger.error(f"Error placing order for user {message.from_user.id}: {e}")
+        await message.answer("❌ Не удалось создать ордер, попробуйте позже")
+        return
+
+    await message.answer(f"✅ Ордер создан:\n{_format_order(order)}\n\nСписок ордеров: /orders")
+
+
+@router.message(Command("orders"))
+async def cmd_orders(message: types.Message):
+    """Обработчик команды /orders - список ордеров с кнопками отмены"""
+    orders = order_engine.user_orders(message.from_user.id)
+    if not orders:
+        await message.answer("У вас нет открытых ордеров.\n\n" + ORDER_USAGE)
+        return
+
+    lines = ["📋 <b>Ваши ордера:</b>", ""]
+    buttons = []
+    for i, order in enumerate(orders, 1):
+        lines.append(f"{i}. {_format_order(order)}")
+        if order['status'] == STATUS_OPEN:
+            buttons.append([InlineKeyboardButton(text=f"❌ Отменить {i}", callback_data=f"order_cancel:{order['id']}")])
+    await message.answer('\n'.join(lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons) if buttons else None)
+
+
+@router.callback_query(F.data.startswith("order_cancel:"))
+async def process_order_cancel(callback: types.CallbackQuery):
+    """Отмена ордера по кнопке из /orders"""
+    order_id = callback.data.split(':', 1)[1]
+    if await order_engine.cancel_order(callback.from_user.id, order_id):
+        await callback.answer("Ордер отменен")
+        await callback.message.answer("✅ Ордер отменен")
+    else:
+        await callback.answer("Ордер уже исполнен или отменен", show_alert=True)
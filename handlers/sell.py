@@ -9,14 +9,17 @@ from loguru import logger
 from services.jupiter_service import JupiterService
 from services.firebase_service import FirebaseService
 from services.solana_service import SolanaService
+from services.portfolio_service import portfolio_service
+from services.registry import service_registry
+from services.telegram_sender import PRIORITY_HIGH, telegram_sender
 from config import SOLANA_RPC_URL, SOLANA_TOKEN_ADDRESSES, JUPITER_PLATFORM_FEE_BPS
 from solana.publickey import PublicKey
 from utils import log_transaction
 
 router = Router(name='sell')
-jupiter = JupiterService()
-firebase = FirebaseService()
-solana_service = SolanaService()
+jupiter = service_registry.lazy(JupiterService)
+firebase = service_registry.lazy(FirebaseService)
+solana_service = service_registry.lazy(SolanaService)
 
 class SellStates(StatesGroup):
     waiting_for_token = State()
@@ -126,19 +129,22 @@ async def process_amount_sell(message: Message, state: FSMContext):
 
         # Отправляем результат пользователю
         if result.startswith("❌"):
-            await message.answer(result)
+            await telegram_sender.answer(message, result, priority=PRIORITY_HIGH)
         else:
-            await message.answer(
+            portfolio_service.apply_ui_delta(message.from_user.id, token_address, -amount)
+            await telegram_sender.answer(
+                message,
                 f"✅ Продажа выполнена успешно!\n"
                 f"Токен: {token_symbol_or_address}\n"
                 f"Сумма: {amount}\n"
                 f"Комиссия: {JUPITER_PLATFORM_FEE_BPS/100}%\n"
-                f"Транзакция: {result}"
+                f"Транзакция: {result}",
+                priority=PRIORITY_HIGH
             )
 
     except Exception as e:
         logger.error(f"Ошибка при продаже токена: {str(e)}")
-        await message.answer(f"❌ Ошибка при продаже токена: {str(e)}")
+        await telegram_sender.answer(message, f"❌ Ошибка при продаже токена: {str(e)}", priority=PRIORITY_HIGH)
         await state.clear()
 
 @router.callback_query(F.data.startswith("sell_confirm"))
@@ -187,7 +193,7 @@ async def process_sell_confirmation(callback: CallbackQuery, state: FSMContext):
                 status="error",
                 error=error_msg
             )
-            await callback.message.edit_text(tx_url)
+            await telegram_sender.edit_text(callback.message, tx_url, priority=PRIORITY_HIGH)
         else:
             # Извлекаем сигнатуру транзакции из URL
             tx_signature = tx_url.split('/')[-1]
@@ -201,6 +207,7 @@ async def process_sell_confirmation(callback: CallbackQuery, state: FSMContext):
                 status="success",
                 tx_signature=tx_signature
             )
+            portfolio_service.apply_ui_delta(user_id, token_address, -amount)
             
             # Определяем название токена для отображения
             token_name = next(
@@ -208,10 +215,12 @@ async def process_sell_confirmation(callback: CallbackQuery, state: FSMContext):
                 token_address
             )
             
-            await callback.message.edit_text(
+            await telegram_sender.edit_text(
+                callback.message,
                 f"✅ Продажа выполнена успешно!\n"
                 f"Продано: {amount} {token_name}\n"
-                f"Транзакция: {tx_url}"
+                f"Транзакция: {tx_url}",
+                priority=PRIORITY_HIGH
             )
             
     except Exception as e:
@@ -228,6 +237,6 @@ async def process_sell_confirmation(callback: CallbackQuery, state: FSMContext):
             error=error_msg
         )
         
-        await callback.message.edit_text(f"❌ Ошибка при выполнении продажи: {error_msg}")
+        await telegram_sender.edit_text(callback.message, f"❌ Ошибка при выполнении продажи: {error_msg}", priority=PRIORITY_HIGH)
     finally:
         await state.clear() 
\ No newline at end of file
@@ -2,19 +2,17 @@ from aiogram import Router, types, F
 from aiogram.filters import Command
 from loguru import logger
 from services.firebase_service import FirebaseService
-from services.solana_service import SolanaService
-from services.price_service import PriceService
+from services.portfolio_service import portfolio_service
 from services.wallet import WalletService
+from services.registry import service_registry
 from solana.keypair import Keypair
 from base58 import b58encode
 from keyboards.inline import get_main_keyboard
 import json
 
 router = Router(name='start')
-firebase = FirebaseService()
-solana = SolanaService()
-price_service = PriceService()
-wallet_service = WalletService()
+firebase = service_registry.lazy(FirebaseService)
+wallet_service = service_registry.lazy(WalletService)
 
 @router.message(Command("start"))
 async def cmd_start(message: types.Message):
@@ -31,12 +29,8 @@ async def cmd_start(message: types.Message):
             wallet_data = await wallet_service.create_wallet(user_id)
             logger.info(f"Created new wallet for user {user_id}")
         
-        # Получаем баланс SOL
-        sol_balance = await solana.get_sol_balance(wallet_data['public_key'])
-        sol_price_usd = await price_service.get_sol_price()
-
-        # Получаем токены с ненулевым балансом
-        tokens = await solana.get_wallet_tokens(wallet_data['public_key'])
+        # Получаем оценку портфеля (из памяти, если снимок свежий)
+        portfolio = await portfolio_service.get_portfolio(user_id, wallet_data['public_key'])
 
         # Формируем сообщение
         text = (
@@ -44,17 +38,10 @@ async def cmd_start(message: types.Message):
             f"`{wallet_data['public_key']}`\n\n"
             f"💰 Балансы:\n"
         )
-        usd_value = float(sol_balance) * sol_price_usd
-        text += f"- SOL: {sol_balance} (~${usd_value:.2f})\n"
+        text += f"- SOL: {round(portfolio['sol'], 2)} (~${portfolio['sol_usd']:.2f})\n"
 
-        # Сопоставляем mint-адреса с тикерами (если возможно)
-        from config import SOLANA_TOKEN_ADDRESSES
-        mint_to_ticker = {v: k for k, v in SOLANA_TOKEN_ADDRESSES.items()}
-        for mint, raw_amount in tokens.items():
-            # Получаем баланс токена с учетом decimals
-            balance = await solana.get_token_balance(wallet_data['public_key'], mint)
-            ticker = mint_to_ticker.get(mint, mint[:6])
-            text += f"- {ticker}: {balance}\n"
+        for token in portfolio['tokens']:
+            text += f"- {token['symbol']}: {round(token['amount'], 2)}\n"
 
         text += "\nЧтобы увидеть новые токены — сначала купите их через бота."
 
@@ -8,15 +8,18 @@ from services.solana_service import SolanaService
 from services.jupiter_service import JupiterService
 from solana.publickey import PublicKey
 import asyncio
-import time
 from datetime import datetime
 from services.firebase_service import FirebaseService
+from services.price_service import PriceService
+from services.registry import service_registry
+from services.portfolio_service import portfolio_service
 from config import SOLANA_TOKEN_ADDRESSES
 from utils import log_transaction, validate_slippage
 
 router = Router()
-solana_service = SolanaService()
-jupiter_service = JupiterService()
+solana_service = service_registry.lazy(SolanaService)
+jupiter_service = service_registry.lazy(JupiterService)
+price_service = service_registry.lazy(PriceService)
 
 # Определение состояний FSM для процесса вывода средств
 class WithdrawStates(StatesGroup):
@@ -25,43 +28,23 @@ class WithdrawStates(StatesGroup):
     waiting_for_amount = State()       # Ожидание ввода суммы для вывода
     confirming_withdrawal = State()    # Подтверждение вывода
 
-# Кэш для хранения цен токенов (чтобы не запрашивать их слишком часто)
-token_prices_cache = {}
-last_price_update = 0
-CACHE_DURATION = 300  # 5 минут
-
-async def get_token_prices():
-    """Получение текущих цен токенов через Jupiter API"""
-    global token_prices_cache, last_price_update
-    
-    # Проверяем, нужно ли обновить кэш
-    current_time = time.time()
-    if current_time - last_price_update > CACHE_DURATION or not token_prices_cache:
-        try:
-            # TODO: Здесь должен быть запрос к Jupiter API для получения цен
-            # Для этого примера, используем заглушку с фиксированными ценами
-            token_prices_cache = {
-                'SOL': 124.46,
-                'BONK': 0.00001263,
-                'RAY': 1.839,
-                'USDC': 1.0,
-                'USDT': 1.0
-            }
-            last_price_update = current_time
-            logger.info("Цены токенов обновлены")
-        except Exception as e:
-            logger.error(f"Ошибка при получении цен токенов: {e}")
-            # Если не удалось получить цены, используем последние известные
-            if not token_prices_cache:
-                token_prices_cache = {
-                    'SOL': 124.46,
-                    'BONK': 0.00001263,
-                    'RAY': 1.839,
-                    'USDC': 1.0,
-                    'USDT': 1.0
-                }
+async def get_token_prices(tokens):
+    """
+    Получение текущих цен токенов одним пакетным запросом
     
-    return token_prices_cache
+    Args:
+        tokens: Символы токенов или mint-адреса (ключи словаря балансов)
+        
+    Returns:
+        dict: {токен: цена в USD}
+    """
+    token_mints = {token: SOLANA_TOKEN_ADDRESSES.get(token, token) for token in tokens}
+    try:
+        prices_by_mint = await price_service.get_token_prices_usd(token_mints.values())
+    except Exception as e:
+        logger.error(f"Ошибка при получении цен токенов: {e}")
+        prices_by_mint = {}
+    return {token: prices_by_mint.get(mint, 0) for token, mint in token_mints.items()}
 
 async def get_user_wallet(user_id):
     """Получение кошелька пользователя из Firebase"""
@@ -111,13 +94,13 @@ async def cmd_withdraw_with_user_id(message: types.Message, state: FSMContext, u
                 "❌ У вас еще нет кошелька. Используйте команду /start для его создания."
             )
             return
-        balances = await solana_service.get_all_balances(user_pubkey)
+        balances = await portfolio_service.get_balances(user_id, user_pubkey)
         if not balances:
             await message.answer(
                 "❌ На вашем кошельке нет токенов для вывода."
             )
             return
-        token_prices = await get_token_prices()
+        token_prices = await get_token_prices(balances)
         text = "Выберите токен для вывода (Solana) 1/1\n\n"
         for token, balance in balances.items():
             price = token_prices.get(token, 0)
@@ -185,7 +168,7 @@ async def back_to_tokens(callback: CallbackQuery, state: FSMContext):
         balances = data.get("balances", {})
         
         # Получаем цены токенов
-        token_prices = await get_token_prices()
+        token_prices = await get_token_prices(balances)
         
         # Формируем сообщение с балансами и USD ценами
         text = "Выберите токен для вывода (Solana) 1/1\n\n"
@@ -222,13 +205,11 @@ async def refresh_balances(callback: CallbackQuery, state: FSMContext):
             await callback.answer("❌ Не удалось получить данные кошелька.", show_alert=True)
             return
         
-        # Обновляем балансы токенов
-        balances = await solana_service.get_all_balances(user_pubkey)
+        # Обновляем балансы токенов (явный запрос свежих данных из сети)
+        balances = await portfolio_service.get_balances(user_id, user_pubkey, force=True)
         
-        # Обновляем цены токенов (сбрасываем кэш)
-        global last_price_update
-        last_price_update = 0
-        token_prices = await get_token_prices()
+        # Получаем цены токенов
+        token_prices = await get_token_prices(balances)
         
         # Формируем обновленное сообщение
         text = "Выберите токен для вывода (Solana) 1/1\n\n"
@@ -405,6 +386,9 @@ async def confirm_withdrawal(callback: CallbackQuery, state: FSMContext):
                 amount=float(amount)
             )
         
+        # Отражаем вывод в снимке портфеля
+        portfolio_service.apply_ui_delta(user_id, SOLANA_TOKEN_ADDRESSES.get(token, token), -float(amount))
+        
         # Формируем URL транзакции
         tx_url = f"https://solscan.io/tx/{tx_signature}"
         
@@ -6,11 +6,15 @@ import decimal
 from services.firebase_service import FirebaseService
 from services.solana_service import SolanaService
 from services.price_service import PriceService
+from services.portfolio_service import portfolio_service
+from services.registry import service_registry
+from services.telegram_sender import PRIORITY_HIGH, telegram_sender
+from config import SOL_MINT
 
 router = Router(name='inline_kb')
-firebase = FirebaseService()
-solana = SolanaService()
-price_service = PriceService()
+firebase = service_registry.lazy(FirebaseService)
+solana = service_registry.lazy(SolanaService)
+price_service = service_registry.lazy(PriceService)
 
 def get_main_keyboard() -> InlineKeyboardMarkup:
     """Создает основную клавиатуру с кнопками"""
@@ -58,6 +62,11 @@ def get_tokens_keyboard(tokens: list) -> InlineKeyboardMarkup:
             row = []
     if row:
         buttons.append(row)
+    # Продажа нескольких токенов одной операцией (handlers/batch_sell.py)
+    buttons.append([
+        InlineKeyboardButton(text="💥 Продать все", callback_data="sell_all"),
+        InlineKeyboardButton(text="☑️ Выбрать несколько", callback_data="sell_select")
+    ])
     # Добавляем кнопки управления
     buttons.append([
         InlineKeyboardButton(text="⟳ Обновить", callback_data="sell_refresh"),
@@ -109,7 +118,7 @@ async def process_custom_percent(message: Message, state: FSMContext):
         return
     from config import SOLANA_TOKEN_ADDRESSES
     address = SOLANA_TOKEN_ADDRESSES.get(token_symbol, token_symbol)
-    amount = await solana.get_token_balance(wallet['public_key'], address)
+    amount = await portfolio_service.get_token_amount(user_id, wallet['public_key'], address)
     if not amount or amount == 0:
         await message.answer("❌ Нет баланса для продажи.")
         await state.clear()
@@ -118,7 +127,7 @@ async def process_custom_percent(message: Message, state: FSMContext):
     msg = await message.answer(f"⏳ Проводим транзакцию продажи {sell_amount:.6f} {token_symbol} ({percent}% от баланса)...")
     from config import SOLANA_TOKEN_ADDRESSES
     from services.jupiter_service import JupiterService
-    jupiter_service = JupiterService()
+    jupiter_service = service_registry.get(JupiterService)
     address = SOLANA_TOKEN_ADDRESSES.get(token_symbol, token_symbol)
     try:
         tx_result = await jupiter_service.execute_sell(
@@ -132,14 +141,15 @@ async def process_custom_percent(message: Message, state: FSMContext):
         if isinstance(tx_result, str) and tx_result.startswith("https://solscan.io/tx/"):
             solscan_url = tx_result
             tx_status = "🟢 Продажа выполнена!"
+            portfolio_service.apply_ui_delta(user_id, address, -sell_amount)
         elif isinstance(tx_result, str):
             tx_status = f"🔴 Ошибка: {tx_result}"
         else:
             tx_status = f"🔴 Неизвестный результат: {tx_result}"
         sol_price_usd = await price_service.get_sol_price()
-        price = await price_service.get_token_price_jupiter(address, jupiter_service, sol_price_usd)
+        price = await price_service.get_cached_token_price(address)
         sol_amount = None
-        if price:
+        if price and sol_price_usd:
             sol_amount = sell_amount * price / sol_price_usd
         text_lines = [
             f"<b>Продажа {sell_amount:.6f} {token_symbol}</b>"
@@ -161,9 +171,11 @@ async def process_custom_percent(message: Message, state: FSMContext):
             buttons.append([InlineKeyboardButton(text="Посмотреть на Solscan", url=solscan_url)])
         buttons.append([InlineKeyboardButton(text="Продать", callback_data=f"sell_token_{token_symbol}")])
         keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-        await msg.edit_text(text, reply_markup=keyboard, parse_mode="HTML", disable_web_page_preview=True)
+        await telegram_sender.edit_text(
+            msg, text, priority=PRIORITY_HIGH, reply_markup=keyboard, parse_mode="HTML", disable_web_page_preview=True
+        )
     except Exception as e:
-        await msg.edit_text(f"❌ Ошибка при продаже: {str(e)}")
+        await telegram_sender.edit_text(msg, f"❌ Ошибка при продаже: {str(e)}", priority=PRIORITY_HIGH)
     await state.clear()
 
 @router.callback_query(F.data == "sell_cancel_custom_percent")
@@ -205,7 +217,7 @@ async def process_sell_percent_callback(callback: CallbackQuery):
                 return
             percent_raw, token_symbol = m.groups()
             address = SOLANA_TOKEN_ADDRESSES.get(token_symbol, token_symbol)
-            amount = await solana.get_token_balance(wallet['public_key'], address)
+            amount = await portfolio_service.get_token_amount(user_id, wallet['public_key'], address)
             if not amount or amount == 0:
                 await callback.message.answer("❌ Нет баланса для продажи.")
                 return
@@ -225,7 +237,7 @@ async def process_sell_percent_callback(callback: CallbackQuery):
         from config import SOLANA_TOKEN_ADDRESSES
         from services.jupiter_service import JupiterService
         from utils import to_lamports
-        jupiter_service = JupiterService()
+        jupiter_service = service_registry.get(JupiterService)
         address = SOLANA_TOKEN_ADDRESSES.get(token_symbol, token_symbol)
         # Получаем decimals токена
         decimals = await jupiter_service.get_token_decimals(address)
@@ -248,15 +260,16 @@ async def process_sell_percent_callback(callback: CallbackQuery):
             if isinstance(tx_result, str) and tx_result.startswith("https://solscan.io/tx/"):
                 solscan_url = tx_result
                 tx_status = "🟢 Продажа выполнена!"
+                portfolio_service.record_swap(user_id, address, amount_lamports, SOL_MINT)
             elif isinstance(tx_result, str):
                 tx_status = f"🔴 Ошибка: {tx_result}"
             else:
                 tx_status = f"🔴 Неизвестный результат: {tx_result}"
             # Получаем цену токена и сумму в SOL
             sol_price_usd = await price_service.get_sol_price()
-            price = await price_service.get_token_price_jupiter(address, jupiter_service, sol_price_usd)
+            price = await price_service.get_cached_token_price(address)
             sol_amount = None
-            if price:
+            if price and sol_price_usd:
                 sol_amount = sell_amount * price / sol_price_usd
             # Текст
             text_lines = [
@@ -281,9 +294,11 @@ async def process_sell_percent_callback(callback: CallbackQuery):
                 buttons.append([InlineKeyboardButton(text="Посмотреть на Solscan", url=solscan_url)])
             buttons.append([InlineKeyboardButton(text="Продать", callback_data=f"sell_token_{token_symbol}")])
             keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-            await msg.edit_text(text, reply_markup=keyboard, parse_mode="HTML", disable_web_page_preview=True)
+            await telegram_sender.edit_text(
+                msg, text, priority=PRIORITY_HIGH, reply_markup=keyboard, parse_mode="HTML", disable_web_page_preview=True
+            )
         except Exception as e:
-            await msg.edit_text(f"❌ Ошибка при продаже: {str(e)}")
+            await telegram_sender.edit_text(msg, f"❌ Ошибка при продаже: {str(e)}", priority=PRIORITY_HIGH)
     except Exception as e:
         logger.error(f"Error in process_sell_percent_callback: {e}")
         await callback.message.answer(f"Ошибка при продаже: {str(e)}")
@@ -299,16 +314,11 @@ async def process_sell_token_callback(callback: CallbackQuery):
         if not wallet:
             await callback.message.answer("❌ Кошелек не найден. Используйте /start для создания.")
             return
-        sol_price_usd = await price_service.get_sol_price()
         from config import SOLANA_TOKEN_ADDRESSES
-        from services.jupiter_service import JupiterService
-        jupiter_service = JupiterService()
         address = SOLANA_TOKEN_ADDRESSES.get(token_symbol, token_symbol)
-        amount = await solana.get_token_balance(wallet['public_key'], address)
-        # Получаем цену токена через Jupiter или CoinGecko
-        price = await price_service.get_token_price_jupiter(address, jupiter_service, sol_price_usd)
-        if not price:
-            price = await price_service.get_token_price_usd(address)
+        amount = await portfolio_service.get_token_amount(user_id, wallet['public_key'], address)
+        # Получаем цену токена через общий кэш (Jupiter Price API, затем CoinGecko)
+        price = await price_service.get_cached_token_price(address)
         try:
             usd_value = float(amount) * float(price) if price else 0
             if usd_value > 1_000_000:  # диагностический порог
@@ -356,150 +366,32 @@ async def process_sell_callback(callback: CallbackQuery):
         if not wallet:
             await callback.message.answer("❌ Кошелек не найден. Используйте /start для создания.")
             return
-        # Получаем только токены с ненулевым балансом через SolanaService (mint: amount)
+        # Портфель строится из снимка в памяти; цены - из общего кэша одним пакетным запросом
         try:
-            tokens_raw = await solana.get_wallet_tokens(wallet['public_key'])
+            portfolio = await portfolio_service.get_portfolio(user_id, wallet['public_key'])
         except Exception as e:
             logger.error(f"Ошибка при получении токенов пользователя: {e}")
             await callback.message.answer("❌ Не удалось получить список токенов. Попробуйте позже.")
             await callback.answer()
             return
 
-        if not tokens_raw:
-            await callback.message.answer("У вас нет токенов для продажи.")
-            await callback.answer()
-            return
-
-        sol_price_usd = 0.0
-        try:
-            sol_price_usd = await price_service.get_sol_price()
-        except Exception as e:
-            logger.error(f"Ошибка при получении цены SOL: {e}")
-
-        from config import SOLANA_TOKEN_ADDRESSES
-        mint_to_ticker = {v: k for k, v in SOLANA_TOKEN_ADDRESSES.items()}
-        import asyncio
-        from services.jupiter_service import JupiterService
-        jupiter_service = JupiterService()
-        async def get_usd(mint, amount):
-            ticker = mint_to_ticker.get(mint, mint[:6])
-            if ticker == 'SOL':
-                return sol_price_usd, float(amount) * sol_price_usd
-            # Получаем цену через Jupiter
-            price_jup = None
-            try:
-                logger.debug(f"[SELL TOKENS][get_usd] mint={mint}, amount={amount} — вызов get_token_price_jupiter")
-                price_jup = await price_service.get_token_price_jupiter(mint, jupiter_service, sol_price_usd)
-                logger.debug(f"[SELL TOKENS][get_usd] mint={mint}, amount={amount} — результат get_token_price_jupiter: {price_jup} (type={type(price_jup)})")
-            except Exception as e:
-                logger.error(f"Ошибка Jupiter для {mint}: {e}")
-            if price_jup:
-                return price_jup, float(amount) * price_jup
-            # Fallback — CoinGecko
-            price_cg = None
-            try:
-                price_cg = await price_service.get_token_price_usd(mint)
-            except Exception as e:
-                logger.error(f"Ошибка CoinGecko для {mint}: {e}")
-            if price_cg:
-                return price_cg, float(amount) * price_cg
-            return None, None
-        try:
-            tasks = [get_usd(mint, amount['amount'] if isinstance(amount, dict) else amount) for mint, amount in tokens_raw.items()]
-            usd_results = await asyncio.gather(*tasks)
-        except Exception as e:
-            logger.error(f"Ошибка при получении цен токенов: {e}")
-            await callback.message.answer("❌ Не удалось получить цены токенов. Попробуйте позже.")
-            await callback.answer()
-            return
-        DECIMALS_OVERRIDE = {
-            'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v': 6,  # USDC
-            'Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB': 6,  # USDT
-            '4k3Dyjzvzp8eMZWUXbBCjEvwSkkk59S5iCNLY3QrkX6R': 6,  # RAY
-            '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs': 8,  # ETH (Wormhole)
-            'orcaEKTdK7LKz57vaAYr9QeNsVEPfiu6QeMU1kektZE': 6,  # ORCA
-            # Добавьте другие mint при необходимости
-        }
-        tokens = []
-        from utils import from_lamports
-        for idx, (mint, amount) in enumerate(tokens_raw.items()):
-            amount_val = amount['amount'] if isinstance(amount, dict) else amount
-            price, _ = usd_results[idx]
-            logger.debug(f"[SELL TOKENS] get_usd для mint={mint}, amount={amount_val}: price={price} (type={type(price)})")
-            ticker = mint_to_ticker.get(mint, mint[:6])
-            # Диагностика структуры
-            if isinstance(price, dict):
-                logger.error(f"[SELL TOKENS] Некорректный тип данных: price={price} (type={type(price)}), mint={mint}, amount={amount}")
-                price = None
-            try:
-                if mint in DECIMALS_OVERRIDE:
-                    decimals = DECIMALS_OVERRIDE[mint]
-                else:
-                    decimals = await jupiter_service.get_token_decimals(mint)
-            except Exception as e:
-                logger.error(f"Ошибка получения decimals для {mint}: {e}")
-                decimals = 9
-            try:
-                amount_val = amount['amount'] if isinstance(amount, dict) else amount
-                amount_display = from_lamports(int(amount_val), decimals)
-                logger.debug(f"[SELL TOKENS] {ticker} mint={mint} amount={amount_val} decimals={decimals} display={amount_display}")
-            except Exception as e:
-                logger.error(f"[SELL TOKENS] Ошибка пересчёта: {e}")
-                amount_display = amount
-            try:
-                usd = float(amount_display) * float(price) if price else 0
-            except Exception as e:
-                logger.error(f"[SELL TOKENS] Ошибка при расчёте usd для {ticker}: {e}")
-                usd = 0
-            tokens.append({
-                "symbol": ticker,
-                "amount": amount_display,
-                "usd": usd,
-                "price": price,
-                "mint": mint
-            })
+        tokens = [t for t in portfolio['tokens'] if t['amount'] > 0]
         if not tokens:
             await callback.message.answer("У вас нет токенов для продажи.")
             await callback.answer()
             return
-        # Оформление сообщения
-        # Получаем баланс SOL отдельно
-        sol_balance = 0.0
-        try:
-            sol_balance = await solana.get_sol_balance(wallet['public_key'])
-        except Exception as e:
-            logger.error(f"Ошибка при получении баланса SOL: {e}")
+
+        from utils import format_token_amount
+        sol_balance = round(portfolio['sol'], 2)
         text = (
             f"<b>Выберите токен для продажи 1/{len(tokens)}</b>\n"
-            f"<b>Баланс:</b> <b>{sol_balance}</b> SOL (<b>${float(sol_balance)*sol_price_usd:.2f}</b>)\n"
+            f"<b>Баланс:</b> <b>{sol_balance}</b> SOL (<b>${portfolio['sol_usd']:.2f}</b>)\n"
             "\n"
         )
         for t in tokens:
-            # Безопасное форматирование usd и price
-            if isinstance(t['usd'], dict) or not isinstance(t['usd'], (float, int)):
-                logger.error(f"[SELL TOKENS] Некорректный usd для токена {t['symbol']}: {t['usd']} (type={type(t['usd'])})")
-                usd_str = "нет данных"
-            else:
-                usd_str = f"${t['usd']:.2f}"
-            if isinstance(t['price'], dict) or not isinstance(t['price'], (float, int)):
-                logger.error(f"[SELL TOKENS] Некорректный price для токена {t['symbol']}: {t['price']} (type={type(t['price'])})")
-                price_str = ""
-            else:
-                price_str = f"@ ${t['price']:.4f}"
-            # Форматирование количества токенов с учетом decimals (до 6 знаков после запятой, если мало)
-            try:
-                mint = t.get('mint', '')
-                if mint and len(mint) > 20:
-                    decimals = await jupiter_service.get_token_decimals(mint)
-                else:
-                    decimals = 9
-            except Exception:
-                decimals = 9
-            try:
-                from utils import format_token_amount
-                amount_str = format_token_amount(t['amount'], decimals)
-            except Exception:
-                amount_str = str(t['amount'])
+            usd_str = f"${t['usd']:.2f}" if t['price'] else "нет данных"
+            price_str = f"@ ${t['price']:.4f}" if t['price'] else ""
+            amount_str = format_token_amount(t['amount'], t['decimals'])
             text += (
                 f"💰 <b>{t['symbol']}</b>\n"
                 f"    └ <b>{amount_str}</b>   (<b>{usd_str}</b>)  {price_str}\n"
@@ -564,7 +456,7 @@ async def process_balance_callback(callback: CallbackQuery):
     try:
         wallet = await firebase.get_user_wallet(user_id)
         if wallet:
-            balances = await solana.get_all_balances(wallet['public_key'])
+            balances = await portfolio_service.get_balances(user_id, wallet['public_key'])
             sol_price_usd = await price_service.get_sol_price()
             
             text = f"💰 Балансы:\n"
@@ -593,7 +485,8 @@ async def process_refresh_callback(callback: CallbackQuery):
             await callback.answer("❌ Кошелек не найден")
             return
             
-        balances = await solana.get_all_balances(wallet['public_key'])
+        # Кнопка «Обновить» - явный запрос свежих данных из сети
+        balances = await portfolio_service.get_balances(user_id, wallet['public_key'], force=True)
         sol_price_usd = await price_service.get_sol_price()
         
         text = (
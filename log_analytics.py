@@ -0,0 +1,316 @@
+"""
+Офлайн-анализ логов бота: сделки, причины ошибок и задержки свопов.
+
+Файлы читаются построчно цепочкой генераторов, поэтому память не зависит
+от размера логов. Поддерживаются:
+- журнал транзакций (LOG_FILE) и журнал приложения (APP_LOG_FILE) в текстовом виде,
+  в том числе старый формат без trace_id и записи "Transaction: ... | Result: ...";
+- JSON-логи (LOG_JSON=true);
+- сжатые при ротации файлы .gz.
+
+Запуск:
+    python log_analytics.py logs/transactions*.log logs/bot*.log
+    python log_analytics.py logs/*.log* --since 2025-04-18 --json report.json
+
+Задержки:
+- confirm: от "Транзакция отправлена: <подпись>" до подтверждения той же подписи;
+- swap: от начала свопа до отправки транзакции (по trace_id, а в старых логах -
+  по последнему начатому свопу).
+Время в текстовых логах с точностью до секунды, поэтому и задержки тоже.
+"""
+import argparse
+import gzip
+import json
+import math
+import random
+import re
+import sys
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Сколько значений задержки хранить для перцентилей (резервуарная выборка)
+RESERVOIR_SIZE = 10000
+# Сколько отправленных, но еще не подтвержденных транзакций помнить
+MAX_PENDING = 10000
+
+_LINE_RE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(?:\.\d+)? \| (\w+)\s*\| (.*)$')
+_TRACE_RE = re.compile(r'^([0-9a-f]{32}|-) \| (.*)$')
+_SOURCE_RE = re.compile(r'^([\w.<>]+):([\w<>]+):(\d+) - (.*)$')
+
+_TRADE_RE = re.compile(
+    r'User: (?P<user>\d+) \| Type: (?P<type>\w+) \| Token: (?P<token>[^|]+?) \| '
+    r'Amount: (?P<amount>[^|]+?) \| (?:Status|Result): (?P<status>\w+)'
+    r'(?: \| (?:TX|Tx): \S+)?(?: \| Error: (?P<error>.*))?$'
+)
+_SWAP_START_RE = re.compile(r'Попытка 1/\d+ выполнения свопа|Начало выполнения свопа|Начало продажи токена')
+_SENT_RE = re.compile(r'Транзакция (?:успешно )?отправлена: (\w{32,})|Своп отправлен успешно: \S*/tx/(\w{32,})')
+_CONFIRMED_RE = re.compile(r'Swap confirmed! Transaction: (\w{32,})|Транзакция подтверждена(?:! ID)?: (\w{32,})')
+
+# Нормализация текста ошибок: подписи/адреса, числа и эмодзи не должны дробить причины
+_REASON_SUBS = (
+    (re.compile(r'https?://\S+'), '<url>'),
+    (re.compile(r'\b[1-9A-HJ-NP-Za-km-z]{32,}\b'), '<key>'),
+    (re.compile(r'\d+(?:\.\d+)?'), 'N'),
+    (re.compile(r'[^\w\s<>:{}\[\]\'",.()/=-]'), ''),
+    (re.compile(r'\s+'), ' '),
+)
+MAX_REASON_LENGTH = 100
+
+SUCCESS_STATUSES = {'success', 'ok', 'confirmed'}
+# Отправлена, но не подтверждена - ни успех, ни ошибка
+PENDING_STATUSES = {'pending'}
+
+
+@dataclass
+class Record:
+    time: datetime
+    level: str
+    message: str
+    name: str = ''
+    trace_id: str = '-'
+
+
+def read_lines(paths: Iterable[str]) -> Iterator[str]:
+    """Строки всех файлов по очереди; .gz распаковывается на лету"""
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                yield line.rstrip('\n')
+
+
+def _parse_json(line: str) -> Optional[Record]:
+    try:
+        record = json.loads(line)['record']
+        return Record(
+            time=datetime.fromtimestamp(record['time']['timestamp']),
+            level=record['level']['name'],
+            message=record['message'],
+            name=record.get('name') or '',
+            trace_id=record.get('extra', {}).get('trace_id', '-')
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def parse_records(lines: Iterable[str]) -> Iterator[Record]:
+    """
+    Разбирает строки логов в записи. Строки без заголовка (продолжения
+    многострочных сообщений, трейсбеки) пропускаются.
+    """
+    for line in lines:
+        if line.startswith('{'):
+            record = _parse_json(line)
+            if record:
+                yield record
+            continue
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        timestamp, level, rest = match.groups()
+        trace_id = '-'
+        trace = _TRACE_RE.match(rest)
+        if trace:
+            trace_id, rest = trace.groups()
+        name = ''
+        source = _SOURCE_RE.match(rest)
+        if source:
+            name, rest = source.group(1), source.group(4)
+        yield Record(datetime.fromisoformat(timestamp), level, rest, name, trace_id)
+
+
+def normalize_reason(error: str) -> str:
+    reason = error
+    for pattern, replacement in _REASON_SUBS:
+        reason = pattern.sub(replacement, reason)
+    reason = reason.strip(' .:')
+    return reason[:MAX_REASON_LENGTH] or 'unknown'
+
+
+class Reservoir:
+    """Равномерная выборка фиксированного размера из потока значений"""
+    def __init__(self, size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.size = size
+        self.count = 0
+        self.values: List[float] = []
+        self._rng = random.Random(seed)
+
+    def add(self, value: float):
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+            return
+        index = self._rng.randrange(self.count)
+        if index < self.size:
+            self.values[index] = value
+
+    def percentile(self, q: float) -> float:
+        """Перцентиль по методу ближайшего ранга"""
+        if not self.values:
+            return 0.0
+        ordered = sorted(self.values)
+        index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p99_s": self.percentile(99),
+            "max_s": max(self.values) if self.values else 0.0
+        }
+
+
+class Analyzer:
+    """Накопитель статистики по потоку записей"""
+    def __init__(self):
+        # час -> {"trades", "success", "error", тип сделки...}
+        self.hourly: Dict[str, Counter] = defaultdict(Counter)
+        self.failures: Counter = Counter()
+        self.failures_by_type: Dict[str, Counter] = defaultdict(Counter)
+        self.levels: Counter = Counter()
+        self.swap_latency = Reservoir()
+        self.confirm_latency = Reservoir()
+        self._swap_started: 'OrderedDict[str, datetime]' = OrderedDict()
+        self._sent: 'OrderedDict[str, datetime]' = OrderedDict()
+        self.records = 0
+
+    @staticmethod
+    def _remember(store: OrderedDict, key: str, value: datetime):
+        store[key] = value
+        store.move_to_end(key)
+        if len(store) > MAX_PENDING:
+            store.popitem(last=False)
+
+    def feed(self, record: Record):
+        self.records += 1
+        self.levels[record.level] += 1
+        message = record.message
+
+        trade = _TRADE_RE.search(message)
+        if trade:
+            self._trade(record, trade)
+            return
+        if _SWAP_START_RE.search(message):
+            self._remember(self._swap_started, record.trace_id, record.time)
+            return
+        sent = _SENT_RE.search(message)
+        if sent:
+            signature = sent.group(1) or sent.group(2)
+            if signature not in self._sent:
+                self._remember(self._sent, signature, record.time)
+            started = self._swap_started.pop(record.trace_id, None)
+            if started is not None:
+                self.swap_latency.add((record.time - started).total_seconds())
+            return
+        confirmed = _CONFIRMED_RE.search(message)
+        if confirmed:
+            sent_at = self._sent.pop(confirmed.group(1) or confirmed.group(2), None)
+            if sent_at is not None:
+                self.confirm_latency.add((record.time - sent_at).total_seconds())
+
+    def _trade(self, record: Record, match: re.Match):
+        tx_type = match.group('type').lower()
+        status = match.group('status').lower()
+        success = status in SUCCESS_STATUSES
+        hour = self.hourly[record.time.strftime('%Y-%m-%d %H:00')]
+        hour['trades'] += 1
+        hour[tx_type] += 1
+        if status in PENDING_STATUSES:
+            hour['pending'] += 1
+            return
+        hour['success' if success else 'error'] += 1
+        if not success:
+            reason = normalize_reason(match.group('error') or 'no error message')
+            self.failures[reason] += 1
+            self.failures_by_type[tx_type][reason] += 1
+
+    def report(self, top: int) -> dict:
+        trades = sum(h['trades'] for h in self.hourly.values())
+        errors = sum(h['error'] for h in self.hourly.values())
+        return {
+            "records": self.records,
+            "levels": dict(self.levels),
+            "trades": trades,
+            "errors": errors,
+            "error_rate": round(errors / trades, 4) if trades else 0.0,
+            "hourly": {hour: dict(counts) for hour, counts in sorted(self.hourly.items())},
+            "failure_reasons": self.failures.most_common(top),
+            "failure_reasons_by_type": {t: c.most_common(top) for t, c in sorted(self.failures_by_type.items())},
+            "swap_latency": self.swap_latency.summary(),
+            "confirm_latency": self.confirm_latency.summary(),
+            "unconfirmed": len(self._sent)
+        }
+
+
+def filter_time(records: Iterable[Record], since: Optional[datetime], until: Optional[datetime]) -> Iterator[Record]:
+    for record in records:
+        if since and record.time < since:
+            continue
+        if until and record.time >= until:
+            continue
+        yield record
+
+
+def analyze(paths: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None,
+            top: int = 10) -> dict:
+    analyzer = Analyzer()
+    for record in filter_time(parse_records(read_lines(paths)), since, until):
+        analyzer.feed(record)
+    return analyzer.report(top)
+
+
+def print_report(report: dict):
+    print(f"Records: {report['records']}  levels: {report['levels']}")
+    print(f"Trades: {report['trades']}  errors: {report['errors']} ({report['error_rate']:.1%})")
+
+    print("\nPer hour:")
+    print(f"{'hour':<17} {'trades':>7} {'ok':>5} {'err':>5}  by type")
+    for hour, counts in report['hourly'].items():
+        by_type = ', '.join(f"{k}={v}" for k, v in sorted(counts.items()) if k not in ('trades', 'success', 'error', 'pending'))
+        print(f"{hour:<17} {counts.get('trades', 0):>7} {counts.get('success', 0):>5} {counts.get('error', 0):>5}  {by_type}")
+
+    print("\nFailure reasons:")
+    for reason, count in report['failure_reasons']:
+        print(f"{count:>6}  {reason}")
+
+    for title, key in (("Swap (start -> sent)", 'swap_latency'), ("Confirmation (sent -> confirmed)", 'confirm_latency')):
+        s = report[key]
+        print(f"\n{title}: n={s['count']}  p50={s['p50_s']:.0f}s  p90={s['p90_s']:.0f}s  "
+              f"p99={s['p99_s']:.0f}s  max={s['max_s']:.0f}s")
+    print(f"Sent without confirmation in logs: {report['unconfirmed']}")
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming analytics for bot transaction and application logs")
+    parser.add_argument('paths', nargs='+', help="log files (.log, .gz), in chronological order")
+    parser.add_argument('--since', type=_parse_time, help="ISO date/time, inclusive")
+    parser.add_argument('--until', type=_parse_time, help="ISO date/time, exclusive")
+    parser.add_argument('--top', type=int, default=10, help="number of failure reasons to show")
+    parser.add_argument('--json', dest='json_path', help="write the report to this file ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = analyze(args.paths, args.since, args.until, args.top)
+    if args.json_path == '-':
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return 0
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Единая настройка логирования приложения.
+
+Обработчики:
+- консоль (stderr) - все записи;
+- журнал приложения (APP_LOG_FILE) - все записи, кроме журнала транзакций;
+- журнал транзакций (LOG_FILE) - только записи log_transaction (extra["transaction"]).
+
+Уровни задаются общим LOG_LEVEL и переопределяются для подсистем через
+LOG_LEVELS, например "aiogram=WARNING,services.jupiter_service=INFO":
+действует самый длинный совпавший префикс имени модуля.
+
+Все обработчики с enqueue=True. Фильтрация и форматирование записи
+выполняются в вызывающем потоке (т.е. в потоке event loop), поэтому фильтры
+и формат должны оставаться дешевыми; запись в поток или файл, ротация и
+сжатие файлов выполняются фоновым потоком loguru.
+"""
+import sys
+from collections import defaultdict
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import (
+    APP_LOG_FILE,
+    LOG_DEBUG_SAMPLE_EVERY,
+    LOG_FILE,
+    LOG_JSON,
+    LOG_LEVEL,
+    LOG_LEVELS
+)
+from services.tracing import log_patcher
+
+CONSOLE_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    "<magenta>{extra[trace_id]}</magenta> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+APP_FILE_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {extra[trace_id]} | {name}:{function}:{line} - {message}"
+TRANSACTION_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {message}"
+
+# Логгер для частых debug-событий: в обработчики попадает только каждое N-е
+sampled_logger = logger.bind(sampled=True)
+_configured = False
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Разбирает LOG_LEVELS ("модуль=УРОВЕНЬ,...") в {префикс модуля: номер уровня}"""
+    levels = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        module, _, level = item.partition('=')
+        levels[module.strip()] = logger.level(level.strip().upper()).no
+    return levels
+
+
+class LevelFilter:
+    """
+    Фильтр обработчика: уровень по подсистеме и выборка sampled-событий.
+    Уровень для имени модуля вычисляется один раз и кэшируется.
+    Счетчики выборки у каждого экземпляра свои - по фильтру на обработчик.
+    """
+    def __init__(self, default_level: str, overrides: Dict[str, int], sample_every: int = LOG_DEBUG_SAMPLE_EVERY):
+        self.default = logger.level(default_level.upper()).no
+        self.overrides = overrides
+        self.sample_every = sample_every
+        self._cache: Dict[Optional[str], int] = {}
+        self._sample_counters = defaultdict(int)
+
+    @property
+    def min_level(self) -> int:
+        """Минимальный уровень, который нужно передать loguru как level обработчика"""
+        return min([self.default, *self.overrides.values()])
+
+    def level_for(self, name: Optional[str]) -> int:
+        level = self._cache.get(name)
+        if level is None:
+            level = self.default
+            best = -1
+            for prefix, prefix_level in self.overrides.items():
+                if name and (name == prefix or name.startswith(prefix + '.')) and len(prefix) > best:
+                    level, best = prefix_level, len(prefix)
+            self._cache[name] = level
+        return level
+
+    def __call__(self, record) -> bool:
+        if record["level"].no < self.level_for(record["name"]):
+            return False
+        if record["extra"].get("sampled"):
+            key = (record["name"], record["line"])
+            count = self._sample_counters[key]
+            self._sample_counters[key] = count + 1
+            return count % self.sample_every == 0
+        return True
+
+
+def _not_transaction(level_filter: LevelFilter):
+    return lambda record: "transaction" not in record["extra"] and level_filter(record)
+
+
+def _level_filter() -> LevelFilter:
+    return LevelFilter(LOG_LEVEL, parse_levels(LOG_LEVELS))
+
+
+def setup_logging(console: bool = True):
+    """
+    Настраивает обработчики loguru; повторные вызовы ничего не делают.
+    Вызывается один раз при старте приложения (main.py).
+    """
+    global _configured
+    if _configured:
+        return
+    min_level = _level_filter().min_level
+    logger.remove()  # Удаляем стандартный обработчик и все добавленные ранее
+    logger.configure(patcher=log_patcher)  # trace_id текущего апдейта в каждой записи
+    if console:
+        logger.add(
+            sys.stderr,
+            level=min_level,
+            format=CONSOLE_FORMAT,
+            filter=_level_filter(),
+            enqueue=True
+        )
+    logger.add(
+        APP_LOG_FILE,
+        level=min_level,
+        format=APP_FILE_FORMAT,
+        filter=_not_transaction(_level_filter()),
+        serialize=LOG_JSON,
+        rotation="1 day",
+        retention="7 days",
+        compression="gz",
+        enqueue=True
+    )
+    # Журнал транзакций пишется всегда, независимо от уровней подсистем
+    logger.add(
+        LOG_FILE,
+        format=TRANSACTION_FORMAT,
+        filter=lambda record: "transaction" in record["extra"],
+        serialize=LOG_JSON,
+        rotation="1 day",
+        retention="30 days",
+        compression="gz",
+        enqueue=True
+    )
+    _configured = True
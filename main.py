@@ -15,33 +15,55 @@ from aiogram.utils.markdown import hbold
 from dotenv import load_dotenv
 from aiogram.fsm.context import FSMContext
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from solana.rpc.async_api import AsyncClient
 
 from config import (
     TELEGRAM_BOT_TOKEN,
+    TELEGRAM_API_URL,
     FIREBASE_CREDENTIALS_PATH,
     FIREBASE_CONFIG,
-    LOG_FILE
+    SOLANA_RPC_URL
 )
 from handlers import start
 # Импортируем объединенный маршрутизатор из handlers
 from handlers import router as handlers_router
+from services.price_feed import price_feed
+from services.price_stream import price_stream
+from services.order_engine import order_engine
+from services.dca_scheduler import dca_scheduler
+from services.price_alerts import price_alerts
+from services.telegram_sender import telegram_sender
+from services.broadcast import broadcaster
+from services.key_rotation import key_reencryptor
+from services.account_subscriptions import account_subscriptions
+from services.ops_server import ops_server
+from services.health import health
+from services.loop_monitor import loop_monitor
+from services.profiler import profiler
+from middlewares import MetricsMiddleware, TracingMiddleware
+from services.tracing import exporter as trace_exporter
+from services.registry import service_registry
+from services.startup import Phase, StartupError, startup
+from services.firebase_service import FirebaseService
+from services.wallet import WalletService
+from services.solana_service import SolanaService
+from services.jupiter_service import JupiterService
+from services.price_service import PriceService
+from logging_setup import setup_logging
 
 # Настройка логирования
-logger.remove()  # Удаляем стандартный обработчик
-logger.add(
-    sys.stderr,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
-)
-logger.add(
-    LOG_FILE,
-    rotation="1 day",
-    retention="7 days",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
-)
+setup_logging()
 
 # Загрузка переменных окружения
 load_dotenv()
 
+# Сервисы, которые создаются заранее при запуске (остальные - при первом обращении)
+CORE_SERVICES = (FirebaseService, WalletService, SolanaService, JupiterService, PriceService)
+SOLANA_CHECK_TIMEOUT = 15
+
 # Инициализация Firebase
 def init_firebase():
     try:
@@ -51,11 +73,12 @@ def init_firebase():
             logger.info("Firebase initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize Firebase: {e}")
-        sys.exit(1)
+        raise
 
 # Инициализация бота и диспетчера
 bot = Bot(
     token=TELEGRAM_BOT_TOKEN,
+    session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None,
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
 
@@ -70,6 +93,13 @@ dp = Dispatcher(
 # Регистрация маршрутизаторов
 dp.include_router(handlers_router)  # Включает все обработчики из handlers/__init__.py
 
+# Span на каждый апдейт Telegram
+dp.update.outer_middleware(TracingMiddleware())
+
+# Метрики времени работы хэндлеров (внутренние middleware применяются ко всем вложенным роутерам)
+dp.message.middleware(MetricsMiddleware())
+dp.callback_query.middleware(MetricsMiddleware())
+
 # Настройка команд бота
 async def setup_commands(bot: Bot):
     """Настройка команд бота"""
@@ -85,7 +115,10 @@ async def setup_commands(bot: Bot):
             BotCommand(command="sell", description="Продать токены"),
             BotCommand(command="withdraw", description="Вывести средства"),
             BotCommand(command="export_keys", description="Экспортировать ключи"),
-            BotCommand(command="balance", description="Показать баланс")
+            BotCommand(command="balance", description="Показать баланс"),
+            BotCommand(command="orders", description="Лимитные и стоп-ордера"),
+            BotCommand(command="dca", description="Регулярные покупки (DCA)"),
+            BotCommand(command="alerts", description="Ценовые алерты")
         ])
         logger.info("Команды бота успешно настроены")
     except Exception as e:
@@ -102,40 +135,65 @@ async def shutdown(loop):
     loop.stop()
     logger.info("Shutdown complete.")
 
-def check_solana_connection():
-    """Проверка подключения к Solana RPC"""
+async def check_solana_connection():
+    """Проверка подключения к Solana RPC (getSlot)"""
+    client = AsyncClient(SOLANA_RPC_URL)
     try:
-        from solana.rpc.api import Client
-        from config import SOLANA_RPC_URL
-
-        client = Client(SOLANA_RPC_URL)
-        # Проверяем подключение через getSlot
-        slot = client.get_slot()
-        if slot.value:
-            logger.info(f"Successfully connected to Solana RPC. Current slot: {slot.value}")
-            return True
-        else:
-            logger.error("Failed to connect to Solana RPC: Could not get current slot")
-            return False
-    except Exception as e:
-        logger.error(f"Error connecting to Solana RPC: {e}")
-        return False
+        slot = (await client.get_slot()).value
+        if not slot:
+            raise ConnectionError("Could not get current slot")
+        logger.info(f"Successfully connected to Solana RPC. Current slot: {slot}")
+    finally:
+        await client.close()
 
 async def main():
     """Запуск бота"""
     try:
         logger.info("Starting bot...")
         
-        # Инициализация Firebase
-        init_firebase()
-        
-        # Проверка подключения к Solana
-        if not check_solana_connection():
-            logger.error("Failed to connect to Solana RPC. Exiting...")
+        # Этап 1: монитор event loop, Firebase, проверка Solana RPC, служебный HTTP-сервер (/metrics) и экспорт трасс
+        # Этап 2: сервисы (после Firebase), цена SOL/USD, подписки на кошельки, очередь отправки сообщений, команды бота
+        # Этап 3: ордера, планы DCA и алерты из Firestore, перешифрование ключей - после создания сервисов:
+        #         warm_up строит их в потоке под блокировкой реестра, и обращение к реестру из event loop
+        #         в том же этапе заблокировало бы его до конца сборки
+        startup.stage(
+            Phase('loop_monitor', loop_monitor.start),
+            Phase('firebase', lambda: asyncio.to_thread(init_firebase)),
+            Phase('solana_rpc', check_solana_connection, timeout=SOLANA_CHECK_TIMEOUT),
+            Phase('ops_server', ops_server.start),
+            Phase('trace_exporter', trace_exporter.start),
+        ).stage(
+            Phase('services', lambda: service_registry.warm_up(CORE_SERVICES)),
+            Phase('price_feed', price_feed.start),
+            Phase('account_subscriptions', account_subscriptions.start),
+            Phase('telegram_sender', lambda: telegram_sender.start(bot)),
+            Phase('bot_commands', lambda: setup_commands(bot), critical=False),
+        ).stage(
+            Phase('order_engine', order_engine.start),
+            Phase('dca_scheduler', dca_scheduler.start),
+            Phase('price_alerts', price_alerts.start),
+            Phase('key_rotation', lambda: key_reencryptor.start(service_registry.get(FirebaseService).save_private_keys)),
+        ).stage(
+            # Поток цен - после загрузки ордеров и алертов; проверки готовности - когда фоновые задачи уже запущены
+            Phase('price_stream', price_stream.start),
+            # Продолжение рассылки, прерванной перезапуском
+            Phase('broadcast', broadcaster.start, critical=False),
+            Phase('health_checks', health.start),
+        )
+        # Уведомления подключаются до запуска: ордера и планы DCA могут сработать
+        # сразу после загрузки, сообщения ждут в очереди до старта telegram_sender
+        order_engine.notify = telegram_sender.send
+        dca_scheduler.notify = telegram_sender.send
+        try:
+            await startup.run()
+        except StartupError as e:
+            logger.error(f"Startup failed: {e}. Exiting...")
             return
+        services = ', '.join(f"{name}={seconds:.3f}s" for name, seconds in service_registry.timings.items())
+        logger.info(f"Services created: {services}")
         
-        # Настройка команд бота
-        await setup_commands(bot)
+        # Профилирование по сигналу SIGUSR2 (на Windows недоступно)
+        profiler.install_signal_handler(asyncio.get_running_loop())
         
         logger.info("Bot is ready to accept messages")
         
@@ -144,6 +202,20 @@ async def main():
     except Exception as e:
         logger.error(f"Error starting bot: {e}")
         raise
+    finally:
+        await health.stop()
+        await price_stream.stop()
+        await order_engine.stop()
+        await dca_scheduler.stop()
+        await broadcaster.stop()
+        await telegram_sender.stop()
+        await key_reencryptor.stop()
+        await account_subscriptions.stop()
+        await price_feed.stop()
+        await ops_server.stop()
+        await trace_exporter.stop()
+        await loop_monitor.stop()
+        await logger.complete()  # дожидаемся записи очереди логов
 
 if __name__ == "__main__":
     try:
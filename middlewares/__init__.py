@@ -0,0 +1,4 @@
+from middlewares.metrics import MetricsMiddleware
+from middlewares.tracing import TracingMiddleware
+
+__all__ = ['MetricsMiddleware', 'TracingMiddleware']
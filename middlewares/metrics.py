@@ -0,0 +1,26 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from services.metrics import HANDLER_DURATION
+from services.tracing import set_attribute
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: замеряет время работы каждого хэндлера.
+    Метка handler - имя функции-обработчика (cmd_start, process_token, ...).
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get('handler')
+        callback = getattr(handler_object, 'callback', None)
+        name = getattr(callback, '__name__', 'unknown')
+        set_attribute('handler', name)
+        with HANDLER_DURATION.time(handler=name):
+            return await handler(event, data)
@@ -0,0 +1,28 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from services.tracing import start_span
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на апдейты: открывает корневой span на каждый апдейт
+    Telegram. Span сервисов, вызванных из хэндлера, становятся его дочерними.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        attributes = {}
+        if isinstance(event, Update):
+            attributes['update.id'] = event.update_id
+            attributes['update.type'] = event.event_type
+        user = data.get('event_from_user')
+        if user is not None:
+            attributes['user.id'] = user.id
+        with start_span('telegram.update', **attributes):
+            return await handler(event, data)
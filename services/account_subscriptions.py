@@ -0,0 +1,317 @@
+import asyncio
+import base64
+import json
+import random
+import time
+from collections import OrderedDict
+from typing import Coroutine, Dict, Optional, Set, Tuple
+
+import websockets
+from loguru import logger
+
+from config import (
+    SOLANA_WS_URL,
+    SUBSCRIPTION_IDLE_TIMEOUT,
+    SUBSCRIPTION_MAX_USERS
+)
+from services.portfolio_service import portfolio_service
+from services.spl_token_decoder import (
+    TOKEN_2022_PROGRAM_ID,
+    TOKEN_ACCOUNT_SIZE,
+    TOKEN_OWNER_OFFSET,
+    TOKEN_PROGRAM_ID,
+    decode_token_account
+)
+
+REQUEST_TIMEOUT = 10
+RECONNECT_DELAY_MAX = 60
+
+
+class AccountSubscriptionManager:
+    """
+    Подписки на изменения аккаунтов через websocket Solana RPC.
+
+    Для активных пользователей открывается accountSubscribe на кошелек (баланс
+    SOL) и programSubscribe на Token и Token-2022 с фильтром по владельцу (балансы
+    SPL токенов). Уведомления сразу применяются к снимкам PortfolioService,
+    поэтому экраны балансов не опрашивают RPC. Все подписки идут через одно
+    соединение; после переподключения они восстанавливаются. Подписки
+    пользователей, не активных SUBSCRIPTION_IDLE_TIMEOUT секунд, закрываются,
+    а число отслеживаемых кошельков ограничено SUBSCRIPTION_MAX_USERS.
+    """
+    def __init__(
+        self,
+        url: str = SOLANA_WS_URL,
+        idle_timeout: float = SUBSCRIPTION_IDLE_TIMEOUT,
+        max_users: int = SUBSCRIPTION_MAX_USERS
+    ):
+        self.url = url
+        self.idle_timeout = idle_timeout
+        self.max_users = max_users
+        self.portfolio = portfolio_service
+        # user_id -> {"public_key", "last_seen", "subscriptions": [id, ...]}
+        self._users: "OrderedDict[int, dict]" = OrderedDict()
+        # id подписки -> (user_id, метод отписки)
+        self._subscriptions: Dict[int, Tuple[int, str]] = {}
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._request_id = 0
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        # Подписки, отписки и применение уведомлений - ссылки держатся до завершения задачи
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Запускает соединение с websocket RPC и очистку неактивных подписок"""
+        if self._task is not None:
+            return
+        self.portfolio.watcher = self
+        self._task = asyncio.create_task(self._run(), name="account-subscriptions")
+        self._sweeper = asyncio.create_task(self._sweep_idle(), name="account-subscriptions-sweeper")
+        logger.info(f"Account subscriptions started: {self.url}")
+
+    async def stop(self):
+        """Закрывает соединение и отключает push-обновления портфелей"""
+        self.portfolio.watcher = None
+        for task in (self._task, self._sweeper):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._sweeper = None
+        background = list(self._background)
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        for user_id in list(self._users):
+            self.portfolio.set_live(user_id, False)
+        self._users.clear()
+        logger.info("Account subscriptions stopped")
+
+    def touch(self, user_id: int, public_key: str):
+        """
+        Отмечает активность пользователя. Для новых кошельков открывает подписки,
+        при превышении лимита закрывает подписки самого давно неактивного.
+        """
+        entry = self._users.get(user_id)
+        if entry is not None and entry['public_key'] == public_key:
+            entry['last_seen'] = time.monotonic()
+            self._users.move_to_end(user_id)
+            return
+
+        if entry is not None:
+            # Пользователь сменил кошелек
+            self._forget(user_id)
+        self._users[user_id] = {
+            "public_key": public_key,
+            "last_seen": time.monotonic(),
+            "subscriptions": []
+        }
+        while len(self._users) > self.max_users:
+            oldest = next(iter(self._users))
+            logger.debug(f"Subscription limit reached, dropping user {oldest}")
+            self._forget(oldest)
+
+        if self.is_connected:
+            self._spawn(self._watch(user_id, public_key))
+
+    def _forget(self, user_id: int):
+        entry = self._users.pop(user_id, None)
+        self.portfolio.set_live(user_id, False)
+        if entry and entry['subscriptions'] and self.is_connected:
+            self._spawn(self._unsubscribe(entry['subscriptions']))
+
+    def _spawn(self, coro: Coroutine):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Account subscription task failed: {task.exception()!r}")
+
+    async def _watch(self, user_id: int, public_key: str):
+        subscriptions = []
+        try:
+            account_sub = await self._call(
+                "accountSubscribe",
+                [public_key, {"encoding": "base64", "commitment": "confirmed"}]
+            )
+            self._subscriptions[account_sub] = (user_id, "accountUnsubscribe")
+            subscriptions.append(account_sub)
+            for program_id, filters in (
+                (TOKEN_PROGRAM_ID, [{"dataSize": TOKEN_ACCOUNT_SIZE}]),
+                # Аккаунты Token-2022 имеют переменный размер из-за расширений
+                (TOKEN_2022_PROGRAM_ID, [])
+            ):
+                token_sub = await self._call(
+                    "programSubscribe",
+                    [
+                        program_id,
+                        {
+                            "encoding": "base64",
+                            "commitment": "confirmed",
+                            "filters": filters + [
+                                {"memcmp": {"offset": TOKEN_OWNER_OFFSET, "bytes": public_key}}
+                            ]
+                        }
+                    ]
+                )
+                self._subscriptions[token_sub] = (user_id, "programUnsubscribe")
+                subscriptions.append(token_sub)
+        except Exception as e:
+            logger.warning(f"Failed to subscribe wallet of user {user_id}: {e}")
+            await self._unsubscribe(subscriptions)
+            return
+
+        entry = self._users.get(user_id)
+        if entry is None or entry['public_key'] != public_key:
+            # Пока подписывались, пользователь был удален или сменил кошелек
+            await self._unsubscribe(subscriptions)
+            return
+        entry['subscriptions'] = subscriptions
+
+        subscribed_at = time.monotonic()
+        try:
+            # Базовый снимок читается после открытия подписок, чтобы не пропустить изменения
+            snapshot = await self.portfolio.get_snapshot(user_id, public_key, force_network=True)
+        except Exception as e:
+            logger.warning(f"Failed to load baseline portfolio of user {user_id}: {e}")
+            return
+        if snapshot['updated_at'] < subscribed_at:
+            # RPC недоступен и вернулся прежний снимок - он старше подписок, остаемся на опросе
+            logger.warning(f"Baseline portfolio of user {user_id} is stale, not switching to push updates")
+            return
+        if user_id in self._users:
+            self.portfolio.set_live(user_id, True)
+            logger.debug(f"Watching wallet {public_key} of user {user_id}")
+
+    async def _unsubscribe(self, subscriptions):
+        for subscription in subscriptions:
+            target = self._subscriptions.pop(subscription, None)
+            if target is None:
+                continue
+            try:
+                await self._call(target[1], [subscription])
+            except Exception as e:
+                logger.debug(f"Failed to unsubscribe {subscription}: {e}")
+
+    async def _call(self, method: str, params: list):
+        if not self.is_connected:
+            raise ConnectionError("websocket is not connected")
+        self._request_id += 1
+        request_id = self._request_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._ws.send(json.dumps({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": method,
+                "params": params
+            }))
+            return await asyncio.wait_for(future, REQUEST_TIMEOUT)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, max_size=None) as ws:
+                    self._ws = ws
+                    delay = 1
+                    logger.info(f"Connected to {self.url}, restoring {len(self._users)} subscriptions")
+                    for user_id, entry in list(self._users.items()):
+                        self._spawn(self._watch(user_id, entry['public_key']))
+                    async for raw in ws:
+                        self._dispatch(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Account subscriptions connection lost: {e}")
+            finally:
+                self._on_disconnect()
+            # Экспоненциальная задержка со случайным разбросом
+            await asyncio.sleep(delay + random.random())
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def _on_disconnect(self):
+        self._ws = None
+        # Без соединения снимки снова обновляются опросом RPC
+        for user_id, entry in self._users.items():
+            self.portfolio.set_live(user_id, False)
+            entry['subscriptions'] = []
+        self._subscriptions.clear()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("websocket disconnected"))
+        self._pending.clear()
+
+    def _dispatch(self, raw):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.warning(f"Invalid websocket message: {raw[:200]}")
+            return
+
+        if 'id' in message:
+            future = self._pending.get(message['id'])
+            if future is None or future.done():
+                return
+            if 'error' in message:
+                future.set_exception(Exception(message['error'].get('message', message['error'])))
+            else:
+                future.set_result(message.get('result'))
+            return
+
+        method = message.get('method')
+        params = message.get('params') or {}
+        target = self._subscriptions.get(params.get('subscription'))
+        if target is None:
+            return
+        user_id = target[0]
+        value = (params.get('result') or {}).get('value') or {}
+
+        if method == 'accountNotification':
+            self.portfolio.set_sol_lamports(user_id, value.get('lamports', 0))
+        elif method == 'programNotification':
+            account = value.get('account') or {}
+            token = decode_token_account(base64.b64decode((account.get('data') or [''])[0]))
+            if token is None:
+                return
+            self._spawn(self._apply_token(user_id, token['mint'], token['amount'], value.get('pubkey')))
+
+    async def _apply_token(self, user_id: int, mint: str, amount: int, pubkey: Optional[str]):
+        try:
+            await self.portfolio.ensure_decimals([mint])
+        except Exception as e:
+            logger.warning(f"Failed to get decimals for {mint}: {e}")
+        self.portfolio.set_token_account(user_id, mint, amount, pubkey)
+
+    async def _sweep_idle(self):
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - self.idle_timeout
+            idle = [user_id for user_id, entry in self._users.items() if entry['last_seen'] < deadline]
+            for user_id in idle:
+                self._forget(user_id)
+            if idle:
+                logger.debug(f"Dropped subscriptions of {len(idle)} idle users, watching {len(self._users)}")
+
+
+# Общий экземпляр для всего приложения
+account_subscriptions = AccountSubscriptionManager()
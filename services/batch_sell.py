@@ -0,0 +1,231 @@
+import asyncio
+import html
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import base58
+from loguru import logger
+from solana.keypair import Keypair
+
+from config import (
+    BATCH_SELL_CONCURRENCY,
+    BATCH_SELL_CONFIRM_INTERVAL,
+    BATCH_SELL_CONFIRM_TIMEOUT,
+    SOL_MINT
+)
+from services.firebase_service import FirebaseService
+from services.jupiter_service import CONFIRMED_STATUSES, JupiterService, sell_slippage
+from services.metrics import SWAP_CONFIRMATION
+from services.portfolio_service import portfolio_service
+from services.registry import service_registry
+from services.utils import decrypt_private_key
+from utils import log_transaction
+
+# Результат продажи одного токена
+STATUS_SENT = 'sent'            # отправлена, ждет подтверждения
+STATUS_CONFIRMED = 'confirmed'
+STATUS_FAILED = 'failed'        # нет маршрута, ошибка отправки или транзакция с ошибкой
+STATUS_PENDING = 'pending'      # не подтвердилась за BATCH_SELL_CONFIRM_TIMEOUT
+
+firebase = service_registry.lazy(FirebaseService)
+jupiter = service_registry.lazy(JupiterService)
+
+Progress = Callable[[List[Dict]], Awaitable[None]]
+
+
+class BatchSellError(Exception):
+    """Пакетную продажу нельзя начать (текст показывается пользователю)"""
+
+
+class BatchSeller:
+    """
+    Продажа нескольких токенов за SOL одной операцией ("продать все / выбранные").
+
+    Балансы берутся из свежего снимка портфеля (один запрос токен-аккаунтов).
+    Котировки и транзакции Jupiter запрашиваются для всех токенов параллельно,
+    не больше BATCH_SELL_CONCURRENCY одновременно. Ключ расшифровывается один
+    раз, каждая транзакция подписывается и отправляется, как только готова.
+    Подтверждения всех отправленных транзакций проверяются одним запросом
+    getSignatureStatuses раз в BATCH_SELL_CONFIRM_INTERVAL секунд.
+    """
+    def __init__(
+        self,
+        concurrency: int = BATCH_SELL_CONCURRENCY,
+        confirm_interval: float = BATCH_SELL_CONFIRM_INTERVAL,
+        confirm_timeout: float = BATCH_SELL_CONFIRM_TIMEOUT
+    ):
+        self.concurrency = concurrency
+        self.confirm_interval = confirm_interval
+        self.confirm_timeout = confirm_timeout
+        self._active: Set[int] = set()
+
+    async def sell(
+        self,
+        user_id: int,
+        mints: Optional[List[str]] = None,
+        percent: int = 100,
+        progress: Optional[Progress] = None
+    ) -> List[Dict]:
+        """
+        Продает токены пользователя за SOL
+
+        Args:
+            user_id: Telegram ID пользователя
+            mints: Адреса токенов; None - все токены с ненулевым балансом
+            percent: Доля баланса каждого токена, проценты
+            progress: Вызывается со списком результатов после отправки всех транзакций
+
+        Returns:
+            List[Dict]: По токену: mint, symbol, amount, ui_amount, status,
+                signature, out_amount (lamports по котировке), error
+        """
+        if user_id in self._active:
+            raise BatchSellError("Продажа уже выполняется, дождитесь результата")
+        self._active.add(user_id)
+        try:
+            return await self._sell(user_id, mints, percent, progress)
+        finally:
+            self._active.discard(user_id)
+
+    async def _sell(self, user_id: int, mints: Optional[List[str]], percent: int, progress: Optional[Progress]) -> List[Dict]:
+        wallet = await firebase.get_user_wallet(user_id)
+        if not wallet or not wallet.get('public_key') or not wallet.get('private_key'):
+            raise BatchSellError("Кошелек не найден. Используйте /start для создания.")
+        snapshot = await portfolio_service.get_snapshot(user_id, wallet['public_key'], force=True)
+
+        items = []
+        for mint, token in snapshot['tokens'].items():
+            amount = token['amount'] * percent // 100
+            if amount <= 0 or (mints is not None and mint not in mints):
+                continue
+            items.append({
+                'mint': mint,
+                'symbol': portfolio_service.symbol_for(mint),
+                'amount': amount,
+                'ui_amount': amount / 10 ** token['decimals'],
+                'status': None,
+                'signature': None,
+                'out_amount': None,
+                'error': None
+            })
+        if not items:
+            raise BatchSellError("Нет токенов для продажи")
+
+        # Ключ расшифровывается один раз на все транзакции
+        keypair = Keypair.from_secret_key(base58.b58decode(decrypt_private_key(wallet['private_key'])))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+        await asyncio.gather(*(self._submit(item, wallet['public_key'], keypair, semaphore) for item in items))
+        sent = [item for item in items if item['status'] == STATUS_SENT]
+        logger.info(f"Batch sell for user {user_id}: {len(sent)}/{len(items)} transactions sent in {time.monotonic() - started:.1f}s")
+        if progress is not None and sent:
+            try:
+                await progress(items)
+            except Exception as e:
+                logger.warning(f"Failed to report batch sell progress: {e}")
+
+        await self._confirm(sent)
+        for item in items:
+            self._record(user_id, item)
+        return items
+
+    async def _submit(self, item: Dict, public_key: str, keypair: Keypair, semaphore: asyncio.Semaphore):
+        try:
+            # Ограничиваются только запросы к Jupiter; подпись и отправка - сразу по готовности
+            async with semaphore:
+                quote = await jupiter.get_best_route(
+                    input_mint=item['mint'],
+                    output_mint=SOL_MINT,
+                    amount=item['amount'],
+                    slippage=sell_slippage(item['mint'])
+                )
+                if not quote or not quote.get('routePlan'):
+                    raise Exception("Нет маршрута для продажи")
+                swap_transaction = await jupiter.get_swap_transaction(public_key, quote)
+                if not swap_transaction:
+                    raise Exception("Не удалось получить транзакцию свопа")
+            item['out_amount'] = int(quote['outAmount'])
+            item['signature'] = await jupiter.send_signed_transaction(
+                jupiter.sign_swap_transaction(swap_transaction, keypair)
+            )
+            item['sent_at'] = time.perf_counter()
+            item['status'] = STATUS_SENT
+        except Exception as e:
+            logger.error(f"Batch sell of {item['mint']} failed: {e}")
+            item['status'] = STATUS_FAILED
+            item['error'] = str(e)
+
+    async def _confirm(self, items: List[Dict]):
+        """Опрос статусов всех отправленных транзакций одним запросом за раз"""
+        pending = {item['signature']: item for item in items}
+        deadline = time.monotonic() + self.confirm_timeout
+        while pending and time.monotonic() < deadline:
+            await asyncio.sleep(self.confirm_interval)
+            signatures = list(pending)
+            try:
+                statuses = await jupiter.get_signature_statuses(signatures)
+            except Exception as e:
+                logger.warning(f"Failed to get signature statuses: {e}")
+                continue
+            for signature, status in zip(signatures, statuses):
+                if status is None:
+                    continue
+                item = pending[signature]
+                if status.err:
+                    item['status'] = STATUS_FAILED
+                    item['error'] = f"Транзакция завершилась с ошибкой: {status.err}"
+                elif status.confirmation_status in CONFIRMED_STATUSES:
+                    item['status'] = STATUS_CONFIRMED
+                else:
+                    continue
+                SWAP_CONFIRMATION.observe(time.perf_counter() - item['sent_at'], status=item['status'])
+                del pending[signature]
+        for item in pending.values():
+            item['status'] = STATUS_PENDING
+            SWAP_CONFIRMATION.observe(time.perf_counter() - item['sent_at'], status=STATUS_PENDING)
+
+    @staticmethod
+    def _record(user_id: int, item: Dict):
+        if item['status'] == STATUS_FAILED:
+            log_transaction(user_id, 'sell', item['mint'], item['ui_amount'], 'error',
+                            tx_signature=item['signature'], error=item['error'])
+            return
+        if item['status'] == STATUS_PENDING:
+            # Исход неизвестен - балансы не трогаем, снимок портфеля сверится с сетью
+            log_transaction(user_id, 'sell', item['mint'], item['ui_amount'], STATUS_PENDING,
+                            tx_signature=item['signature'])
+            return
+        log_transaction(user_id, 'sell', item['mint'], item['ui_amount'], 'success', tx_signature=item['signature'])
+        portfolio_service.record_swap(user_id, item['mint'], item['amount'], SOL_MINT, item['out_amount'])
+
+    @staticmethod
+    def format_report(items: List[Dict]) -> str:
+        icons = {
+            STATUS_SENT: "📤",
+            STATUS_CONFIRMED: "🟢",
+            STATUS_FAILED: "🔴",
+            STATUS_PENDING: "🟡"
+        }
+        confirmed = [item for item in items if item['status'] == STATUS_CONFIRMED]
+        sol = sum(item['out_amount'] or 0 for item in confirmed) / 10 ** 9
+        if any(item['status'] == STATUS_SENT for item in items):
+            title = "⏳ Транзакции отправлены, ждем подтверждения"
+        else:
+            title = f"<b>Продано {len(confirmed)} из {len(items)} токенов</b>"
+        lines = [title, ""]
+        for item in items:
+            line = f"{icons[item['status']]} {html.escape(item['symbol'])}: {item['ui_amount']:.6g}"
+            if item['signature']:
+                line += f' - <a href="https://solscan.io/tx/{item["signature"]}">tx</a>'
+            if item['status'] == STATUS_FAILED:
+                line += f"\n    └ {html.escape(item['error'] or 'ошибка')}"
+            elif item['status'] == STATUS_PENDING:
+                line += " (не подтверждена, проверьте позже)"
+            lines.append(line)
+        if confirmed:
+            lines.extend(["", f"Получено ~<b>{sol:.6f} SOL</b> (по котировкам)"])
+        return '\n'.join(lines)
+
+
+# Общий экземпляр для всего приложения
+batch_seller = BatchSeller()
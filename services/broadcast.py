@@ -0,0 +1,183 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import BROADCAST_PAGE_SIZE
+from services.firebase_service import FirebaseService
+from services.registry import service_registry
+from services.telegram_sender import PRIORITY_HIGH, PRIORITY_LOW, telegram_sender
+
+STATUS_RUNNING = 'running'
+STATUS_FINISHED = 'finished'
+STATUS_CANCELLED = 'cancelled'
+
+firebase = service_registry.lazy(FirebaseService)
+
+
+class BroadcastBusy(Exception):
+    """Рассылка уже выполняется"""
+
+
+class Broadcaster:
+    """
+    Рассылка сообщения всем пользователям бота.
+
+    Пользователи читаются страницами по BROADCAST_PAGE_SIZE курсором Firestore
+    (FirebaseService.iter_user_id_pages), так что в памяти только одна
+    страница. Страница целиком ставится в очередь services/telegram_sender.py
+    с низким приоритетом (лимиты Bot API соблюдает она, а сообщения
+    пользователям о сделках идут вне очереди рассылки). После каждой страницы
+    курсор и счетчики сохраняются в Firestore (коллекция broadcasts):
+    прерванная перезапуском рассылка продолжается с последней страницы.
+    Прогресс и скорость доставки показываются в сообщении администратору,
+    которое обновляется после каждой страницы.
+    """
+    def __init__(self, page_size: int = BROADCAST_PAGE_SIZE):
+        self.page_size = page_size
+        self.current: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._cancelled = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Продолжает рассылку, прерванную перезапуском"""
+        running = await firebase.get_broadcasts_by_status([STATUS_RUNNING])
+        if not running:
+            return
+        broadcast = min(running, key=lambda item: item['created_at'])
+        logger.info(
+            f"Resuming broadcast {broadcast['id']} after user {broadcast.get('cursor')}: "
+            f"{broadcast['sent']} sent, {broadcast['failed']} failed so far"
+        )
+        self._launch(broadcast)
+
+    async def stop(self):
+        if self._task:
+            # Контрольная точка уже сохранена после последней страницы
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def begin(self, admin_id: int, text: str, status_chat_id: int, status_message_id: int) -> Dict:
+        """
+        Запускает рассылку text всем пользователям
+
+        Args:
+            admin_id: Telegram ID администратора
+            text: Текст сообщения (HTML)
+            status_chat_id, status_message_id: Сообщение, в котором показывается прогресс
+
+        Returns:
+            Dict: Сохраненная рассылка с полем id
+        """
+        if self.is_running:
+            raise BroadcastBusy("Broadcast is already running")
+        broadcast = {
+            'admin_id': admin_id,
+            'text': text,
+            'status': STATUS_RUNNING,
+            'cursor': None,
+            'sent': 0,
+            'failed': 0,
+            'status_chat_id': status_chat_id,
+            'status_message_id': status_message_id,
+            'created_at': datetime.now(timezone.utc)
+        }
+        broadcast_id = await firebase.create_broadcast(broadcast)
+        if broadcast_id is None:
+            raise RuntimeError("Failed to save broadcast")
+        broadcast['id'] = broadcast_id
+        logger.info(f"Broadcast {broadcast_id} started by admin {admin_id}")
+        self._launch(broadcast)
+        return broadcast
+
+    def cancel(self) -> bool:
+        """Останавливает рассылку после текущей страницы"""
+        if not self.is_running:
+            return False
+        self._cancelled = True
+        return True
+
+    def _launch(self, broadcast: Dict):
+        self.current = broadcast
+        self._cancelled = False
+        self._task = asyncio.create_task(self._run(broadcast), name=f"broadcast-{broadcast['id']}")
+
+    async def _run(self, broadcast: Dict):
+        started = time.monotonic()
+        processed = 0
+        try:
+            async for user_ids, cursor in firebase.iter_user_id_pages(self.page_size, start_after=broadcast['cursor']):
+                if self._cancelled:
+                    break
+                results = await asyncio.gather(*(
+                    telegram_sender.send(user_id, broadcast['text'], priority=PRIORITY_LOW, wait=True)
+                    for user_id in user_ids
+                ), return_exceptions=True)
+                # None - очередь переполнена, исключение - ошибка Bot API (в т.ч. бот заблокирован)
+                failed = sum(1 for result in results if result is None or isinstance(result, BaseException))
+                broadcast['sent'] += len(results) - failed
+                broadcast['failed'] += failed
+                # ID документа как есть: str(int) может не совпасть с ним, и курсор вернет уже пройденных
+                broadcast['cursor'] = cursor
+                processed += len(results)
+                broadcast['rate'] = processed / max(time.monotonic() - started, 1e-6)
+                await firebase.update_broadcast(broadcast['id'], {
+                    'cursor': broadcast['cursor'],
+                    'sent': broadcast['sent'],
+                    'failed': broadcast['failed']
+                })
+                await self._report(broadcast)
+        except Exception as e:
+            logger.error(f"Broadcast {broadcast['id']} stopped after user {broadcast['cursor']}: {e}")
+            await self._report(broadcast, f"⚠️ Остановлена с ошибкой, будет продолжена после перезапуска: {e}")
+            return
+
+        broadcast['status'] = STATUS_CANCELLED if self._cancelled else STATUS_FINISHED
+        await firebase.update_broadcast(broadcast['id'], {'status': broadcast['status']})
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Broadcast {broadcast['id']} {broadcast['status']}: {broadcast['sent']} sent, "
+            f"{broadcast['failed']} failed, {processed} in {elapsed:.0f}s"
+        )
+        await self._report(broadcast)
+
+    async def _report(self, broadcast: Dict, note: Optional[str] = None):
+        try:
+            await telegram_sender.edit_message_text(
+                broadcast['status_chat_id'],
+                broadcast['status_message_id'],
+                self.format_progress(broadcast) + (f"\n\n{note}" if note else ""),
+                priority=PRIORITY_HIGH
+            )
+        except Exception as e:
+            logger.warning(f"Failed to report broadcast progress: {e}")
+
+    @staticmethod
+    def format_progress(broadcast: Dict) -> str:
+        title = {
+            STATUS_RUNNING: "📣 Рассылка выполняется",
+            STATUS_FINISHED: "✅ Рассылка завершена",
+            STATUS_CANCELLED: "⏹ Рассылка остановлена"
+        }[broadcast['status']]
+        lines = [
+            title,
+            f"Доставлено: {broadcast['sent']}",
+            f"Ошибок: {broadcast['failed']}"
+        ]
+        if broadcast.get('rate'):
+            lines.append(f"Скорость: {broadcast['rate']:.1f} сообщ./с")
+        return '\n'.join(lines)
+
+
+# Общий экземпляр для всего приложения
+broadcaster = Broadcaster()
@@ -0,0 +1,335 @@
+import asyncio
+import heapq
+import html
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import (
+    DCA_EXECUTION_CONCURRENCY,
+    DCA_JITTER,
+    DCA_MAX_FAILURES,
+    DCA_MAX_PER_USER,
+    DCA_MAX_PRICE_IMPACT,
+    DCA_MIN_INTERVAL,
+    DCA_SLIPPAGE,
+    DCA_TICK_INTERVAL,
+    SOL_MINT
+)
+from services.firebase_service import FirebaseService
+from services.jupiter_service import JupiterService
+from services.portfolio_service import portfolio_service
+from services.registry import service_registry
+from utils import log_transaction
+
+STATUS_ACTIVE = 'active'
+STATUS_PAUSED = 'paused'
+STATUS_FINISHED = 'finished'
+STATUS_CANCELLED = 'cancelled'
+
+# Сколько ждать исполняющиеся покупки при остановке, секунды
+SHUTDOWN_TIMEOUT = 30
+
+firebase = service_registry.lazy(FirebaseService)
+jupiter = service_registry.lazy(JupiterService)
+
+
+class DcaError(Exception):
+    """План нельзя создать (текст показывается пользователю)"""
+
+
+class DcaScheduler:
+    """
+    Планы усреднения (DCA): купить amount SOL токена mint каждые interval секунд.
+
+    Планы хранятся в Firestore (коллекция dca_plans), расписание - в куче
+    (next_run, plan_id): тик раз в DCA_TICK_INTERVAL секунд снимает с вершины
+    все наступившие запуски, не перебирая остальные планы. Запуски одного
+    тика группируются по токену: на группу запрашивается одна котировка
+    Jupiter на суммарную сумму - если маршрута нет или влияние на цену выше
+    DCA_MAX_PRICE_IMPACT, покупки группы пропускаются без отдельных запросов.
+    Сами свопы идут через JupiterService.perform_swap, не более
+    DCA_EXECUTION_CONCURRENCY одновременно.
+
+    К каждому следующему запуску добавляется случайная задержка до DCA_JITTER
+    секунд, а просроченные за время простоя планы при запуске распределяются
+    по тому же окну, чтобы запуски разных пользователей не приходили в
+    Jupiter одновременно.
+    """
+    def __init__(self, tick_interval: float = DCA_TICK_INTERVAL, max_concurrency: int = DCA_EXECUTION_CONCURRENCY):
+        self.tick_interval = tick_interval
+        # Активные планы: id -> план
+        self._plans: Dict[str, Dict] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+        # (next_run, plan_id); записи отмененных и перенесенных планов пропускаются при извлечении
+        self._heap: List[Tuple[float, str]] = []
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executing: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        # Уведомление пользователя (user_id, текст); задается при запуске бота
+        self.notify: Optional[Callable[[int, str], Awaitable]] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Загружает активные планы из Firestore и запускает тик расписания"""
+        if self._task is not None:
+            return
+        now = time.time()
+        overdue = 0
+        for plan in await firebase.get_dca_plans_by_status([STATUS_ACTIVE]):
+            if plan['next_run'] <= now:
+                # Пропущенные за время простоя запуски не догоняем, а распределяем по окну jitter
+                plan['next_run'] = now + random.uniform(0, DCA_JITTER)
+                overdue += 1
+            self._add(plan)
+        self._task = asyncio.create_task(self._run(), name="dca-scheduler")
+        logger.info(f"DCA scheduler started: {len(self._plans)} active plans, {overdue} overdue")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executing:
+            logger.info(f"Waiting for {len(self._executing)} executing DCA purchases...")
+            await asyncio.wait(set(self._executing), timeout=SHUTDOWN_TIMEOUT)
+
+    async def create_plan(
+        self,
+        user_id: int,
+        mint: str,
+        symbol: str,
+        amount_sol: float,
+        interval: float,
+        max_runs: Optional[int] = None
+    ) -> Dict:
+        """
+        Создает план; первая покупка - через interval секунд.
+
+        Args:
+            user_id: Telegram ID пользователя
+            mint: Адрес покупаемого токена
+            symbol: Символ токена для сообщений
+            amount_sol: Сумма одной покупки в SOL
+            interval: Период покупок, секунды
+            max_runs: Число покупок (None - без ограничения)
+
+        Returns:
+            Dict: Сохраненный план с полем id
+        """
+        if mint == SOL_MINT:
+            raise DcaError("Выберите токен, отличный от SOL")
+        if not (math.isfinite(amount_sol) and math.isfinite(interval)):
+            raise DcaError("Сумма и интервал должны быть числами")
+        if amount_sol <= 0:
+            raise DcaError("Сумма должна быть больше 0")
+        if interval < DCA_MIN_INTERVAL:
+            raise DcaError(f"Минимальный интервал - {DCA_MIN_INTERVAL / 60:g} мин")
+        if max_runs is not None and max_runs <= 0:
+            raise DcaError("Число покупок должно быть больше 0")
+        if len(self._by_user.get(user_id, ())) >= DCA_MAX_PER_USER:
+            raise DcaError(f"Достигнут лимит активных планов ({DCA_MAX_PER_USER})")
+
+        plan = {
+            'user_id': user_id,
+            'mint': mint,
+            'symbol': symbol,
+            'amount_sol': float(amount_sol),
+            'amount': int(round(amount_sol * 1_000_000_000)),
+            'interval': float(interval),
+            'max_runs': max_runs,
+            'runs': 0,
+            'failures': 0,
+            'next_run': time.time() + interval,
+            'status': STATUS_ACTIVE,
+            'created_at': datetime.now(timezone.utc)
+        }
+        plan_id = await firebase.create_dca_plan(plan)
+        if plan_id is None:
+            raise DcaError("Не удалось сохранить план, попробуйте позже")
+        plan['id'] = plan_id
+        self._add(plan)
+        logger.info(f"DCA plan {plan_id} created: user {user_id} {amount_sol} SOL -> {symbol} every {interval:.0f}s")
+        return plan
+
+    async def cancel_plan(self, user_id: int, plan_id: str) -> bool:
+        """Останавливает план пользователя; False если план не найден"""
+        plan = self._plans.get(plan_id)
+        if plan is None or plan['user_id'] != user_id:
+            return False
+        self._forget(plan)
+        plan['status'] = STATUS_CANCELLED
+        await firebase.update_dca_plan(plan_id, {'status': STATUS_CANCELLED})
+        logger.info(f"DCA plan {plan_id} cancelled by user {user_id}")
+        return True
+
+    def user_plans(self, user_id: int) -> List[Dict]:
+        """Активные планы пользователя, по времени создания"""
+        plans = [self._plans[plan_id] for plan_id in self._by_user.get(user_id, ())]
+        return sorted(plans, key=lambda plan: plan['created_at'])
+
+    def _add(self, plan: Dict):
+        self._plans[plan['id']] = plan
+        self._by_user.setdefault(plan['user_id'], set()).add(plan['id'])
+        heapq.heappush(self._heap, (plan['next_run'], plan['id']))
+
+    def _forget(self, plan: Dict):
+        # Запись в куче остается и будет пропущена при извлечении
+        self._plans.pop(plan['id'], None)
+        user_plans = self._by_user.get(plan['user_id'])
+        if user_plans is not None:
+            user_plans.discard(plan['id'])
+            if not user_plans:
+                del self._by_user[plan['user_id']]
+
+    def pop_due(self, now: float) -> List[Dict]:
+        """Извлекает из кучи планы, время запуска которых наступило"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_run, plan_id = heapq.heappop(self._heap)
+            plan = self._plans.get(plan_id)
+            # Устаревшая запись: план отменен или уже перенесен на другое время
+            if plan is not None and plan['next_run'] == next_run:
+                due.append(plan)
+        return due
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"DCA tick failed: {e}")
+            await asyncio.sleep(self.tick_interval)
+
+    async def tick(self):
+        now = time.time()
+        due = self.pop_due(now)
+        if not due:
+            return
+        # Следующий запуск назначается и сохраняется до покупки: после
+        # перезапуска посреди свопа план не купит повторно
+        previous = {plan['id']: plan['next_run'] for plan in due}
+        for plan in due:
+            plan['next_run'] = now + plan['interval'] + random.uniform(0, DCA_JITTER)
+        saved = await asyncio.gather(*(
+            firebase.update_dca_plan(plan['id'], {'next_run': plan['next_run']}) for plan in due
+        ))
+        groups: Dict[str, List[Dict]] = {}
+        for plan, ok in zip(due, saved):
+            if not ok:
+                # Без сохраненного переноса покупка после перезапуска повторилась бы:
+                # план остается с прежним временем и пробуется снова на следующем тике
+                logger.warning(f"DCA plan {plan['id']} was not rescheduled, purchase postponed")
+                plan['next_run'] = previous[plan['id']]
+            else:
+                groups.setdefault(plan['mint'], []).append(plan)
+            heapq.heappush(self._heap, (plan['next_run'], plan['id']))
+        if not groups:
+            return
+        logger.info(f"DCA tick: {sum(map(len, groups.values()))} due plans in {len(groups)} mints")
+        for mint, plans in groups.items():
+            task = asyncio.create_task(self._execute_group(mint, plans), name=f"dca-{mint[:8]}")
+            self._executing.add(task)
+            task.add_done_callback(self._executing.discard)
+
+    async def _execute_group(self, mint: str, plans: List[Dict]):
+        """Одна котировка на все покупки токена за тик, затем свопы с ограничением параллельности"""
+        total = sum(plan['amount'] for plan in plans)
+        try:
+            quote = await jupiter.get_best_route(SOL_MINT, mint, total, DCA_SLIPPAGE)
+        except Exception as e:
+            quote = None
+            logger.warning(f"DCA quote for {mint} ({len(plans)} plans) failed: {e}")
+        if not quote or not quote.get('outAmount'):
+            for plan in plans:
+                await self._record_failure(plan, "нет маршрута Jupiter для токена")
+            return
+
+        # Влияние суммарной покупки на цену - верхняя граница для каждой отдельной покупки
+        impact = float(quote.get('priceImpactPct') or 0) * 100
+        if impact > DCA_MAX_PRICE_IMPACT:
+            logger.warning(f"DCA purchases of {mint} skipped: price impact {impact:.2f}% > {DCA_MAX_PRICE_IMPACT}%")
+            for plan in plans:
+                await self._notify(
+                    plan['user_id'],
+                    f"⚠️ DCA {html.escape(plan['symbol'])}: покупка пропущена, влияние на цену {impact:.2f}%"
+                )
+            return
+
+        rate = int(quote['outAmount']) / total
+        await asyncio.gather(*(self._execute(plan, rate) for plan in plans))
+
+    async def _execute(self, plan: Dict, rate: float):
+        user_id = plan['user_id']
+        try:
+            async with self._semaphore:
+                wallet = await firebase.get_user_wallet(user_id)
+                if not wallet or not wallet.get('public_key') or not wallet.get('private_key'):
+                    raise Exception("Ключи кошелька не найдены")
+                signature = await jupiter.perform_swap(
+                    token_out_address=plan['mint'],
+                    amount=str(plan['amount']),
+                    user_wallet_address=wallet['public_key'],
+                    user_private_key=wallet['private_key'],
+                    slippage=DCA_SLIPPAGE
+                )
+        except Exception as e:
+            await self._record_failure(plan, str(e))
+            return
+
+        plan['runs'] += 1
+        plan['failures'] = 0
+        log_transaction(user_id, 'buy', plan['mint'], plan['amount_sol'], 'success', tx_signature=signature)
+        portfolio_service.record_swap(user_id, SOL_MINT, plan['amount'], plan['mint'], int(plan['amount'] * rate))
+        fields = {'runs': plan['runs'], 'failures': 0, 'last_signature': signature}
+        finished = plan['max_runs'] is not None and plan['runs'] >= plan['max_runs']
+        if finished:
+            self._forget(plan)
+            plan['status'] = fields['status'] = STATUS_FINISHED
+        await firebase.update_dca_plan(plan['id'], fields)
+        runs = f"{plan['runs']}/{plan['max_runs']}" if plan['max_runs'] else str(plan['runs'])
+        await self._notify(
+            user_id,
+            f"✅ DCA {html.escape(plan['symbol'])}: куплено на {plan['amount_sol']:g} SOL (покупка {runs})\n"
+            f"Транзакция: https://solscan.io/tx/{signature}"
+            + ("\n\nПлан завершен." if finished else "")
+        )
+
+    async def _record_failure(self, plan: Dict, error: str):
+        """Неудачная покупка; после DCA_MAX_FAILURES подряд план ставится на паузу"""
+        user_id = plan['user_id']
+        plan['failures'] += 1
+        logger.error(f"DCA plan {plan['id']} purchase failed ({plan['failures']}/{DCA_MAX_FAILURES}): {error}")
+        log_transaction(user_id, 'buy', plan['mint'], plan['amount_sol'], 'error', error=error)
+        fields = {'failures': plan['failures'], 'last_error': error}
+        paused = plan['failures'] >= DCA_MAX_FAILURES
+        if paused:
+            self._forget(plan)
+            plan['status'] = fields['status'] = STATUS_PAUSED
+        await firebase.update_dca_plan(plan['id'], fields)
+        text = f"❌ DCA {html.escape(plan['symbol'])}: покупка не выполнена: {html.escape(error)}"
+        if paused:
+            text += f"\n\nПлан остановлен после {plan['failures']} ошибок подряд."
+        await self._notify(user_id, text)
+
+    async def _notify(self, user_id: int, text: str):
+        if self.notify is None:
+            return
+        try:
+            await self.notify(user_id, text)
+        except Exception as e:
+            logger.warning(f"Failed to notify user {user_id} about DCA: {e}")
+
+
+# Общий экземпляр для всего приложения
+dca_scheduler = DcaScheduler()
@@ -1,9 +1,12 @@
+import asyncio
 import firebase_admin
 from firebase_admin import credentials, firestore
 from loguru import logger
 from config import FIREBASE_CREDENTIALS_PATH, FIREBASE_CONFIG
+from services.key_rotation import key_reencryptor
+from services.metrics import outbound, track_outbound
 from datetime import datetime
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 class FirebaseService:
     _instance = None
@@ -17,10 +20,12 @@ class FirebaseService:
     def __init__(self):
         if not self._initialized:
             try:
-                cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-                firebase_admin.initialize_app(cred, {
-                    'databaseURL': FIREBASE_CONFIG['databaseURL']
-                })
+                # Приложение могло быть уже инициализировано при запуске (main.init_firebase)
+                if not firebase_admin._apps:
+                    cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
+                    firebase_admin.initialize_app(cred, {
+                        'databaseURL': FIREBASE_CONFIG['databaseURL']
+                    })
                 self.db = firestore.client()
                 self.users_collection = self.db.collection('users')
                 logger.info("Firebase initialized successfully")
@@ -29,6 +34,7 @@ class FirebaseService:
                 logger.error(f"Error initializing Firebase: {e}")
                 raise
 
+    @track_outbound('firestore', 'save_transaction')
     async def save_transaction(self, user_id: int, transaction_data: dict):
         """Сохранение информации о транзакции"""
         try:
@@ -43,6 +49,7 @@ class FirebaseService:
             logger.error(f"Error saving transaction: {e}")
             raise
 
+    @track_outbound('firestore', 'get_user_transactions')
     async def get_user_transactions(self, user_id: int):
         """Получение истории транзакций пользователя"""
         try:
@@ -52,6 +59,7 @@ class FirebaseService:
             logger.error(f"Error getting user transactions: {e}")
             raise
 
+    @track_outbound('firestore', 'save_user_wallet')
     async def save_user_wallet(self, user_id: int, wallet_data: Dict) -> bool:
         """
         Сохранение данных кошелька пользователя
@@ -75,6 +83,7 @@ class FirebaseService:
             logger.error(f"Error saving wallet data for user {user_id}: {e}")
             return False
 
+    @track_outbound('firestore', 'get_user_wallet')
     async def get_user_wallet(self, user_id: int) -> Optional[Dict]:
         """
         Получение данных кошелька пользователя
@@ -88,13 +97,45 @@ class FirebaseService:
         try:
             user_doc = self.users_collection.document(str(user_id)).get()
             if user_doc.exists:
-                data = user_doc.to_dict()
-                return data.get('wallet')
+                wallet = user_doc.to_dict().get('wallet')
+                # Ключ старым ключом шифрования перешифровывается в фоне
+                key_reencryptor.observe(user_id, wallet)
+                return wallet
             return None
         except Exception as e:
             logger.error(f"Error getting wallet data for user {user_id}: {e}")
             return None
 
+    @track_outbound('firestore', 'save_private_keys')
+    async def save_private_keys(self, keys: Dict[str, str]) -> bool:
+        """
+        Пакетная запись приватных ключей кошельков (пачки по 500 - лимит Firestore на batch)
+        
+        Args:
+            keys: {ID документа пользователя: зашифрованный приватный ключ}
+            
+        Returns:
+            bool: True если все пачки записаны, False в случае ошибки
+        """
+        def write():
+            items = list(keys.items())
+            for i in range(0, len(items), 500):
+                batch = self.db.batch()
+                for user_id, private_key in items[i:i + 500]:
+                    batch.set(self.users_collection.document(str(user_id)), {
+                        'wallet': {'private_key': private_key},
+                        'updated_at': datetime.utcnow()
+                    }, merge=True)
+                batch.commit()
+
+        try:
+            await asyncio.to_thread(write)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving {len(keys)} private keys: {e}")
+            return False
+
+    @track_outbound('firestore', 'save_export_timestamp')
     async def save_export_timestamp(self, user_id: int, timestamp: datetime) -> bool:
         """
         Сохранение времени последнего экспорта ключей
@@ -118,6 +159,7 @@ class FirebaseService:
             logger.error(f"Error saving export timestamp for user {user_id}: {e}")
             return False
 
+    @track_outbound('firestore', 'get_user_data')
     async def get_user_data(self, user_id: int) -> Optional[Dict]:
         """
         Получение всех данных пользователя
@@ -137,6 +179,63 @@ class FirebaseService:
             logger.error(f"Error getting user data for user {user_id}: {e}")
             return None 
             
+    async def iter_user_pages(
+        self,
+        page_size: int = 500,
+        start_after: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> AsyncIterator[list]:
+        """
+        Постраничный обход документов пользователей курсором Firestore (по ID документа)
+        
+        В памяти находится только текущая страница; каждая страница читается в
+        отдельном потоке, чтобы синхронный клиент не блокировал event loop.
+        
+        Args:
+            page_size: Размер страницы
+            start_after: ID документа, после которого начать (контрольная точка)
+            fields: Читаемые поля (None - документ целиком, [] - только ID)
+            
+        Yields:
+            list: Снимки документов страницы (ID последнего - курсор следующей)
+        """
+        query = self.users_collection.order_by(firestore.FieldPath.document_id()).limit(page_size)
+        if fields is not None:
+            query = query.select(fields)
+        cursor = start_after
+        while True:
+            page_query = query.start_after({firestore.FieldPath.document_id(): cursor}) if cursor else query
+            with outbound('firestore', 'users_page'):
+                docs = await asyncio.to_thread(lambda: list(page_query.stream()))
+            if not docs:
+                return
+            yield docs
+            if len(docs) < page_size:
+                return
+            cursor = docs[-1].id
+
+    async def iter_user_id_pages(
+        self,
+        page_size: int = 500,
+        start_after: Optional[str] = None
+    ) -> AsyncIterator[Tuple[List[int], str]]:
+        """
+        Постраничный обход ID пользователей (см. iter_user_pages)
+        
+        Yields:
+            Tuple[List[int], str]: ID пользователей страницы и ID последнего
+                документа как есть - курсор для start_after (список ID может
+                быть пустым, если все ID страницы неверного формата)
+        """
+        async for docs in self.iter_user_pages(page_size, start_after, fields=[]):
+            user_ids = []
+            for doc in docs:
+                try:
+                    user_ids.append(int(doc.id))
+                except ValueError:
+                    logger.warning(f"Неверный формат ID пользователя: {doc.id}")
+            yield user_ids, docs[-1].id
+
     async def get_all_users(self) -> list:
         """
         Получение списка ID всех пользователей в базе данных
@@ -145,20 +244,232 @@ class FirebaseService:
             list: Список ID пользователей
         """
         try:
-            users = self.users_collection.stream()
             user_ids = []
-            
-            for user in users:
-                try:
-                    # Преобразуем ID документа (строку) в число
-                    user_id = int(user.id)
-                    user_ids.append(user_id)
-                except ValueError:
-                    logger.warning(f"Неверный формат ID пользователя: {user.id}")
-                    continue
-            
+            async for page, _ in self.iter_user_id_pages():
+                user_ids.extend(page)
             logger.info(f"Найдено {len(user_ids)} пользователей в базе данных")
             return user_ids
         except Exception as e:
             logger.error(f"Ошибка при получении списка пользователей: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    @track_outbound('firestore', 'create_order')
+    async def create_order(self, order: Dict) -> Optional[str]:
+        """
+        Сохранение нового лимитного/стоп-ордера
+        
+        Args:
+            order: Данные ордера (user_id, mint, side, kind, trigger_price, amount, ...)
+            
+        Returns:
+            Optional[str]: ID документа ордера или None в случае ошибки
+        """
+        try:
+            order_doc = self.db.collection('orders').document()
+            await asyncio.to_thread(order_doc.set, {**order, 'updated_at': datetime.utcnow()})
+            return order_doc.id
+        except Exception as e:
+            logger.error(f"Error creating order for user {order.get('user_id')}: {e}")
+            return None
+
+    @track_outbound('firestore', 'update_order')
+    async def update_order(self, order_id: str, fields: Dict) -> bool:
+        """
+        Обновление полей ордера (статус, подпись транзакции, ошибка)
+        
+        Returns:
+            bool: True если обновление успешно, False в случае ошибки
+        """
+        try:
+            await asyncio.to_thread(self.db.collection('orders').document(order_id).set, {
+                **fields,
+                'updated_at': datetime.utcnow()
+            }, merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating order {order_id}: {e}")
+            return False
+
+    @track_outbound('firestore', 'get_orders_by_status')
+    async def get_orders_by_status(self, statuses: list) -> list:
+        """
+        Получение всех ордеров с указанными статусами (для восстановления при запуске)
+        
+        Returns:
+            list: Ордера с полем id
+        """
+        try:
+            query = self.db.collection('orders').where('status', 'in', statuses)
+            orders = await asyncio.to_thread(lambda: list(query.stream()))
+            return [{**order.to_dict(), 'id': order.id} for order in orders]
+        except Exception as e:
+            logger.error(f"Error getting orders with statuses {statuses}: {e}")
+            return []
+
+    @track_outbound('firestore', 'create_dca_plan')
+    async def create_dca_plan(self, plan: Dict) -> Optional[str]:
+        """
+        Сохранение нового плана DCA
+        
+        Args:
+            plan: Данные плана (user_id, mint, amount, interval, next_run, ...)
+            
+        Returns:
+            Optional[str]: ID документа плана или None в случае ошибки
+        """
+        try:
+            plan_doc = self.db.collection('dca_plans').document()
+            await asyncio.to_thread(plan_doc.set, {**plan, 'updated_at': datetime.utcnow()})
+            return plan_doc.id
+        except Exception as e:
+            logger.error(f"Error creating DCA plan for user {plan.get('user_id')}: {e}")
+            return None
+
+    @track_outbound('firestore', 'update_dca_plan')
+    async def update_dca_plan(self, plan_id: str, fields: Dict) -> bool:
+        """
+        Обновление полей плана DCA (следующий запуск, счетчики, статус)
+        
+        Returns:
+            bool: True если обновление успешно, False в случае ошибки
+        """
+        try:
+            await asyncio.to_thread(self.db.collection('dca_plans').document(plan_id).set, {
+                **fields,
+                'updated_at': datetime.utcnow()
+            }, merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating DCA plan {plan_id}: {e}")
+            return False
+
+    @track_outbound('firestore', 'get_dca_plans_by_status')
+    async def get_dca_plans_by_status(self, statuses: list) -> list:
+        """
+        Получение всех планов DCA с указанными статусами (для восстановления при запуске)
+        
+        Returns:
+            list: Планы с полем id
+        """
+        try:
+            query = self.db.collection('dca_plans').where('status', 'in', statuses)
+            plans = await asyncio.to_thread(lambda: list(query.stream()))
+            return [{**plan.to_dict(), 'id': plan.id} for plan in plans]
+        except Exception as e:
+            logger.error(f"Error getting DCA plans with statuses {statuses}: {e}")
+            return []
+
+    @track_outbound('firestore', 'create_alert')
+    async def create_alert(self, alert: Dict) -> Optional[str]:
+        """
+        Сохранение нового ценового алерта
+        
+        Args:
+            alert: Данные алерта (user_id, mint, direction, target_price, ...)
+            
+        Returns:
+            Optional[str]: ID документа алерта или None в случае ошибки
+        """
+        try:
+            alert_doc = self.db.collection('price_alerts').document()
+            await asyncio.to_thread(alert_doc.set, {**alert, 'updated_at': datetime.utcnow()})
+            return alert_doc.id
+        except Exception as e:
+            logger.error(f"Error creating price alert for user {alert.get('user_id')}: {e}")
+            return None
+
+    @track_outbound('firestore', 'update_alerts')
+    async def update_alerts(self, updates: Dict[str, Dict]) -> bool:
+        """
+        Пакетное обновление алертов (пачки по 500 записей - лимит Firestore на batch)
+        
+        Args:
+            updates: {alert_id: поля для обновления}
+            
+        Returns:
+            bool: True если все пачки записаны, False в случае ошибки
+        """
+        def write():
+            collection = self.db.collection('price_alerts')
+            items = list(updates.items())
+            for i in range(0, len(items), 500):
+                batch = self.db.batch()
+                for alert_id, fields in items[i:i + 500]:
+                    batch.set(collection.document(alert_id), {**fields, 'updated_at': datetime.utcnow()}, merge=True)
+                batch.commit()
+
+        try:
+            await asyncio.to_thread(write)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating {len(updates)} price alerts: {e}")
+            return False
+
+    @track_outbound('firestore', 'get_alerts_by_status')
+    async def get_alerts_by_status(self, statuses: list) -> list:
+        """
+        Получение всех ценовых алертов с указанными статусами (для восстановления при запуске)
+        
+        Returns:
+            list: Алерты с полем id
+        """
+        try:
+            query = self.db.collection('price_alerts').where('status', 'in', statuses)
+            alerts = await asyncio.to_thread(lambda: list(query.stream()))
+            return [{**alert.to_dict(), 'id': alert.id} for alert in alerts]
+        except Exception as e:
+            logger.error(f"Error getting price alerts with statuses {statuses}: {e}")
+            return []
+
+    @track_outbound('firestore', 'create_broadcast')
+    async def create_broadcast(self, broadcast: Dict) -> Optional[str]:
+        """
+        Сохранение новой рассылки
+        
+        Args:
+            broadcast: Данные рассылки (text, admin_id, status, cursor, счетчики)
+            
+        Returns:
+            Optional[str]: ID документа рассылки или None в случае ошибки
+        """
+        try:
+            broadcast_doc = self.db.collection('broadcasts').document()
+            await asyncio.to_thread(broadcast_doc.set, {**broadcast, 'updated_at': datetime.utcnow()})
+            return broadcast_doc.id
+        except Exception as e:
+            logger.error(f"Error creating broadcast: {e}")
+            return None
+
+    @track_outbound('firestore', 'update_broadcast')
+    async def update_broadcast(self, broadcast_id: str, fields: Dict) -> bool:
+        """
+        Обновление рассылки (контрольная точка: курсор и счетчики, статус)
+        
+        Returns:
+            bool: True если обновление успешно, False в случае ошибки
+        """
+        try:
+            await asyncio.to_thread(self.db.collection('broadcasts').document(broadcast_id).set, {
+                **fields,
+                'updated_at': datetime.utcnow()
+            }, merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating broadcast {broadcast_id}: {e}")
+            return False
+
+    @track_outbound('firestore', 'get_broadcasts_by_status')
+    async def get_broadcasts_by_status(self, statuses: list) -> list:
+        """
+        Получение рассылок с указанными статусами (для продолжения после перезапуска)
+        
+        Returns:
+            list: Рассылки с полем id
+        """
+        try:
+            query = self.db.collection('broadcasts').where('status', 'in', statuses)
+            broadcasts = await asyncio.to_thread(lambda: list(query.stream()))
+            return [{**broadcast.to_dict(), 'id': broadcast.id} for broadcast in broadcasts]
+        except Exception as e:
+            logger.error(f"Error getting broadcasts with statuses {statuses}: {e}")
+            return []
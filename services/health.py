@@ -0,0 +1,199 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import aiohttp
+from aiohttp import web
+from loguru import logger
+
+from config import (
+    HEALTH_CHECK_INTERVAL,
+    HEALTH_CHECK_TIMEOUT,
+    HEALTH_MAX_LOOP_LAG,
+    HEALTH_SLOT_STALE_AFTER,
+    JUPITER_API_KEY,
+    JUPITER_API_URL,
+    SOL_MINT,
+    SOLANA_RPC_URL,
+    TRACING_ENABLED,
+    USDC_MINT
+)
+from services.account_subscriptions import account_subscriptions
+from services.loop_monitor import loop_monitor
+from services.dca_scheduler import dca_scheduler
+from services.firebase_service import FirebaseService
+from services.ops_server import ops_server
+from services.order_engine import order_engine
+from services.price_alerts import price_alerts
+from services.price_feed import price_feed
+from services.price_stream import price_stream
+from services.registry import service_registry
+from services.telegram_sender import telegram_sender
+from services.tracing import exporter as trace_exporter
+
+
+class HealthService:
+    """
+    Проверки живости и готовности для служебного HTTP-сервера.
+
+    /health/live - event loop отвечает: задержку планирования (loop lag)
+    измеряет монитор services/loop_monitor.py. Если loop заблокирован, запрос просто не будет
+    обработан и проба завершится по таймауту.
+
+    /health/ready - зависимости: свежесть слота RPC, доступность Jupiter и
+    Firestore, работа фоновых задач. Проверки выполняются фоновой задачей раз
+    в HEALTH_CHECK_INTERVAL секунд, а проба отдает последний результат, поэтому
+    частые пробы не создают внешних запросов.
+    """
+    def __init__(
+        self,
+        interval: float = HEALTH_CHECK_INTERVAL,
+        timeout: float = HEALTH_CHECK_TIMEOUT,
+        max_loop_lag: float = HEALTH_MAX_LOOP_LAG,
+        slot_stale_after: float = HEALTH_SLOT_STALE_AFTER
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_loop_lag = max_loop_lag
+        self.slot_stale_after = slot_stale_after
+        self._slot: Optional[int] = None
+        self._slot_changed_at: Optional[float] = None
+        # имя проверки -> {"ok", "detail"}
+        self._checks: Dict[str, dict] = {}
+        self._checked_at: Optional[float] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._checks_task: Optional[asyncio.Task] = None
+        ops_server.add_route('/health/live', self._live)
+        ops_server.add_route('/health/ready', self._ready)
+
+    async def start(self):
+        if self._checks_task is not None:
+            return
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self._checks_task = asyncio.create_task(self._run_checks(), name="health-checks")
+        logger.info(f"Health checks started, interval: {self.interval}s")
+
+    async def stop(self):
+        if self._checks_task:
+            self._checks_task.cancel()
+            try:
+                await self._checks_task
+            except asyncio.CancelledError:
+                pass
+            self._checks_task = None
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def liveness(self) -> dict:
+        last_beat = loop_monitor.last_beat
+        heartbeat_age = time.monotonic() - last_beat if last_beat else None
+        alive = heartbeat_age is None or (
+            loop_monitor.lag <= self.max_loop_lag and heartbeat_age <= loop_monitor.interval + self.max_loop_lag
+        )
+        return {
+            "status": "ok" if alive else "degraded",
+            "loop_lag_ms": round(loop_monitor.lag * 1000, 1),
+            "heartbeat_age_s": round(heartbeat_age, 3) if heartbeat_age is not None else None
+        }
+
+    def readiness(self) -> dict:
+        ready = self._checked_at is not None and all(check["ok"] for check in self._checks.values())
+        return {
+            "status": "ready" if ready else ("starting" if self._checked_at is None else "not_ready"),
+            "checked_ago_s": round(time.monotonic() - self._checked_at, 1) if self._checked_at else None,
+            "checks": self._checks
+        }
+
+    async def _live(self, request: web.Request) -> web.Response:
+        result = self.liveness()
+        return web.json_response(result, status=200 if result["status"] == "ok" else 503)
+
+    async def _ready(self, request: web.Request) -> web.Response:
+        result = self.readiness()
+        return web.json_response(result, status=200 if result["status"] == "ready" else 503)
+
+    async def _run_checks(self):
+        while True:
+            try:
+                await self.check_now()
+            except Exception as e:
+                logger.error(f"Health checks failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def check_now(self):
+        """Выполняет все проверки параллельно и сохраняет результат"""
+        names = ("solana_rpc", "jupiter", "firestore")
+        results = await asyncio.gather(
+            self._check_rpc(),
+            self._check_jupiter(),
+            self._check_firestore(),
+            return_exceptions=True
+        )
+        checks = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                checks[name] = {"ok": False, "detail": f"{type(result).__name__}: {result}"}
+            else:
+                checks[name] = result
+        checks["background_tasks"] = self._check_background_tasks()
+        failed = [name for name, check in checks.items() if not check["ok"]]
+        if failed and failed != [name for name, check in self._checks.items() if not check["ok"]]:
+            logger.warning(f"Readiness checks failing: {failed}")
+        self._checks = checks
+        self._checked_at = time.monotonic()
+
+    async def _check_rpc(self) -> dict:
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "getSlot", "params": [{"commitment": "confirmed"}]}
+        async with self._session.post(SOLANA_RPC_URL, json=payload) as response:
+            data = await response.json(content_type=None)
+        slot = data.get("result")
+        if not slot:
+            return {"ok": False, "detail": f"no slot in response: {data.get('error')}"}
+        now = time.monotonic()
+        if slot != self._slot:
+            self._slot = slot
+            self._slot_changed_at = now
+        stale_for = now - self._slot_changed_at
+        # Слот должен расти; если он не менялся дольше порога, узел RPC отстал или завис
+        return {"ok": stale_for <= self.slot_stale_after, "detail": f"slot {slot}, unchanged for {stale_for:.0f}s"}
+
+    async def _check_jupiter(self) -> dict:
+        params = {"inputMint": SOL_MINT, "outputMint": USDC_MINT, "amount": "1000000"}
+        headers = {"Authorization": f"Bearer {JUPITER_API_KEY}"}
+        async with self._session.get(f"{JUPITER_API_URL}quote", params=params, headers=headers) as response:
+            return {"ok": response.status == 200, "detail": f"HTTP {response.status}"}
+
+    async def _check_firestore(self) -> dict:
+        users = service_registry.get(FirebaseService).users_collection
+        # Клиент Firestore синхронный - запрос выполняется в отдельном потоке
+        await asyncio.wait_for(asyncio.to_thread(lambda: list(users.limit(1).stream())), self.timeout)
+        return {"ok": True, "detail": "read ok"}
+
+    def _check_background_tasks(self) -> dict:
+        problems = []
+        if not price_feed.is_running:
+            problems.append("price feed stopped")
+        elif price_feed.is_stale:
+            problems.append(f"SOL price stale ({price_feed.age:.0f}s)")
+        if not account_subscriptions.is_running:
+            problems.append("account subscriptions stopped")
+        if not order_engine.is_running:
+            problems.append("order engine not started")
+        elif not price_stream.is_running:
+            problems.append("price stream stopped")
+        if not price_alerts.is_running:
+            problems.append("price alerts not started")
+        if not telegram_sender.is_running:
+            problems.append("telegram sender stopped")
+        if not dca_scheduler.is_running:
+            problems.append("DCA scheduler stopped")
+        if not loop_monitor.is_running:
+            problems.append("loop monitor stopped")
+        if TRACING_ENABLED and not trace_exporter.is_running:
+            problems.append("trace exporter stopped")
+        return {"ok": not problems, "detail": ', '.join(problems) or "running"}
+
+
+# Общий экземпляр для всего приложения
+health = HealthService()
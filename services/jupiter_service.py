@@ -3,16 +3,20 @@ import base58
 import base64
 import asyncio
 import os
+import time
 from solana.rpc.async_api import AsyncClient
 from solana.keypair import Keypair
 from solana.rpc.types import TxOpts
 from solana.transaction import Transaction
 from loguru import logger
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Union
 from solders.rpc.responses import SendTransactionResp
 from solana.rpc.commitment import Commitment
 from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
 from services.utils import decrypt_private_key
+from services.metrics import SWAP_CONFIRMATION, SWAP_DURATION, outbound, track_outbound
+from services.tracing import start_span
 from services.solana_client import solana_client, send_transaction_with_retry, confirm_transaction_with_retry
 import requests
 import httpx
@@ -27,6 +31,17 @@ from config import (
     SOLANA_TOKEN_ADDRESSES
 )
 
+# Стейблкоины (USDC, USDT) продаются с меньшим проскальзыванием
+STABLE_MINTS = ("EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v", "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB")
+# Лимит подписей в одном запросе getSignatureStatuses
+SIGNATURE_STATUSES_LIMIT = 256
+CONFIRMED_STATUSES = (TransactionConfirmationStatus.Confirmed, TransactionConfirmationStatus.Finalized)
+
+
+def sell_slippage(token_address: str) -> float:
+    """Проскальзывание при продаже токена за SOL, проценты"""
+    return 1.0 if token_address in STABLE_MINTS else 3.0
+
 class JupiterService:
     """
     Сервис для взаимодействия с Jupiter API для совершения операций обмена токенов Solana.
@@ -64,6 +79,7 @@ class JupiterService:
             logger.error(f"Ошибка при получении списка токенов Jupiter: {str(e)}")
             return []
 
+    @track_outbound('jupiter', 'quote')
     async def get_best_route(
         self, 
         input_mint: str, 
@@ -104,7 +120,7 @@ class JupiterService:
                 "platformFeeAccount": JUPITER_PLATFORM_FEE_ACCOUNT
             }
             
-            logger.debug(f"Requesting quote with params: {params}")
+            logger.debug("Requesting quote with params: {}", params)
             
             async with aiohttp.ClientSession(headers=self.headers) as session:
                 async with session.get(self.quote_api_url, params=params) as response:
@@ -114,7 +130,8 @@ class JupiterService:
                         raise Exception(f"Jupiter API error: {error_msg}")
                     
                     result = await response.json()
-                    logger.debug(f"Received quote data: {result}")
+                    # lazy: тело котировки форматируется, только если debug-записи кто-то пишет
+                    logger.opt(lazy=True).debug("Received quote data: {}", lambda: result)
                     
                     # Логируем информацию о комиссии
                     if "platformFee" in result:
@@ -203,6 +220,24 @@ class JupiterService:
         if not isinstance(user_private_key, str):
             user_private_key = str(user_private_key)
             
+        side = 'sell' if is_selling else 'buy'
+        with start_span('jupiter.perform_swap', side=side, token=token_out_address, amount=amount), \
+                SWAP_DURATION.time(side=side):
+            return await self._perform_swap(
+                token_out_address, amount, user_wallet_address, user_private_key,
+                slippage, max_retries, is_selling
+            )
+
+    async def _perform_swap(
+        self,
+        token_out_address: str,
+        amount: str,
+        user_wallet_address: str,
+        user_private_key: str,
+        slippage: float,
+        max_retries: int,
+        is_selling: bool
+    ) -> str:
         # Определяем входной и выходной токены в зависимости от направления обмена
         if is_selling:
             input_mint = token_out_address
@@ -236,7 +271,7 @@ class JupiterService:
                     raise Exception("Не удалось получить quote от Jupiter API")
                 
                 # 2. Выполняем своп
-                swap_transaction = await self._get_swap_transaction(
+                swap_transaction = await self.get_swap_transaction(
                     user_wallet_address=user_wallet_address,
                     quote_data=quote_data
                 )
@@ -274,140 +309,157 @@ class JupiterService:
     async def _get_quote(self, input_mint: str, output_mint: str, amount: str, slippage: float) -> dict:
         """Получает quote от Jupiter API"""
         try:
-            async with httpx.AsyncClient(timeout=10.0, headers=self.headers) as client:
-                quote_params = {
-                    "inputMint": input_mint,
-                    "outputMint": output_mint,
-                    "amount": amount,
-                    "slippageBps": str(int(slippage * 100)),
-                    "onlyDirectRoutes": "true",
-                    "platformFeeBps": str(JUPITER_PLATFORM_FEE_BPS),
-                    "platformFeeAccount": JUPITER_PLATFORM_FEE_ACCOUNT
-                }
-                
-                logger.debug(f"Отправка запроса quote с параметрами: {quote_params}")
-                
-                quote_response = await client.get(
-                    self.quote_api_url,
-                    params=quote_params
-                )
+            with outbound('jupiter', 'quote'):
+                async with httpx.AsyncClient(timeout=10.0, headers=self.headers) as client:
+                    quote_params = {
+                        "inputMint": input_mint,
+                        "outputMint": output_mint,
+                        "amount": amount,
+                        "slippageBps": str(int(slippage * 100)),
+                        "onlyDirectRoutes": "true",
+                        "platformFeeBps": str(JUPITER_PLATFORM_FEE_BPS),
+                        "platformFeeAccount": JUPITER_PLATFORM_FEE_ACCOUNT
+                    }
                 
-                if quote_response.status_code != 200:
-                    error_data = quote_response.json()
-                    error_msg = error_data.get("error", "Unknown error")
-                    raise Exception(f"Jupiter Quote API error: {error_msg}")
+                    logger.debug("Отправка запроса quote с параметрами: {}", quote_params)
                 
-                quote_data = quote_response.json()
-                if "error" in quote_data:
-                    raise Exception(f"Jupiter Quote API error: {quote_data['error']}")
+                    quote_response = await client.get(
+                        self.quote_api_url,
+                        params=quote_params
+                    )
                 
-                # Логируем информацию о комиссии
-                if "platformFee" in quote_data:
-                    fee_amount = quote_data["platformFee"]["amount"]
-                    logger.info(f"Платформенная комиссия: {fee_amount}")
+                    if quote_response.status_code != 200:
+                        error_data = quote_response.json()
+                        error_msg = error_data.get("error", "Unknown error")
+                        raise Exception(f"Jupiter Quote API error: {error_msg}")
+                
+                    quote_data = quote_response.json()
+                    if "error" in quote_data:
+                        raise Exception(f"Jupiter Quote API error: {quote_data['error']}")
                 
-                logger.info(f"Получен quote")
-                return quote_data
+                    # Логируем информацию о комиссии
+                    if "platformFee" in quote_data:
+                        fee_amount = quote_data["platformFee"]["amount"]
+                        logger.info(f"Платформенная комиссия: {fee_amount}")
+                
+                    logger.info(f"Получен quote")
+                    return quote_data
                 
         except Exception as e:
             logger.error(f"Ошибка при получении quote: {str(e)}")
             return None
     
-    async def _get_swap_transaction(self, user_wallet_address: str, quote_data: dict) -> str:
+    async def get_swap_transaction(self, user_wallet_address: str, quote_data: dict) -> str:
         """Получает транзакцию свопа от Jupiter API"""
         try:
-            async with httpx.AsyncClient(timeout=10.0, headers=self.headers) as client:
-                # Готовим запрос на свап
-                swap_req = {
-                    "userPublicKey": user_wallet_address,  # строка, не функция
-                    "wrapUnwrapSOL": True,
-                    "quoteResponse": quote_data,
-                    "asLegacyTransaction": True,
-                    "platformFeeBps": JUPITER_PLATFORM_FEE_BPS,
-                    "platformFeeAccount": JUPITER_PLATFORM_FEE_ACCOUNT
-                }
+            with outbound('jupiter', 'swap'):
+                async with httpx.AsyncClient(timeout=10.0, headers=self.headers) as client:
+                    # Готовим запрос на свап
+                    swap_req = {
+                        "userPublicKey": user_wallet_address,  # строка, не функция
+                        "wrapUnwrapSOL": True,
+                        "quoteResponse": quote_data,
+                        "asLegacyTransaction": True,
+                        "platformFeeBps": JUPITER_PLATFORM_FEE_BPS,
+                        "platformFeeAccount": JUPITER_PLATFORM_FEE_ACCOUNT
+                    }
 
-                logger.debug("Отправка запроса swap")
+                    logger.debug("Отправка запроса swap")
                 
-                resp = await client.post(self.swap_api_url, json=swap_req)
+                    resp = await client.post(self.swap_api_url, json=swap_req)
                 
-                # Проверка корректности ответа
-                if resp.status_code != 200:
-                    try:
-                        error_data = resp.json()
-                        error_msg = error_data.get("error", "Unknown error")
-                    except Exception as json_err:
-                        # Если ответ не является JSON, выведем его содержимое
-                        error_text = resp.text
-                        logger.error(f"Некорректный ответ API (не JSON): {error_text[:200]}")
-                        error_msg = f"Неожиданный ответ от API: {str(json_err)}"
-                    raise Exception(f"Jupiter Swap API error: {error_msg}")
+                    # Проверка корректности ответа
+                    if resp.status_code != 200:
+                        try:
+                            error_data = resp.json()
+                            error_msg = error_data.get("error", "Unknown error")
+                        except Exception as json_err:
+                            # Если ответ не является JSON, выведем его содержимое
+                            error_text = resp.text
+                            logger.error(f"Некорректный ответ API (не JSON): {error_text[:200]}")
+                            error_msg = f"Неожиданный ответ от API: {str(json_err)}"
+                        raise Exception(f"Jupiter Swap API error: {error_msg}")
                 
-                # Получение и валидация данных ответа
-                swap_data = resp.json()
-                logger.info("✅ Swap запрос успешно обработан")
+                    # Получение и валидация данных ответа
+                    swap_data = resp.json()
+                    logger.info("✅ Swap запрос успешно обработан")
                 
-                if "error" in swap_data:
-                    raise Exception(f"Jupiter Swap API error: {swap_data['error']}")
+                    if "error" in swap_data:
+                        raise Exception(f"Jupiter Swap API error: {swap_data['error']}")
                 
-                # Проверка наличия транзакции в ответе
-                tx_b64 = swap_data.get("swapTransaction")
-                if not tx_b64 or len(tx_b64) < 100:
-                    logger.warning("Получена пустая транзакция")
-                    return None
+                    # Проверка наличия транзакции в ответе
+                    tx_b64 = swap_data.get("swapTransaction")
+                    if not tx_b64 or len(tx_b64) < 100:
+                        logger.warning("Получена пустая транзакция")
+                        return None
                 
-                return tx_b64
+                    return tx_b64
                 
         except Exception as e:
             logger.error(f"Ошибка при получении транзакции свопа: {str(e)}")
             return None
     
-    async def _send_swap_transaction(self, swap_transaction: str, user_private_key: str) -> str:
-        """Отправляет транзакцию свопа в сеть Solana"""
+    def sign_swap_transaction(self, swap_transaction: str, wallet: Keypair) -> bytes:
+        """
+        Декодирует транзакцию свопа от Jupiter (base64) и подписывает ее
+
+        Returns:
+            bytes: Подписанная сериализованная транзакция
+        """
         try:
-            # Декодируем транзакцию из base64
-            try:
-                tx_bytes = base64.b64decode(swap_transaction)
-                
-                # Создаем объект транзакции
-                tx = Transaction.deserialize(tx_bytes)
-            except Exception as decode_err:
-                logger.error(f"Ошибка при декодировании транзакции: {str(decode_err)}")
-                logger.error(f"Начало строки транзакции: {swap_transaction[:50]}")
-                raise Exception(f"Невозможно декодировать транзакцию: {str(decode_err)}")
-            
-            # Расшифровываем приватный ключ и создаем кошелек
-            try:
-                # Пробуем расшифровать ключ, так как после обновления он может быть зашифрован
-                decrypted_key = decrypt_private_key(user_private_key)
-                logger.debug("Приватный ключ успешно расшифрован")
-            except Exception as decrypt_err:
-                # Если расшифровка не удалась, возможно ключ не зашифрован (старый формат)
-                logger.info(f"Не удалось расшифровать ключ, используем как есть: {str(decrypt_err)}")
-                decrypted_key = user_private_key
-                
-            # Создаем кошелек из расшифрованного приватного ключа
-            private_key_bytes = base58.b58decode(decrypted_key)
-            wallet = Keypair.from_secret_key(private_key_bytes)
-            
-            # Подписываем транзакцию
+            tx = Transaction.deserialize(base64.b64decode(swap_transaction))
+        except Exception as decode_err:
+            logger.error(f"Ошибка при декодировании транзакции: {str(decode_err)}")
+            logger.error(f"Начало строки транзакции: {swap_transaction[:50]}")
+            raise Exception(f"Невозможно декодировать транзакцию: {str(decode_err)}")
+        with start_span('transaction.sign'):
             tx.sign(wallet)
-            
-            # Отправляем транзакцию в сеть
+            return tx.serialize()
+
+    async def send_signed_transaction(self, tx_bytes: bytes) -> str:
+        """Отправляет подписанную транзакцию в сеть, возвращает подпись"""
+        with outbound('solana_rpc', 'sendRawTransaction'):
             tx_sig = await self.solana_client.send_raw_transaction(
-                tx.serialize(),
+                tx_bytes,
                 opts=TxOpts(
                     skip_preflight=True,
                     preflight_commitment="confirmed",
                     max_retries=3
                 )
             )
+        if isinstance(tx_sig, str):
+            return tx_sig
+        return str(tx_sig.value) if hasattr(tx_sig, 'value') else str(tx_sig)
+
+    async def get_signature_statuses(self, signatures: List[str]) -> List[Optional[Any]]:
+        """
+        Статусы транзакций одним запросом getSignatureStatuses на все подписи
+        (по SIGNATURE_STATUSES_LIMIT за запрос)
+
+        Returns:
+            List: Статус (err, confirmation_status) или None, если транзакция еще не видна - в порядке signatures
+        """
+        statuses = []
+        for i in range(0, len(signatures), SIGNATURE_STATUSES_LIMIT):
+            chunk = [Signature.from_string(signature) for signature in signatures[i:i + SIGNATURE_STATUSES_LIMIT]]
+            with outbound('solana_rpc', 'getSignatureStatuses'):
+                response = await self.solana_client.get_signature_statuses(chunk)
+            statuses.extend(response.value)
+        return statuses
+
+    async def _send_swap_transaction(self, swap_transaction: str, user_private_key: str) -> str:
+        """Отправляет транзакцию свопа в сеть Solana"""
+        try:
+            # Расшифровываем приватный ключ и создаем кошелек
+            with start_span('wallet.decrypt_key'):
+                # Запись любым из ENCRYPTION_KEYS или незашифрованный ключ старого формата;
+                # перешифрование новейшим ключом - в фоне (services/key_rotation.py)
+                decrypted_key = decrypt_private_key(user_private_key)
+            wallet = Keypair.from_secret_key(base58.b58decode(decrypted_key))
             
-            # Получаем signature
-            if isinstance(tx_sig, str):
-                signature = tx_sig
-            else:
-                signature = str(tx_sig.value) if hasattr(tx_sig, 'value') else str(tx_sig)
+            # Подписываем и отправляем транзакцию в сеть
+            signature = await self.send_signed_transaction(self.sign_swap_transaction(swap_transaction, wallet))
+            sent_at = time.perf_counter()
                 
             logger.info(f"✅ Транзакция отправлена: {signature}")
             logger.info(f"💰 Комиссия ({JUPITER_PLATFORM_FEE_BPS/100}%) будет отправлена на: {JUPITER_PLATFORM_FEE_ACCOUNT}")
@@ -415,21 +467,27 @@ class JupiterService:
             # Ждем подтверждения транзакции
             try:
                 # Даем время на подтверждение
-                await asyncio.sleep(2)
+                with start_span('transaction.confirm_wait'):
+                    await asyncio.sleep(2)
                 
                 # Проверяем статус транзакции
-                status = await self.solana_client.get_signature_statuses([signature])
+                with outbound('solana_rpc', 'getSignatureStatuses'):
+                    status = await self.solana_client.get_signature_statuses([signature])
                 
                 if status and hasattr(status, 'value') and status.value and status.value[0]:
                     tx_status = status.value[0]
                     if hasattr(tx_status, 'err') and tx_status.err:
+                        SWAP_CONFIRMATION.observe(time.perf_counter() - sent_at, status='failed')
                         logger.error(f"❌ Транзакция завершилась с ошибкой: {tx_status.err}")
                         raise Exception(f"Transaction failed: {tx_status.err}")
                     elif hasattr(tx_status, 'confirmation_status') and str(tx_status.confirmation_status) in ["confirmed", "finalized"]:
+                        SWAP_CONFIRMATION.observe(time.perf_counter() - sent_at, status='confirmed')
                         logger.info(f"✅ Swap confirmed! Transaction: {signature}")
                     else:
+                        SWAP_CONFIRMATION.observe(time.perf_counter() - sent_at, status='pending')
                         logger.warning(f"⚠️ Транзакция в процессе подтверждения")
                 else:
+                    SWAP_CONFIRMATION.observe(time.perf_counter() - sent_at, status='unknown')
                     logger.warning(f"⚠️ Не удалось получить статус транзакции: {signature}")
                     
             except Exception as confirm_error:
@@ -544,6 +602,7 @@ class JupiterService:
             
             return f"❌ Ошибка: {error_message}"
 
+    @track_outbound('solana_rpc', 'getTokenSupply')
     async def get_token_decimals(self, token_address: str) -> int:
         """
         Получает количество decimals для токена
@@ -716,13 +775,8 @@ class JupiterService:
             # SOL всегда будет выходным токеном при продаже
             output_mint = "So11111111111111111111111111111111111111112"  # SOL
             
-            # Устанавливаем базовое проскальзывание
-            slippage = 1.0  # Уменьшаем проскальзывание для ускорения
-            
-            # Для некоторых токенов с низкой ликвидностью увеличиваем проскальзывание
-            if token_address not in ["EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v", 
-                                     "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB"]:
-                slippage = 3.0  # Более разумное значение для других токенов
+            # Для токенов с низкой ликвидностью проскальзывание больше, чем для стейблкоинов
+            slippage = sell_slippage(token_address)
             
             # Получаем маршрут и сразу выполняем своп
             try:
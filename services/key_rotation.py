@@ -0,0 +1,113 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from loguru import logger
+
+from services.metrics import KEYS_REENCRYPTED
+from services.utils import needs_reencryption, reencrypt_private_key
+
+# Сколько записей ждут перешифрования одновременно; остальные будут подхвачены при следующем чтении
+MAX_PENDING = 10000
+# Пауза перед записью - за нее накапливается пачка
+FLUSH_DELAY = 1.0
+
+SaveKeys = Callable[[Dict[str, str]], Awaitable[bool]]
+
+
+class KeyReencryptor:
+    """
+    Ленивое перешифрование приватных ключей новейшим ключом шифрования.
+
+    FirebaseService.get_user_wallet передает сюда каждый прочитанный кошелек.
+    Проверка - сравнение метки ключа в записи (services/utils.py), без
+    расшифровки, поэтому путь сделки не замедляется. Записи старым ключом,
+    старого формата или незашифрованные ставятся в очередь; фоновая задача
+    перешифровывает пачку в отдельном потоке и сохраняет ее одной пакетной
+    записью Firestore (FirebaseService.save_private_keys).
+    """
+    def __init__(self, max_pending: int = MAX_PENDING, flush_delay: float = FLUSH_DELAY):
+        self.max_pending = max_pending
+        self.flush_delay = flush_delay
+        self._save: Optional[SaveKeys] = None
+        self._pending: Dict[str, str] = {}
+        # Пользователи, чьи записи уже перезаписаны или не расшифровываются - повторно не ставятся
+        self._done: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, save: SaveKeys):
+        if self.is_running:
+            return
+        self._save = save
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="key-reencryption")
+        logger.info("Key re-encryption started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Дописываем то, что успело накопиться
+            await self._flush()
+
+    def observe(self, user_id, wallet: Optional[Dict]):
+        """Ставит ключ кошелька в очередь, если он зашифрован не новейшим ключом"""
+        if not self.is_running or not wallet or not wallet.get('private_key'):
+            return
+        uid = str(user_id)
+        if uid in self._done or uid in self._pending or len(self._pending) >= self.max_pending:
+            return
+        try:
+            if not needs_reencryption(wallet['private_key']):
+                return
+        except Exception as e:
+            logger.warning(f"Cannot check encryption of key for user {uid}: {e}")
+            return
+        self._pending[uid] = wallet['private_key']
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.flush_delay)
+            self._wakeup.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Key re-encryption batch failed: {e}")
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        updates = await asyncio.to_thread(self._reencrypt, batch)
+        if not updates:
+            return
+        if await self._save(updates):
+            self._done.update(updates)
+            KEYS_REENCRYPTED.inc(len(updates))
+            logger.info(f"Re-encrypted {len(updates)} private keys with the current key")
+        else:
+            logger.warning(f"Failed to save {len(updates)} re-encrypted keys, will retry on next access")
+
+    def _reencrypt(self, batch: Dict[str, str]) -> Dict[str, str]:
+        updates = {}
+        for uid, record in batch.items():
+            try:
+                updates[uid] = reencrypt_private_key(record)
+            except Exception as e:
+                logger.error(f"Cannot re-encrypt key for user {uid}: {e}")
+                self._done.add(uid)
+        return updates
+
+
+# Общий экземпляр для всего приложения
+key_reencryptor = KeyReencryptor()
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Optional
+
+from aiohttp import web
+from loguru import logger
+
+from config import LOOP_MONITOR_INTERVAL, LOOP_SLOW_CALLBACK_THRESHOLD
+from services.metrics import LOOP_LAG, SLOW_CALLBACKS
+from services.ops_server import ops_server
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STACK_LIMIT = 15
+RECENT_EVENTS = 50
+
+
+def _is_project_frame(frame) -> bool:
+    filename = frame.f_code.co_filename
+    return filename.startswith(PROJECT_ROOT) and 'site-packages' not in filename
+
+
+def _describe_task(task: Optional[asyncio.Task]) -> Optional[str]:
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+class LoopMonitor:
+    """
+    Монитор event loop.
+
+    Корутина-heartbeat просыпается каждые LOOP_MONITOR_INTERVAL секунд и
+    измеряет задержку планирования (насколько позже срока она проснулась).
+    Сторожевой поток следит за heartbeat: если loop не отвечает дольше
+    LOOP_SLOW_CALLBACK_THRESHOLD, он снимает стек потока loop и текущую задачу -
+    то есть код, который блокирует loop в этот момент. Когда loop освобождается,
+    событие записывается в лог и в метрики с полной длительностью блокировки.
+    """
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold: float = LOOP_SLOW_CALLBACK_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.last_beat: Optional[float] = None
+        self.slow_events: Deque[dict] = deque(maxlen=RECENT_EVENTS)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        # Снимок стека, сделанный сторожевым потоком во время текущей блокировки
+        self._capture: Optional[dict] = None
+        ops_server.add_route('/debug/loop', self._debug)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event loop monitor started, slow callback threshold: {self.threshold * 1000:.0f}ms")
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join, 1)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.last_beat = time.monotonic()
+            LOOP_LAG.observe(lag)
+            capture, self._capture = self._capture, None
+            if lag >= self.threshold:
+                self._record_slow(lag, capture)
+
+    def _watch(self):
+        """Сторожевой поток: снимает стек loop, пока тот заблокирован"""
+        while not self._stopped.wait(self.threshold / 2):
+            last_beat = self.last_beat
+            if last_beat is None or self._capture is not None:
+                continue
+            if time.monotonic() - last_beat - self.interval >= self.threshold:
+                self._capture = self._snapshot()
+
+    def _snapshot(self) -> Optional[dict]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        source = None
+        probe = frame
+        while probe is not None:
+            if _is_project_frame(probe):
+                source = f"{probe.f_globals.get('__name__', '?')}.{probe.f_code.co_name}"
+                break
+            probe = probe.f_back
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        return {
+            "source": source or 'unknown',
+            "task": _describe_task(task),
+            "stack": ''.join(traceback.format_stack(frame, limit=STACK_LIMIT))
+        }
+
+    def _record_slow(self, lag: float, capture: Optional[dict]):
+        if capture is None:
+            capture = {"source": 'unknown', "task": None, "stack": None}
+        SLOW_CALLBACKS.inc(source=capture["source"])
+        event = {
+            "at": time.time(),
+            "duration_ms": round(lag * 1000, 1),
+            "source": capture["source"],
+            "task": capture["task"],
+            "stack": capture["stack"]
+        }
+        self.slow_events.append(event)
+        message = f"Event loop blocked for {event['duration_ms']}ms by {event['source']} (task: {event['task']})"
+        if capture["stack"]:
+            message += f"\n{capture['stack']}"
+        logger.warning(message)
+
+    async def _debug(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "lag_ms": round(self.lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "slow_callbacks": list(self.slow_events)
+        })
+
+
+# Общий экземпляр для всего приложения
+loop_monitor = LoopMonitor()
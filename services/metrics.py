@@ -0,0 +1,272 @@
+import bisect
+import functools
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.tracing import start_span
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Гистограмма длительностей с фиксированными корзинами"""
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ключ меток -> [счетчики корзин..., сумма, количество]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def time(self, **labels) -> 'Timer':
+        """Контекстный менеджер (обычный или async), замеряющий длительность блока"""
+        return Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        data = self._values.get(self._key(labels))
+        return data[-1] if data else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._values.items()]
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, (('le', '+Inf'),))
+            lines.append(f"{self.name}_bucket{labels} {data[-1]}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(data[-2])}")
+            lines.append(f"{self.name}_count{labels} {data[-1]}")
+        return lines
+
+
+class Timer:
+    """
+    Замер длительности блока кода. Если метрика имеет метку status, она
+    заполняется автоматически: ok или error (при исключении).
+    """
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+        self.started: Optional[float] = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = dict(self.labels)
+        if 'status' in self.histogram.labelnames and 'status' not in labels:
+            labels['status'] = 'error' if exc_type else 'ok'
+        self.histogram.observe(time.perf_counter() - self.started, **labels)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class Registry:
+    """Набор метрик приложения и их выдача в текстовом формате Prometheus"""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+HANDLER_DURATION = Histogram(
+    'bot_handler_duration_seconds',
+    'Время обработки апдейта хэндлером aiogram',
+    ('handler', 'status')
+)
+OUTBOUND_DURATION = Histogram(
+    'bot_outbound_request_duration_seconds',
+    'Длительность внешних запросов (Jupiter, Solana RPC, CoinGecko, Firestore)',
+    ('service', 'operation', 'status')
+)
+SWAP_DURATION = Histogram(
+    'bot_swap_duration_seconds',
+    'Полное время свопа: котировка, транзакция, отправка и подтверждение',
+    ('side', 'status')
+)
+SWAP_CONFIRMATION = Histogram(
+    'bot_swap_confirmation_seconds',
+    'Время от отправки транзакции до получения ее статуса',
+    ('status',)
+)
+LOOP_LAG = Histogram(
+    'bot_event_loop_lag_seconds',
+    'Задержка планирования event loop (насколько позже срока просыпается heartbeat)',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+SLOW_CALLBACKS = Counter(
+    'bot_event_loop_slow_callbacks_total',
+    'Блокировки event loop дольше порога; source - функция проекта на вершине стека',
+    ('source',)
+)
+ORDERS_EXECUTED = Counter(
+    'bot_orders_executed_total',
+    'Сработавшие лимитные и стоп-ордера по результату исполнения',
+    ('side', 'kind', 'status')
+)
+ALERTS_TRIGGERED = Counter(
+    'bot_price_alerts_triggered_total',
+    'Сработавшие ценовые алерты',
+    ('direction',)
+)
+TELEGRAM_MESSAGES = Counter(
+    'bot_telegram_messages_total',
+    'Сообщения из очереди отправки (services/telegram_sender.py) по результату',
+    ('status',)
+)
+TELEGRAM_QUEUE_WAIT = Histogram(
+    'bot_telegram_queue_wait_seconds',
+    'Время сообщения в очереди отправки до передачи в Bot API'
+)
+KEYS_REENCRYPTED = Counter(
+    'bot_keys_reencrypted_total',
+    'Приватные ключи, лениво перешифрованные новейшим ключом шифрования'
+)
+CACHE_REQUESTS = Counter(
+    'bot_cache_requests_total',
+    'Обращения к кэшам; доля попаданий = hit / (hit + miss)',
+    ('cache', 'result')
+)
+
+
+class OutboundTimer(Timer):
+    """Замер внешнего запроса: гистограмма OUTBOUND_DURATION и span трассировки"""
+    def __init__(self, service: str, operation: str):
+        super().__init__(OUTBOUND_DURATION, {"service": service, "operation": operation})
+        self.span = start_span(f"{service}.{operation}")
+
+    def __enter__(self):
+        self.span.__enter__()
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        if 'status' in self.labels:
+            self.span.set_attribute('status', self.labels['status'])
+        return self.span.__exit__(exc_type, exc, tb)
+
+
+def outbound(service: str, operation: str) -> OutboundTimer:
+    """Контекстный менеджер для внешнего запроса (метрика + span)"""
+    return OutboundTimer(service, operation)
+
+
+def track_outbound(service: str, operation: str):
+    """Декоратор корутины: замеряет ее как внешний запрос"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with outbound(service, operation):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    """Учитывает попадания/промахи кэша"""
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache, result='hit' if hit else 'miss')
@@ -0,0 +1,47 @@
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+from loguru import logger
+
+from config import OPS_HTTP_HOST, OPS_HTTP_PORT
+from services.metrics import registry
+
+
+class OpsServer:
+    """
+    Служебный HTTP-сервер (метрики и другие эндпоинты для эксплуатации).
+    Работает в том же event loop, что и бот; отключается при OPS_HTTP_PORT=0.
+    """
+    def __init__(self, host: str = OPS_HTTP_HOST, port: int = OPS_HTTP_PORT):
+        self.host = host
+        self.port = port
+        self.app = web.Application()
+        self.app.router.add_get('/metrics', self._metrics)
+        self._runner: Optional[web.AppRunner] = None
+
+    def add_route(self, path: str, handler: Callable[[web.Request], Awaitable[web.StreamResponse]]):
+        """Регистрирует дополнительный GET-эндпоинт (до запуска сервера)"""
+        self.app.router.add_get(path, handler)
+
+    async def start(self):
+        if not self.port or self._runner is not None:
+            return
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Ops HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=registry.render(),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+
+# Общий экземпляр для всего приложения
+ops_server = OpsServer()
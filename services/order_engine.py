@@ -0,0 +1,301 @@
+import asyncio
+import html
+import math
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+from config import ORDER_EXECUTION_CONCURRENCY, ORDERS_MAX_PER_USER, SOL_MINT
+from services.firebase_service import FirebaseService
+from services.jupiter_service import JupiterService
+from services.metrics import ORDERS_EXECUTED
+from services.portfolio_service import portfolio_service
+from services.price_stream import price_stream
+from services.registry import service_registry
+from services.trigger_index import TriggerIndex
+from utils import log_transaction
+
+ORDER_SIDES = ('buy', 'sell')
+ORDER_KINDS = ('limit', 'stop')
+
+STATUS_OPEN = 'open'
+STATUS_TRIGGERED = 'triggered'
+STATUS_FILLED = 'filled'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+# Ключ потребителя в общем потоке цен
+STREAM_KEY = 'orders'
+# Сколько ждать исполняющиеся ордера при остановке, секунды
+SHUTDOWN_TIMEOUT = 30
+# Повторы записи результата исполнения в Firestore и пауза перед первым повтором (удваивается)
+RESULT_SAVE_RETRIES = 3
+RESULT_SAVE_DELAY = 1.0
+
+firebase = service_registry.lazy(FirebaseService)
+jupiter = service_registry.lazy(JupiterService)
+
+
+class OrderError(Exception):
+    """Ордер нельзя создать (текст показывается пользователю)"""
+
+
+def fires_below(order: Dict) -> bool:
+    """
+    Лимитная покупка и стоп-продажа срабатывают, когда цена опускается до
+    триггера; стоп-покупка и лимитная продажа - когда поднимается до него.
+    """
+    return (order['side'] == 'buy') == (order['kind'] == 'limit')
+
+
+class OrderEngine:
+    """
+    Лимитные и стоп-ордера.
+
+    Открытые ордера хранятся в Firestore (коллекция orders) и в памяти - в
+    индексе триггеров по токенам (services/trigger_index.py). На каждый тик
+    общего потока цен (services/price_stream.py) проверяются только ордера,
+    чей триггер пересекла цена, а не все открытые. Сработавшие
+    ордера исполняются через JupiterService.perform_swap, не более
+    ORDER_EXECUTION_CONCURRENCY одновременно.
+    """
+    def __init__(self, max_concurrency: int = ORDER_EXECUTION_CONCURRENCY, max_per_user: int = ORDERS_MAX_PER_USER):
+        self.max_per_user = max_per_user
+        # Открытые и исполняющиеся ордера: id -> ордер
+        self._orders: Dict[str, Dict] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+        self._index = TriggerIndex()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executing: Set[asyncio.Task] = set()
+        self._started = False
+        # Уведомление пользователя (user_id, текст); задается при запуске бота
+        self.notify: Optional[Callable[[int, str], Awaitable]] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._started
+
+    @property
+    def open_count(self) -> int:
+        return sum(1 for order in self._orders.values() if order['status'] == STATUS_OPEN)
+
+    async def start(self):
+        """Загружает открытые ордера из Firestore и подписывается на поток цен"""
+        if self._started:
+            return
+        orders = await firebase.get_orders_by_status([STATUS_OPEN, STATUS_TRIGGERED])
+        for order in orders:
+            if order['status'] == STATUS_OPEN:
+                try:
+                    self._add(order)
+                except ValueError as e:
+                    logger.error(f"Order {order['id']} of user {order['user_id']} skipped: {e}")
+            else:
+                # Своп мог уйти в сеть до перезапуска - повторно не исполняем
+                logger.warning(
+                    f"Order {order['id']} of user {order['user_id']} was triggered before restart, "
+                    f"not re-executing; check its transaction manually"
+                )
+        price_stream.subscribe(self._on_prices)
+        self._started = True
+        logger.info(f"Order engine started: {self.open_count} open orders in {len(self._index)} tokens")
+
+    async def stop(self):
+        if self._executing:
+            logger.info(f"Waiting for {len(self._executing)} executing orders...")
+            await asyncio.wait(set(self._executing), timeout=SHUTDOWN_TIMEOUT)
+
+    async def place_order(
+        self,
+        user_id: int,
+        mint: str,
+        side: str,
+        kind: str,
+        trigger_price: float,
+        amount: int,
+        ui_amount: float,
+        symbol: str,
+        slippage: float = 1.0
+    ) -> Dict:
+        """
+        Создает ордер. Если цена уже за триггером, ордер сработает на ближайшем тике.
+
+        Args:
+            user_id: Telegram ID пользователя
+            mint: Адрес токена
+            side: buy (SOL → токен) или sell (токен → SOL)
+            kind: limit или stop
+            trigger_price: Цена токена в USD, при которой ордер срабатывает
+            amount: Сумма свопа в наименьших единицах (лампорты для buy, единицы токена для sell)
+            ui_amount: Та же сумма для отображения (SOL или токены)
+            symbol: Символ токена для сообщений
+            slippage: Проскальзывание при исполнении, проценты
+
+        Returns:
+            Dict: Сохраненный ордер с полем id
+        """
+        if side not in ORDER_SIDES or kind not in ORDER_KINDS:
+            raise OrderError("Тип ордера: buy|sell и limit|stop")
+        if mint == SOL_MINT:
+            raise OrderError("Ордера на SOL не поддерживаются - выберите токен")
+        if not (math.isfinite(trigger_price) and math.isfinite(ui_amount)):
+            raise OrderError("Цена и сумма должны быть числами")
+        if trigger_price <= 0 or amount <= 0:
+            raise OrderError("Цена и сумма должны быть больше 0")
+        if len(self._by_user.get(user_id, ())) >= self.max_per_user:
+            raise OrderError(f"Достигнут лимит открытых ордеров ({self.max_per_user})")
+
+        order = {
+            'user_id': user_id,
+            'mint': mint,
+            'symbol': symbol,
+            'side': side,
+            'kind': kind,
+            'trigger_price': float(trigger_price),
+            'amount': int(amount),
+            'ui_amount': float(ui_amount),
+            'slippage': float(slippage),
+            'status': STATUS_OPEN,
+            'created_at': datetime.now(timezone.utc)
+        }
+        order_id = await firebase.create_order(order)
+        if order_id is None:
+            raise OrderError("Не удалось сохранить ордер, попробуйте позже")
+        order['id'] = order_id
+        self._add(order)
+        logger.info(f"Order {order_id} placed: user {user_id} {kind} {side} {ui_amount} {symbol} @ ${trigger_price}")
+        return order
+
+    async def cancel_order(self, user_id: int, order_id: str) -> bool:
+        """Отменяет открытый ордер пользователя; False если ордер не найден или уже сработал"""
+        order = self._orders.get(order_id)
+        if order is None or order['user_id'] != user_id or order['status'] != STATUS_OPEN:
+            return False
+        self._unindex(order)
+        self._forget(order)
+        order['status'] = STATUS_CANCELLED
+        await firebase.update_order(order_id, {'status': STATUS_CANCELLED})
+        logger.info(f"Order {order_id} cancelled by user {user_id}")
+        return True
+
+    def user_orders(self, user_id: int) -> List[Dict]:
+        """Открытые и исполняющиеся ордера пользователя, по времени создания"""
+        orders = [self._orders[order_id] for order_id in self._by_user.get(user_id, ())]
+        return sorted(orders, key=lambda order: order['created_at'])
+
+    def _add(self, order: Dict):
+        self._index.add(order['mint'], order['trigger_price'], order['id'], fires_below(order))
+        self._orders[order['id']] = order
+        self._by_user.setdefault(order['user_id'], set()).add(order['id'])
+        price_stream.watch(order['mint'], STREAM_KEY)
+
+    def _unindex(self, order: Dict):
+        self._index.remove(order['mint'], order['trigger_price'], order['id'], fires_below(order))
+        if order['mint'] not in self._index:
+            price_stream.unwatch(order['mint'], STREAM_KEY)
+
+    def _forget(self, order: Dict):
+        self._orders.pop(order['id'], None)
+        user_orders = self._by_user.get(order['user_id'])
+        if user_orders is not None:
+            user_orders.discard(order['id'])
+            if not user_orders:
+                del self._by_user[order['user_id']]
+
+    def match(self, mint: str, price: float) -> List[Dict]:
+        """Извлекает из индекса все ордера токена, сработавшие при цене price"""
+        triggered = self._index.match(mint, price)
+        if triggered and mint not in self._index:
+            price_stream.unwatch(mint, STREAM_KEY)
+        return [self._orders[order_id] for order_id in triggered if order_id in self._orders]
+
+    async def _on_prices(self, prices: Dict[str, float]):
+        for mint, price in prices.items():
+            for order in self.match(mint, price):
+                order['status'] = STATUS_TRIGGERED
+                task = asyncio.create_task(self._execute(order, price), name=f"order-{order['id']}")
+                self._executing.add(task)
+                task.add_done_callback(self._executing.discard)
+
+    async def _execute(self, order: Dict, price: float):
+        order_id, user_id = order['id'], order['user_id']
+        is_selling = order['side'] == 'sell'
+        logger.info(f"Order {order_id} triggered at ${price} (trigger ${order['trigger_price']})")
+        if not await firebase.update_order(order_id, {'status': STATUS_TRIGGERED, 'triggered_price': price}):
+            # В Firestore ордер остался открытым: своп сейчас после перезапуска исполнился бы повторно.
+            # Возвращаем ордер в индекс - он сработает снова на следующем тике цены
+            logger.warning(f"Order {order_id} was not marked as triggered, swap postponed")
+            order['status'] = STATUS_OPEN
+            if order_id in self._orders:
+                self._add(order)
+            return
+        try:
+            async with self._semaphore:
+                wallet = await firebase.get_user_wallet(user_id)
+                if not wallet or not wallet.get('public_key') or not wallet.get('private_key'):
+                    raise Exception("Ключи кошелька не найдены")
+                signature = await jupiter.perform_swap(
+                    token_out_address=order['mint'],
+                    amount=str(order['amount']),
+                    user_wallet_address=wallet['public_key'],
+                    user_private_key=wallet['private_key'],
+                    slippage=order['slippage'],
+                    is_selling=is_selling
+                )
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Order {order_id} execution failed: {error}")
+            ORDERS_EXECUTED.inc(side=order['side'], kind=order['kind'], status='error')
+            log_transaction(user_id, order['side'], order['mint'], order['ui_amount'], 'error', error=error)
+            await self._save_result(order_id, {'status': STATUS_FAILED, 'error': error})
+            self._forget(order)
+            await self._notify(
+                user_id,
+                f"❌ Ордер {order['kind']} {order['side']} {html.escape(order['symbol'])} не исполнен: {html.escape(error)}"
+            )
+            return
+
+        ORDERS_EXECUTED.inc(side=order['side'], kind=order['kind'], status='success')
+        log_transaction(user_id, order['side'], order['mint'], order['ui_amount'], 'success', tx_signature=signature)
+        if is_selling:
+            portfolio_service.record_swap(user_id, order['mint'], order['amount'], SOL_MINT)
+        else:
+            portfolio_service.record_swap(user_id, SOL_MINT, order['amount'], order['mint'])
+        await self._save_result(order_id, {'status': STATUS_FILLED, 'tx_signature': signature})
+        self._forget(order)
+        unit = order['symbol'] if is_selling else 'SOL'
+        await self._notify(
+            user_id,
+            f"✅ Ордер {order['kind']} {order['side']} {html.escape(order['symbol'])} исполнен по цене ${price:.8g}\n"
+            f"Количество: {order['ui_amount']} {html.escape(unit)}\n"
+            f"Транзакция: https://solscan.io/tx/{signature}"
+        )
+
+    async def _save_result(self, order_id: str, fields: Dict):
+        """
+        Записывает итог исполнения с повторами. Если запись так и не удалась,
+        ордер остается в Firestore сработавшим - после перезапуска он не
+        исполняется повторно, а итог виден в логе.
+        """
+        delay = RESULT_SAVE_DELAY
+        for attempt in range(RESULT_SAVE_RETRIES + 1):
+            if await firebase.update_order(order_id, fields):
+                return
+            if attempt < RESULT_SAVE_RETRIES:
+                logger.warning(f"Failed to save result of order {order_id}, retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+        logger.error(f"Result of order {order_id} was not saved, order stays triggered in Firestore: {fields}")
+
+    async def _notify(self, user_id: int, text: str):
+        if self.notify is None:
+            return
+        try:
+            await self.notify(user_id, text)
+        except Exception as e:
+            logger.warning(f"Failed to notify user {user_id} about order: {e}")
+
+
+# Общий экземпляр для всего приложения
+order_engine = OrderEngine()
@@ -0,0 +1,388 @@
+import asyncio
+import time
+import weakref
+from typing import Dict, List, Optional
+
+from cachetools import LRUCache
+from loguru import logger
+
+from config import (
+    PORTFOLIO_MAX_AGE,
+    PORTFOLIO_MAX_USERS,
+    PORTFOLIO_SETTLE_DELAY,
+    SOL_MINT,
+    SOLANA_TOKEN_ADDRESSES
+)
+from services.metrics import record_cache
+from services.price_service import PriceService
+
+# Decimals популярных токенов, чтобы не запрашивать их из сети
+KNOWN_DECIMALS = {
+    SOL_MINT: 9,
+    'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v': 6,  # USDC
+    'Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB': 6,  # USDT
+    '4k3Dyjzvzp8eMZWUXbBCjEvwSkkk59S5iCNLY3QrkX6R': 6,  # RAY
+    '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs': 8,  # ETH (Wormhole)
+    'orcaEKTdK7LKz57vaAYr9QeNsVEPfiu6QeMU1kektZE': 6,  # ORCA
+}
+
+
+class PortfolioService:
+    """
+    Снимки портфелей пользователей (SOL + SPL токены) в памяти.
+
+    Снимок читается из сети только если его нет, он устарел (PORTFOLIO_MAX_AGE)
+    или после сделки прошло PORTFOLIO_SETTLE_DELAY секунд. Сделки, выполненные
+    ботом, сразу применяются к снимку как изменения балансов, поэтому экраны
+    портфеля строятся из памяти, а стоимость считается по общему кэшу цен.
+
+    Снимок - словарь:
+        public_key: адрес кошелька
+        sol: баланс SOL в lamports
+        tokens: {mint: {"amount": int, "decimals": int, "pubkey": str, "accounts": {pubkey: int}}}
+            amount - сумма по всем токен-аккаунтам mint, accounts - баланс каждого
+            (по нему уведомление об одном аккаунте пересчитывает сумму)
+        updated_at: время последнего чтения из сети (time.monotonic)
+        refresh_at: время, после которого снимок нужно сверить с сетью
+    """
+    def __init__(self, max_age: float = PORTFOLIO_MAX_AGE, settle_delay: float = PORTFOLIO_SETTLE_DELAY):
+        self.max_age = max_age
+        self.settle_delay = settle_delay
+        self._snapshots = LRUCache(maxsize=PORTFOLIO_MAX_USERS)
+        # Блокировка живет, пока ее держит или ждет хотя бы один запрос - память не растет с числом пользователей
+        self._locks: 'weakref.WeakValueDictionary[int, asyncio.Lock]' = weakref.WeakValueDictionary()
+        self._decimals: Dict[str, int] = dict(KNOWN_DECIMALS)
+        self._mint_to_symbol = {v: k for k, v in SOLANA_TOKEN_ADDRESSES.items()}
+        self._solana = None
+        self.price_service = PriceService()
+        # Менеджер подписок на изменения аккаунтов (см. services/account_subscriptions.py)
+        self.watcher = None
+        # Пользователи, чьи снимки обновляются push-уведомлениями и не требуют опроса RPC
+        self._live_users = set()
+
+    @property
+    def solana(self):
+        # SolanaService создается при первом обращении к сети
+        if self._solana is None:
+            from services.registry import service_registry
+            from services.solana_service import SolanaService
+            self._solana = service_registry.get(SolanaService)
+        return self._solana
+
+    def symbol_for(self, mint: str) -> str:
+        """Тикер токена по mint-адресу (или сокращенный адрес)"""
+        return self._mint_to_symbol.get(mint, mint[:6])
+
+    def _is_fresh(self, snapshot: Optional[dict], public_key: str, user_id: Optional[int] = None) -> bool:
+        if not snapshot or snapshot['public_key'] != public_key:
+            return False
+        now = time.monotonic()
+        if snapshot['refresh_at'] is not None and now >= snapshot['refresh_at']:
+            return False
+        # Снимки отслеживаемых кошельков не стареют - их обновляют уведомления
+        return user_id in self._live_users or now - snapshot['updated_at'] <= self.max_age
+
+    async def get_snapshot(self, user_id: int, public_key: str, force: bool = False, force_network: bool = False) -> dict:
+        """
+        Возвращает снимок балансов пользователя, при необходимости перечитывая его из сети
+
+        Args:
+            user_id: Telegram ID пользователя
+            public_key: Адрес кошелька
+            force: Принудительно перечитать балансы из сети (снимок моложе секунды
+                считается свежим - повторные нажатия «Обновить» не ходят в RPC)
+            force_network: Перечитать из сети в любом случае, даже если снимок только
+                что прочитан (базовый снимок после открытия подписок)
+
+        Returns:
+            dict: Снимок портфеля
+        """
+        if self.watcher is not None:
+            self.watcher.touch(user_id, public_key)
+
+        snapshot = self._snapshots.get(user_id)
+        # Для отслеживаемых кошельков снимок всегда актуален - даже кнопки «Обновить» не ходят в RPC
+        cached_ok = not force_network and (not force or user_id in self._live_users)
+        if cached_ok and self._is_fresh(snapshot, public_key, user_id):
+            record_cache('portfolio', True)
+            return snapshot
+        record_cache('portfolio', False)
+
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        async with lock:
+            # Пока ждали блокировку, снимок мог обновить другой запрос
+            snapshot = self._snapshots.get(user_id)
+            if force_network:
+                return await self._refresh(user_id, public_key)
+            if snapshot and not force and self._is_fresh(snapshot, public_key, user_id):
+                return snapshot
+            if snapshot and force and time.monotonic() - snapshot['updated_at'] < 1:
+                return snapshot
+            return await self._refresh(user_id, public_key)
+
+    async def _refresh(self, user_id: int, public_key: str) -> dict:
+        started = time.monotonic()
+        previous = self._snapshots.get(user_id)
+        try:
+            sol_lamports, wallet_tokens = await asyncio.gather(
+                self.solana.get_sol_lamports(public_key),
+                self.solana.get_wallet_tokens(public_key)
+            )
+        except Exception as e:
+            # Ошибку RPC не кэшируем как пустой портфель - отдаем прежний снимок до следующей попытки
+            if previous and previous['public_key'] == public_key:
+                logger.warning(f"Portfolio refresh of user {user_id} failed, keeping previous snapshot: {e}")
+                return previous
+            raise
+        await self.ensure_decimals(wallet_tokens.keys())
+        tokens = {}
+        unknown = []
+        for mint, info in wallet_tokens.items():
+            if mint not in self._decimals:
+                # Без decimals баланс нельзя показать - токен появится после следующей сверки
+                unknown.append(mint)
+                continue
+            tokens[mint] = {
+                "amount": int(info['amount']),
+                "decimals": self._decimals[mint],
+                "pubkey": info.get('pubkey'),
+                "accounts": dict(info.get('accounts') or {})
+            }
+        snapshot = {
+            "public_key": public_key,
+            "sol": sol_lamports,
+            "tokens": tokens,
+            "updated_at": time.monotonic(),
+            "refresh_at": None
+        }
+        if unknown:
+            logger.warning(f"Portfolio of user {user_id}: decimals unknown for {len(unknown)} tokens, will retry")
+            self._schedule_settle(snapshot)
+        self._snapshots[user_id] = snapshot
+        logger.debug(f"Portfolio of user {user_id} refreshed in {time.monotonic() - started:.3f}s: {len(tokens)} tokens")
+        return snapshot
+
+    async def ensure_decimals(self, mints):
+        """Загружает и кэширует decimals неизвестных токенов"""
+        unknown = [mint for mint in mints if mint not in self._decimals]
+        if not unknown:
+            return
+        results = await asyncio.gather(
+            *(self.solana.get_token_decimals(mint) for mint in unknown),
+            return_exceptions=True
+        )
+        for mint, decimals in zip(unknown, results):
+            if isinstance(decimals, Exception):
+                logger.warning(f"Failed to get decimals for {mint}: {decimals}")
+                continue
+            # Decimals токена не меняются - кэшируем навсегда
+            self._decimals[mint] = decimals
+
+    async def get_portfolio(self, user_id: int, public_key: str, force: bool = False) -> dict:
+        """
+        Возвращает оценку портфеля пользователя в USD
+
+        Returns:
+            dict: {
+                "public_key": str,
+                "sol": float, "sol_price": float, "sol_usd": float,
+                "tokens": [{"mint", "symbol", "amount", "decimals", "price", "usd"}],
+                "total_usd": float,
+                "age": float  # возраст данных из сети в секундах
+            }
+        """
+        snapshot = await self.get_snapshot(user_id, public_key, force=force)
+        mints = list(snapshot['tokens'].keys())
+        prices = await self.price_service.get_token_prices_usd([SOL_MINT] + mints)
+
+        sol = snapshot['sol'] / 10 ** 9
+        sol_price = prices.get(SOL_MINT, 0.0)
+        tokens = []
+        for mint, info in snapshot['tokens'].items():
+            amount = info['amount'] / 10 ** info['decimals']
+            price = prices.get(mint, 0.0)
+            tokens.append({
+                "mint": mint,
+                "symbol": self.symbol_for(mint),
+                "amount": amount,
+                "decimals": info['decimals'],
+                "price": price,
+                "usd": amount * price
+            })
+        sol_usd = sol * sol_price
+        return {
+            "public_key": public_key,
+            "sol": sol,
+            "sol_price": sol_price,
+            "sol_usd": sol_usd,
+            "tokens": tokens,
+            "total_usd": sol_usd + sum(t['usd'] for t in tokens),
+            "age": time.monotonic() - snapshot['updated_at']
+        }
+
+    async def get_balances(self, user_id: int, public_key: str, force: bool = False) -> Dict[str, float]:
+        """
+        Балансы в формате SolanaService.get_all_balances: {тикер: количество}
+        (только ненулевые балансы)
+        """
+        snapshot = await self.get_snapshot(user_id, public_key, force=force)
+        balances = {}
+        if snapshot['sol'] > 0:
+            balances['SOL'] = round(snapshot['sol'] / 10 ** 9, 2)
+        for mint, info in snapshot['tokens'].items():
+            amount = round(info['amount'] / 10 ** info['decimals'], 2)
+            if amount > 0:
+                symbol = self._mint_to_symbol.get(mint, mint)
+                balances[symbol] = amount
+        return balances
+
+    async def get_token_amount(self, user_id: int, public_key: str, mint: str) -> float:
+        """Баланс токена в человекочитаемых единицах (0, если токена нет)"""
+        snapshot = await self.get_snapshot(user_id, public_key)
+        if mint == SOL_MINT:
+            return snapshot['sol'] / 10 ** 9
+        token = snapshot['tokens'].get(mint)
+        if not token:
+            return 0.0
+        return token['amount'] / 10 ** token['decimals']
+
+    def _schedule_settle(self, snapshot: dict):
+        settle_at = time.monotonic() + self.settle_delay
+        if snapshot['refresh_at'] is None or snapshot['refresh_at'] > settle_at:
+            snapshot['refresh_at'] = settle_at
+
+    def apply_sol_delta(self, user_id: int, lamports: int):
+        """Применяет изменение баланса SOL (в lamports) к снимку пользователя"""
+        if user_id in self._live_users:
+            # Абсолютный баланс уже пришел или придет уведомлением - дельта посчиталась бы дважды
+            return
+        snapshot = self._snapshots.get(user_id)
+        if not snapshot:
+            return
+        snapshot['sol'] = max(0, snapshot['sol'] + int(lamports))
+        self._schedule_settle(snapshot)
+
+    def apply_token_delta(self, user_id: int, mint: str, raw_amount: int, decimals: Optional[int] = None):
+        """Применяет изменение баланса SPL токена (в минимальных единицах) к снимку пользователя"""
+        if mint == SOL_MINT:
+            self.apply_sol_delta(user_id, raw_amount)
+            return
+        if user_id in self._live_users:
+            # Токен-аккаунты отслеживаемого кошелька обновляются уведомлениями
+            return
+        snapshot = self._snapshots.get(user_id)
+        if not snapshot:
+            return
+        if decimals is not None:
+            self._decimals.setdefault(mint, decimals)
+        token = snapshot['tokens'].get(mint)
+        if token is None:
+            if raw_amount <= 0:
+                self._schedule_settle(snapshot)
+                return
+            if mint not in self._decimals:
+                # Без decimals нельзя показать баланс - перечитаем снимок при следующем запросе
+                snapshot['refresh_at'] = time.monotonic()
+                return
+            token = {"amount": 0, "decimals": self._decimals[mint], "pubkey": None, "accounts": {}}
+            snapshot['tokens'][mint] = token
+        token['amount'] = max(0, token['amount'] + int(raw_amount))
+        if token['amount'] == 0:
+            del snapshot['tokens'][mint]
+        self._schedule_settle(snapshot)
+
+    def apply_ui_delta(self, user_id: int, mint: str, ui_amount: float):
+        """
+        Применяет изменение баланса в человекочитаемых единицах.
+        Если decimals токена неизвестны - только планирует сверку с сетью.
+        """
+        if user_id in self._live_users:
+            return
+        decimals = self._decimals.get(mint)
+        if decimals is None:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot:
+                snapshot['refresh_at'] = time.monotonic()
+            return
+        self.apply_token_delta(user_id, mint, int(ui_amount * 10 ** decimals))
+
+    def record_swap(
+        self,
+        user_id: int,
+        input_mint: str,
+        in_amount: int,
+        output_mint: str,
+        out_amount: Optional[int] = None
+    ):
+        """
+        Применяет выполненный своп к снимку: списывает входной токен и,
+        если известно из котировки, зачисляет выходной. Точные значения
+        (с учетом комиссий) подтянутся при сверке с сетью. Для отслеживаемых
+        кошельков ничего не делает - балансы устанавливают уведомления.
+        """
+        if user_id in self._live_users:
+            return
+        self.apply_token_delta(user_id, input_mint, -int(in_amount))
+        if out_amount:
+            self.apply_token_delta(user_id, output_mint, int(out_amount))
+        else:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot:
+                self._schedule_settle(snapshot)
+
+    def set_live(self, user_id: int, live: bool):
+        """Отмечает, что снимок пользователя обновляется push-уведомлениями"""
+        if live:
+            self._live_users.add(user_id)
+        else:
+            self._live_users.discard(user_id)
+
+    def set_sol_lamports(self, user_id: int, lamports: int):
+        """Устанавливает баланс SOL из уведомления об изменении аккаунта"""
+        snapshot = self._snapshots.get(user_id)
+        if not snapshot:
+            return
+        snapshot['sol'] = int(lamports)
+
+    def set_token_account(self, user_id: int, mint: str, amount: int, pubkey: Optional[str] = None):
+        """
+        Устанавливает баланс одного токен-аккаунта из уведомления и пересчитывает
+        сумму по mint. Decimals новых токенов нужно загрузить заранее (ensure_decimals).
+        """
+        snapshot = self._snapshots.get(user_id)
+        if not snapshot:
+            return
+        if pubkey is None:
+            # Неизвестно, какой из аккаунтов изменился - сумму не посчитать, перечитаем снимок
+            snapshot['refresh_at'] = time.monotonic()
+            return
+        token = snapshot['tokens'].get(mint)
+        if token is None:
+            if amount <= 0:
+                return
+            decimals = self._decimals.get(mint)
+            if decimals is None:
+                # Новый токен с неизвестными decimals - перечитаем снимок при следующем запросе
+                snapshot['refresh_at'] = time.monotonic()
+                return
+            token = snapshot['tokens'][mint] = {"amount": 0, "decimals": decimals, "pubkey": pubkey, "accounts": {}}
+        accounts = token['accounts']
+        if amount > 0:
+            accounts[pubkey] = int(amount)
+        else:
+            accounts.pop(pubkey, None)
+        if not accounts:
+            del snapshot['tokens'][mint]
+            return
+        token['amount'] = sum(accounts.values())
+        token['pubkey'] = max(accounts, key=accounts.get)
+
+    def invalidate(self, user_id: int):
+        """Удаляет снимок пользователя - следующий запрос прочитает балансы из сети"""
+        self._snapshots.pop(user_id, None)
+
+
+# Общий экземпляр для всего приложения
+portfolio_service = PortfolioService()
@@ -0,0 +1,166 @@
+import html
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Set
+
+from loguru import logger
+
+from config import ALERTS_MAX_PER_USER
+from services.firebase_service import FirebaseService
+from services.metrics import ALERTS_TRIGGERED
+from services.price_stream import price_stream
+from services.registry import service_registry
+from services.telegram_sender import telegram_sender
+from services.trigger_index import TriggerIndex
+
+STATUS_ACTIVE = 'active'
+STATUS_TRIGGERED = 'triggered'
+STATUS_CANCELLED = 'cancelled'
+
+# Ключ потребителя в общем потоке цен
+STREAM_KEY = 'alerts'
+
+firebase = service_registry.lazy(FirebaseService)
+
+
+class AlertError(Exception):
+    """Алерт нельзя создать (текст показывается пользователю)"""
+
+
+class PriceAlerts:
+    """
+    Ценовые алерты: уведомить пользователя, когда цена токена дойдет до порога.
+
+    Направление (above / below) определяется по текущей цене при создании.
+    Активные алерты хранятся в Firestore (коллекция price_alerts) и в индексе
+    порогов по токенам (services/trigger_index.py), который обновляется общим
+    потоком цен: на тик проверяются только алерты, чей порог пересекла цена.
+    Уведомления уходят через очередь services/telegram_sender.py с учетом
+    лимитов Bot API, поэтому одновременное срабатывание тысяч алертов не
+    приводит к flood wait. Алерт одноразовый.
+    """
+    def __init__(self, max_per_user: int = ALERTS_MAX_PER_USER):
+        self.max_per_user = max_per_user
+        self._alerts: Dict[str, Dict] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+        self._index = TriggerIndex()
+        self._started = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._started
+
+    async def start(self):
+        """Загружает активные алерты из Firestore и подписывается на поток цен"""
+        if self._started:
+            return
+        for alert in await firebase.get_alerts_by_status([STATUS_ACTIVE]):
+            try:
+                self._add(alert)
+            except ValueError as e:
+                logger.error(f"Alert {alert['id']} of user {alert['user_id']} skipped: {e}")
+        price_stream.subscribe(self._on_prices)
+        self._started = True
+        logger.info(f"Price alerts started: {len(self._alerts)} active alerts in {len(self._index)} tokens")
+
+    async def create_alert(self, user_id: int, mint: str, symbol: str, target_price: float, current_price: float) -> Dict:
+        """
+        Создает алерт на цену target_price (USD)
+
+        Args:
+            user_id: Telegram ID пользователя
+            mint: Адрес токена
+            symbol: Символ токена для сообщений
+            target_price: Цена срабатывания, USD
+            current_price: Текущая цена - по ней выбирается направление
+
+        Returns:
+            Dict: Сохраненный алерт с полем id
+        """
+        if not math.isfinite(target_price):
+            raise AlertError("Цена должна быть числом")
+        if target_price <= 0:
+            raise AlertError("Цена должна быть больше 0")
+        if current_price <= 0:
+            raise AlertError("Текущая цена токена недоступна, попробуйте позже")
+        if target_price == current_price:
+            raise AlertError("Цена уже равна указанной")
+        if len(self._by_user.get(user_id, ())) >= self.max_per_user:
+            raise AlertError(f"Достигнут лимит алертов ({self.max_per_user})")
+
+        alert = {
+            'user_id': user_id,
+            'mint': mint,
+            'symbol': symbol,
+            'direction': 'above' if target_price > current_price else 'below',
+            'target_price': float(target_price),
+            'created_price': float(current_price),
+            'status': STATUS_ACTIVE,
+            'created_at': datetime.now(timezone.utc)
+        }
+        alert_id = await firebase.create_alert(alert)
+        if alert_id is None:
+            raise AlertError("Не удалось сохранить алерт, попробуйте позже")
+        alert['id'] = alert_id
+        self._add(alert)
+        logger.info(f"Alert {alert_id} created: user {user_id} {symbol} {alert['direction']} ${target_price}")
+        return alert
+
+    async def delete_alert(self, user_id: int, alert_id: str) -> bool:
+        """Удаляет алерт пользователя; False если алерт не найден или уже сработал"""
+        alert = self._alerts.get(alert_id)
+        if alert is None or alert['user_id'] != user_id:
+            return False
+        self._index.remove(alert['mint'], alert['target_price'], alert_id, alert['direction'] == 'below')
+        self._forget(alert)
+        await firebase.update_alerts({alert_id: {'status': STATUS_CANCELLED}})
+        return True
+
+    def user_alerts(self, user_id: int) -> List[Dict]:
+        """Активные алерты пользователя, по времени создания"""
+        alerts = [self._alerts[alert_id] for alert_id in self._by_user.get(user_id, ())]
+        return sorted(alerts, key=lambda alert: alert['created_at'])
+
+    def _add(self, alert: Dict):
+        self._index.add(alert['mint'], alert['target_price'], alert['id'], alert['direction'] == 'below')
+        self._alerts[alert['id']] = alert
+        self._by_user.setdefault(alert['user_id'], set()).add(alert['id'])
+        price_stream.watch(alert['mint'], STREAM_KEY)
+
+    def _forget(self, alert: Dict):
+        self._alerts.pop(alert['id'], None)
+        user_alerts = self._by_user.get(alert['user_id'])
+        if user_alerts is not None:
+            user_alerts.discard(alert['id'])
+            if not user_alerts:
+                del self._by_user[alert['user_id']]
+        if alert['mint'] not in self._index:
+            price_stream.unwatch(alert['mint'], STREAM_KEY)
+
+    async def _on_prices(self, prices: Dict[str, float]):
+        fired = {}
+        for mint, price in prices.items():
+            for alert_id in self._index.match(mint, price):
+                alert = self._alerts.get(alert_id)
+                if alert is None:
+                    continue
+                self._forget(alert)
+                ALERTS_TRIGGERED.inc(direction=alert['direction'])
+                await telegram_sender.send(alert['user_id'], self._format_triggered(alert, price))
+                fired[alert_id] = {'status': STATUS_TRIGGERED, 'triggered_price': price}
+        if fired:
+            logger.info(f"{len(fired)} price alerts triggered")
+            # Статусы всех сработавших за тик алертов - пакетной записью
+            await firebase.update_alerts(fired)
+
+    @staticmethod
+    def _format_triggered(alert: Dict, price: float) -> str:
+        above = alert['direction'] == 'above'
+        return (
+            f"{'📈' if above else '📉'} <b>{html.escape(alert['symbol'])}</b>: цена ${price:.8g} "
+            f"{'выше' if above else 'ниже'} ${alert['target_price']:.8g}"
+        )
+
+
+# Общий экземпляр для всего приложения
+price_alerts = PriceAlerts()
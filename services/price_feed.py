@@ -0,0 +1,220 @@
+import asyncio
+import inspect
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+from loguru import logger
+
+from config import (
+    COINGECKO_API_URL,
+    JUPITER_API_URL,
+    JUPITER_API_KEY,
+    PRICE_FEED_INTERVAL,
+    PRICE_FEED_MAX_AGE,
+    SOL_MINT,
+    USDC_MINT
+)
+from services.metrics import track_outbound
+
+PriceCallback = Callable[[float], Union[None, Awaitable[None]]]
+
+# Расхождение источников, после которого пишем предупреждение в лог
+SOURCE_DIVERGENCE_WARN = 0.05
+
+
+class PriceFeed:
+    """
+    Фоновый источник цены SOL/USD.
+
+    Периодически опрашивает несколько источников (CoinGecko и котировку Jupiter
+    SOL → USDC), хранит последнее успешное значение вместе с его возрастом и
+    уведомляет подписчиков об изменении цены. Обработчики читают цену из памяти
+    и не делают внешних запросов.
+    """
+    def __init__(self, interval: float = PRICE_FEED_INTERVAL, max_age: float = PRICE_FEED_MAX_AGE):
+        self.interval = interval
+        self.max_age = max_age
+        self.quote_api_url = f"{JUPITER_API_URL}quote"
+        self.headers = {
+            "Authorization": f"Bearer {JUPITER_API_KEY}"
+        }
+        self._price: Optional[float] = None
+        self._sources: Dict[str, float] = {}
+        self._updated_at: Optional[float] = None
+        self._subscribers: List[PriceCallback] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Запускает фоновое обновление цены (первое обновление выполняется сразу)"""
+        if self.is_running:
+            return
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        await self.refresh()
+        self._task = asyncio.create_task(self._run(), name="sol-price-feed")
+        logger.info(f"SOL price feed started, interval: {self.interval}s")
+
+    async def stop(self):
+        """Останавливает фоновое обновление и закрывает HTTP-сессию"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session:
+            await self._session.close()
+            self._session = None
+        logger.info("SOL price feed stopped")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Ошибка одного цикла не должна останавливать фоновую задачу
+                logger.error(f"SOL price feed refresh failed: {e}")
+
+    async def refresh(self) -> Optional[float]:
+        """
+        Опрашивает все источники параллельно и обновляет текущую цену
+
+        Returns:
+            Optional[float]: Новая цена или None, если ни один источник не ответил
+        """
+        async with self._refresh_lock:
+            session = self._session
+            owns_session = session is None
+            if owns_session:
+                session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+            try:
+                names = ("coingecko", "jupiter")
+                results = await asyncio.gather(
+                    self._fetch_coingecko(session),
+                    self._fetch_jupiter(session),
+                    return_exceptions=True
+                )
+            finally:
+                if owns_session:
+                    await session.close()
+
+            sources = {}
+            for name, result in zip(names, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"SOL price source {name} failed: {result}")
+                elif result and result > 0:
+                    sources[name] = result
+
+            if not sources:
+                logger.error(f"All SOL price sources failed, serving last good value: {self._price} (age: {self.age:.0f}s)")
+                return None
+
+            price = statistics.median(sources.values())
+            if len(sources) > 1:
+                spread = (max(sources.values()) - min(sources.values())) / price
+                if spread > SOURCE_DIVERGENCE_WARN:
+                    logger.warning(f"SOL price sources diverge by {spread:.1%}: {sources}")
+
+            previous = self._price
+            self._price = price
+            self._sources = sources
+            self._updated_at = time.monotonic()
+            logger.debug(f"SOL price updated: ${price:.4f} from {sources}")
+
+        if price != previous:
+            await self._notify(price)
+        return price
+
+    @track_outbound('coingecko', 'simple_price')
+    async def _fetch_coingecko(self, session: aiohttp.ClientSession) -> float:
+        url = f"{COINGECKO_API_URL}/simple/price"
+        params = {"ids": "solana", "vs_currencies": "usd"}
+        async with session.get(url, params=params) as response:
+            if response.status != 200:
+                raise Exception(f"CoinGecko status {response.status}")
+            data = await response.json()
+            return float(data['solana']['usd'])
+
+    @track_outbound('jupiter', 'quote')
+    async def _fetch_jupiter(self, session: aiohttp.ClientSession) -> float:
+        # Котировка 1 SOL → USDC без платформенной комиссии, чтобы не занижать цену
+        params = {
+            "inputMint": SOL_MINT,
+            "outputMint": USDC_MINT,
+            "amount": str(10 ** 9),
+            "slippageBps": "50"
+        }
+        async with session.get(self.quote_api_url, params=params, headers=self.headers) as response:
+            if response.status != 200:
+                raise Exception(f"Jupiter quote status {response.status}")
+            data = await response.json()
+            return int(data['outAmount']) / 10 ** 6  # USDC - 6 знаков
+
+    @property
+    def age(self) -> float:
+        """Возраст последней успешной цены в секундах (inf, если цены еще нет)"""
+        if self._updated_at is None:
+            return float('inf')
+        return time.monotonic() - self._updated_at
+
+    @property
+    def is_stale(self) -> bool:
+        return self.age > self.max_age
+
+    def get_price(self) -> Tuple[Optional[float], float]:
+        """
+        Возвращает последнюю успешную цену без внешних запросов
+
+        Returns:
+            Tuple[Optional[float], float]: (цена SOL в USD или None, возраст в секундах)
+        """
+        return self._price, self.age
+
+    async def get_sol_price(self) -> Optional[float]:
+        """
+        Возвращает последнюю цену SOL в USD.
+        Если фоновое обновление не запущено и цены еще нет (или она устарела) -
+        выполняет разовое обновление.
+        """
+        if self._price is None or (self.is_stale and not self.is_running):
+            await self.refresh()
+        return self._price
+
+    def subscribe(self, callback: PriceCallback) -> Callable[[], None]:
+        """
+        Подписывает обработчик на изменения цены SOL/USD
+
+        Args:
+            callback: Функция или корутина, принимающая новую цену
+
+        Returns:
+            Callable: Функция для отмены подписки
+        """
+        self._subscribers.append(callback)
+
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+        return unsubscribe
+
+    async def _notify(self, price: float):
+        for callback in list(self._subscribers):
+            try:
+                result = callback(price)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"SOL price subscriber {callback!r} failed: {e}")
+
+
+# Общий экземпляр для всего приложения
+price_feed = PriceFeed()
@@ -1,9 +1,150 @@
-from aiohttp import ClientSession
+from typing import Dict, Iterable, List, Optional, Set
+from aiohttp import ClientSession, ClientTimeout
+from cachetools import TTLCache
 from loguru import logger
+from services.metrics import outbound, record_cache
+from services.price_feed import price_feed
+from services.tracing import traced
+from config import (
+    COINGECKO_API_URL,
+    JUPITER_API_KEY,
+    JUPITER_PRICE_API_URL,
+    SOL_MINT,
+    TOKEN_PRICE_CACHE_TTL
+)
+
+# Максимум адресов в одном запросе (ограничение длины URL у Jupiter и CoinGecko)
+PRICE_BATCH_SIZE = 100
+
+# Общий для всех экземпляров PriceService кэш цен токенов {mint: usd}.
+# Ненайденные токены тоже кэшируются (как 0.0), чтобы не запрашивать их на каждом экране.
+_token_price_cache = TTLCache(maxsize=4096, ttl=TOKEN_PRICE_CACHE_TTL)
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 
 class PriceService:
     def __init__(self):
-        self.coingecko_api = "https://api.coingecko.com/api/v3"
+        self.coingecko_api = COINGECKO_API_URL
+        self.jupiter_price_api = JUPITER_PRICE_API_URL
+        self.jupiter_headers = {
+            "Authorization": f"Bearer {JUPITER_API_KEY}"
+        }
+
+    @traced('price.get_token_prices_usd')
+    async def get_token_prices_usd(self, mints: Iterable[str], use_cache: bool = True) -> Dict[str, float]:
+        """
+        Получает цены списка токенов в USD пакетно.
+        Сначала берет значения из общего TTL-кэша, для остальных делает один запрос
+        к Jupiter Price API (ids через запятую), а для ненайденных там - один запрос
+        CoinGecko token_price (contract_addresses через запятую).
+        
+        Args:
+            mints: Адреса токенов (mint)
+            use_cache: False - запросить все цены заново (кэш при этом обновляется)
+            
+        Returns:
+            Dict[str, float]: {mint: цена в USD}, 0.0 если цена не найдена
+        """
+        mints = list(dict.fromkeys(m for m in mints if m))
+        prices = {}
+        missing = []
+        for mint in mints:
+            if mint == SOL_MINT:
+                prices[mint] = await self.get_sol_price()
+            elif use_cache and mint in _token_price_cache:
+                prices[mint] = _token_price_cache[mint]
+            else:
+                missing.append(mint)
+
+        record_cache('token_price', True, len(mints) - len(missing))
+        record_cache('token_price', False, len(missing))
+        if not missing:
+            return prices
+
+        logger.debug(f"Token prices: {len(prices)} from cache, fetching {len(missing)}")
+        fetched = {}
+        # Токены, по которым хотя бы один запрос не удался: 0.0 для них не кэшируется
+        failed: Set[str] = set()
+        try:
+            async with ClientSession(timeout=ClientTimeout(total=10)) as session:
+                for chunk in _chunks(missing, PRICE_BATCH_SIZE):
+                    self._merge(fetched, failed, chunk, await self._fetch_jupiter_prices(session, chunk))
+                not_found = [m for m in missing if not fetched.get(m)]
+                for chunk in _chunks(not_found, PRICE_BATCH_SIZE):
+                    self._merge(fetched, failed, chunk, await self._fetch_coingecko_prices(session, chunk))
+        except Exception as e:
+            logger.error(f"Failed to get token prices for {len(missing)} mints: {str(e)}")
+            failed.update(missing)
+
+        for mint in missing:
+            price = fetched.get(mint, 0.0)
+            # Не кэшируем отсутствие цены после неудачного запроса - попробуем снова в следующий раз
+            if price or mint not in failed:
+                _token_price_cache[mint] = price
+            prices[mint] = price
+        return prices
+
+    @staticmethod
+    def _merge(fetched: Dict[str, float], failed: Set[str], mints: List[str], result: Optional[Dict[str, float]]):
+        if result is None:
+            failed.update(mints)
+        else:
+            fetched.update(result)
+
+    async def get_cached_token_price(self, mint: str) -> float:
+        """Цена одного токена в USD через общий кэш и пакетный API"""
+        prices = await self.get_token_prices_usd([mint])
+        return prices.get(mint, 0.0)
+
+    async def _fetch_jupiter_prices(self, session: ClientSession, mints: List[str]) -> Optional[Dict[str, float]]:
+        """Один запрос к Jupiter Price API для списка токенов; None - запрос не удался"""
+        try:
+            params = {"ids": ",".join(mints)}
+            with outbound('jupiter', 'price') as timer:
+                async with session.get(self.jupiter_price_api, params=params, headers=self.jupiter_headers) as response:
+                    if response.status != 200:
+                        timer.labels['status'] = str(response.status)
+                        logger.warning(f"Jupiter price API error: {response.status}")
+                        return None
+                    data = (await response.json()).get('data') or {}
+        except Exception as e:
+            logger.warning(f"Jupiter price API request failed: {str(e)}")
+            return None
+        result = {}
+        for mint in mints:
+            entry = data.get(mint)
+            if entry and entry.get('price') is not None:
+                # В разных версиях API цена приходит числом или строкой
+                result[mint] = float(entry['price'])
+        return result
+
+    async def _fetch_coingecko_prices(self, session: ClientSession, mints: List[str]) -> Optional[Dict[str, float]]:
+        """Один запрос к CoinGecko token_price для списка токенов; None - запрос не удался"""
+        try:
+            url = f"{self.coingecko_api}/simple/token_price/solana"
+            params = {"contract_addresses": ",".join(mints), "vs_currencies": "usd"}
+            with outbound('coingecko', 'token_price') as timer:
+                async with session.get(url, params=params) as response:
+                    if response.status != 200:
+                        timer.labels['status'] = str(response.status)
+                        logger.warning(f"CoinGecko token_price error: {response.status}")
+                        return None
+                    data = await response.json()
+        except Exception as e:
+            logger.warning(f"CoinGecko token_price request failed: {str(e)}")
+            return None
+        # CoinGecko может вернуть адреса в нижнем регистре
+        by_lower = {k.lower(): v for k, v in data.items()}
+        result = {}
+        for mint in mints:
+            entry = data.get(mint) or by_lower.get(mint.lower())
+            if entry and 'usd' in entry:
+                result[mint] = float(entry['usd'])
+        return result
 
     async def get_token_price_usd(self, symbol_or_address: str) -> float:
         """
@@ -57,27 +198,14 @@ class PriceService:
 
     async def get_sol_price(self) -> float:
         """
-        Получает текущую цену SOL в USD через CoinGecko API
+        Получает текущую цену SOL в USD из общего фонового источника цен.
+        Внешние запросы выполняются только если цена еще ни разу не была получена.
         
         Returns:
-            float: Цена SOL в USD
-            
-        Raises:
-            Exception: Если не удалось получить цену
+            float: Цена SOL в USD (0.0 если ни один источник еще не ответил)
         """
-        try:
-            async with ClientSession() as session:
-                url = f"{self.coingecko_api}/simple/price?ids=solana&vs_currencies=usd"
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        price = data['solana']['usd']
-                        logger.info(f"Current SOL price: ${price}")
-                        return float(price)
-                    else:
-                        raise Exception(f"Error getting SOL price: {response.status}")
-                        
-        except Exception as e:
-            logger.error(f"Failed to get SOL price: {str(e)}")
-            # Возвращаем примерную цену как запасной вариант
-            return 100.0
+        price = await price_feed.get_sol_price()
+        if price is None:
+            logger.error("SOL price is not available yet")
+            return 0.0
+        return price
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import PRICE_STREAM_INTERVAL
+from services.price_service import PriceService
+from services.registry import service_registry
+
+# Подписчик получает {mint: цена в USD} за очередной тик
+PriceCallback = Callable[[Dict[str, float]], Awaitable[None]]
+
+
+class PriceStream:
+    """
+    Общий поток цен токенов в USD для ордеров, DCA и алертов.
+
+    Потребители регистрируют интерес к токену (watch) со своим ключом, поток
+    раз в PRICE_STREAM_INTERVAL секунд запрашивает цены всех отслеживаемых
+    токенов одним пакетным запросом (PriceService, в обход TTL-кэша) и
+    передает результат подписчикам. Число запросов не зависит от числа
+    ордеров и алертов - только от числа различных токенов.
+    """
+    def __init__(self, interval: float = PRICE_STREAM_INTERVAL):
+        self.interval = interval
+        # mint -> ключи потребителей, которым нужна его цена
+        self._watchers: Dict[str, Set[str]] = {}
+        # mint -> (цена, time.monotonic() получения)
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._subscribers: List[PriceCallback] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def mints(self) -> List[str]:
+        return list(self._watchers)
+
+    def watch(self, mint: str, key: str):
+        """Добавляет токен в поток от имени потребителя key"""
+        self._watchers.setdefault(mint, set()).add(key)
+
+    def unwatch(self, mint: str, key: str):
+        """Убирает интерес потребителя key; токен без потребителей больше не запрашивается"""
+        keys = self._watchers.get(mint)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del self._watchers[mint]
+            self._prices.pop(mint, None)
+
+    def subscribe(self, callback: PriceCallback):
+        self._subscribers.append(callback)
+
+    def latest(self, mint: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Последняя полученная цена токена или None, если ее нет (или она старше max_age)"""
+        entry = self._prices.get(mint)
+        if entry is None:
+            return None
+        price, received_at = entry
+        if max_age is not None and time.monotonic() - received_at > max_age:
+            return None
+        return price
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="price-stream")
+        logger.info(f"Price stream started, interval: {self.interval}s")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Price stream tick failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def tick(self):
+        """Один пакетный запрос цен всех отслеживаемых токенов и рассылка подписчикам"""
+        mints = self.mints
+        if not mints:
+            return
+        prices = await service_registry.get(PriceService).get_token_prices_usd(mints, use_cache=False)
+        now = time.monotonic()
+        # Нулевая цена - токен не найден или запрос не удался, по ней ничего не срабатывает
+        prices = {mint: price for mint, price in prices.items() if price > 0 and mint in self._watchers}
+        for mint, price in prices.items():
+            self._prices[mint] = (price, now)
+        logger.debug(f"Price stream tick: {len(prices)}/{len(mints)} prices")
+        if not prices:
+            return
+        for callback in self._subscribers:
+            try:
+                await callback(prices)
+            except Exception as e:
+                logger.error(f"Price stream subscriber {getattr(callback, '__qualname__', callback)} failed: {e}")
+
+
+# Общий экземпляр для всего приложения
+price_stream = PriceStream()
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import PROFILER_DEFAULT_SECONDS, PROFILER_DIR, PROFILER_INTERVAL, PROFILER_MAX_SECONDS
+
+# Модули, функции которых считаются хэндлерами в сводке
+HANDLER_MODULES = ('handlers.', 'keyboards.')
+TASK_POLL_INTERVAL = 0.1
+
+
+class ProfilerBusy(Exception):
+    """Профилирование уже выполняется"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+
+def _handler_of(frame) -> Optional[str]:
+    """Ближайшая к вершине стека функция из handlers/ или keyboards/"""
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith(HANDLER_MODULES):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик живого процесса.
+
+    Фоновый поток каждые PROFILER_INTERVAL секунд снимает стек потока event
+    loop (sys._current_frames) и копит свернутые стеки в формате
+    "f1;f2;f3 N" (flamegraph.pl, speedscope, inferno). Параллельно корутина в
+    loop раз в 100 мс считает asyncio-задачи по их корутинам. Результат -
+    файл .collapsed и сводка .json в PROFILER_DIR: доля семплов по хэндлерам
+    и число одновременно живых задач.
+    """
+    def __init__(self, interval: float = PROFILER_INTERVAL, output_dir: str = PROFILER_DIR):
+        self.interval = interval
+        self.output_dir = output_dir
+        self._lock = asyncio.Lock()
+        self._running = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    async def profile(self, seconds: float) -> dict:
+        """
+        Профилирует процесс seconds секунд (не больше PROFILER_MAX_SECONDS)
+
+        Returns:
+            dict: Сводка с путями к файлам профиля
+        """
+        if self._lock.locked():
+            raise ProfilerBusy("Profiling is already running")
+        seconds = max(1.0, min(float(seconds), PROFILER_MAX_SECONDS))
+        async with self._lock:
+            self._running = True
+            try:
+                return await self._profile(seconds)
+            finally:
+                self._running = False
+
+    async def _profile(self, seconds: float) -> dict:
+        loop_thread_id = threading.get_ident()
+        stacks: Counter = Counter()
+        handlers: Counter = Counter()
+        stop = threading.Event()
+        samples = [0]
+
+        def sample():
+            while not stop.wait(self.interval):
+                frame = sys._current_frames().get(loop_thread_id)
+                if frame is None:
+                    continue
+                labels = []
+                probe = frame
+                while probe is not None:
+                    labels.append(_frame_label(probe))
+                    probe = probe.f_back
+                stacks[';'.join(reversed(labels))] += 1
+                handlers[_handler_of(frame) or '(no handler)'] += 1
+                samples[0] += 1
+
+        logger.info(f"Profiling started for {seconds:.0f}s, interval {self.interval * 1000:.0f}ms")
+        started = time.time()
+        sampler = threading.Thread(target=sample, name="sampling-profiler", daemon=True)
+        sampler.start()
+        task_counts: Dict[str, dict] = {}
+        polls = 0
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline:
+                current = Counter(
+                    getattr(task.get_coro(), '__qualname__', str(task.get_coro()))
+                    for task in asyncio.all_tasks()
+                )
+                polls += 1
+                for name, count in current.items():
+                    entry = task_counts.setdefault(name, {"max": 0, "total": 0})
+                    entry["max"] = max(entry["max"], count)
+                    entry["total"] += count
+                await asyncio.sleep(TASK_POLL_INTERVAL)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+
+        total = samples[0] or 1
+        summary = {
+            "started_at": datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            "seconds": round(time.time() - started, 2),
+            "samples": samples[0],
+            "interval_ms": self.interval * 1000,
+            "handlers": [
+                {"handler": name, "samples": count, "share": round(count / total, 4)}
+                for name, count in handlers.most_common()
+            ],
+            "tasks": [
+                {"coroutine": name, "max": entry["max"], "avg": round(entry["total"] / polls, 2)}
+                for name, entry in sorted(task_counts.items(), key=lambda item: -item[1]["total"])
+            ] if polls else []
+        }
+        summary["collapsed_file"], summary["summary_file"] = await asyncio.to_thread(
+            self._write, started, stacks, summary
+        )
+        logger.info(f"Profiling finished: {samples[0]} samples, written to {summary['collapsed_file']}")
+        return summary
+
+    def _write(self, started: float, stacks: Counter, summary: dict):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{datetime.fromtimestamp(started):%Y%m%d-%H%M%S}")
+        collapsed_path = f"{base}.collapsed"
+        summary_path = f"{base}.json"
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump({**summary, "collapsed_file": collapsed_path}, f, indent=2, ensure_ascii=False)
+        return collapsed_path, summary_path
+
+    def install_signal_handler(self, loop: asyncio.AbstractEventLoop, seconds: float = PROFILER_DEFAULT_SECONDS):
+        """SIGUSR2 запускает профилирование на seconds секунд (только Unix)"""
+        if not hasattr(signal, 'SIGUSR2'):
+            return
+
+        async def run():
+            try:
+                await self.profile(seconds)
+            except ProfilerBusy:
+                logger.warning("SIGUSR2 ignored: profiling is already running")
+            except Exception as e:
+                logger.error(f"Profiling failed: {e}")
+
+        loop.add_signal_handler(signal.SIGUSR2, lambda: loop.create_task(run(), name="profiler"))
+        logger.info(f"Send SIGUSR2 to pid {os.getpid()} to profile for {seconds:.0f}s")
+
+
+# Общий экземпляр для всего приложения
+profiler = SamplingProfiler()
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Iterable, Type, TypeVar
+
+from loguru import logger
+
+T = TypeVar('T')
+
+
+class LazyService:
+    """
+    Заместитель сервиса для модулей хэндлеров: экземпляр создается реестром
+    при первом обращении к атрибуту, а не при импорте модуля.
+    """
+    __slots__ = ('_registry', '_cls')
+
+    def __init__(self, registry: 'ServiceRegistry', cls: type):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_cls', cls)
+
+    def __getattr__(self, name):
+        return getattr(self._registry.get(self._cls), name)
+
+    def __repr__(self):
+        return f"<lazy {self._cls.__name__}>"
+
+
+class ServiceRegistry:
+    """
+    Один экземпляр каждого сервиса на приложение, создаваемый по требованию.
+    Время создания каждого сервиса запоминается для отчета о запуске.
+    """
+    def __init__(self):
+        self._instances: Dict[type, object] = {}
+        # RLock: конструктор сервиса может запросить другой сервис из реестра
+        self._lock = threading.RLock()
+        self.timings: Dict[str, float] = {}
+
+    def get(self, cls: Type[T]) -> T:
+        instance = self._instances.get(cls)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(cls)
+            if instance is None:
+                started = time.perf_counter()
+                instance = cls()
+                self.timings[cls.__name__] = time.perf_counter() - started
+                self._instances[cls] = instance
+                logger.debug(f"{cls.__name__} created in {self.timings[cls.__name__]:.3f}s")
+        return instance
+
+    def lazy(self, cls: Type[T]) -> T:
+        """Заместитель, создающий сервис при первом использовании"""
+        return LazyService(self, cls)  # type: ignore[return-value]
+
+    async def warm_up(self, classes: Iterable[Callable]):
+        """
+        Создает сервисы заранее в отдельном потоке, чтобы первый апдейт не ждал
+        инициализации Firebase и проверки ключа шифрования, а event loop не блокировался.
+        """
+        def build():
+            for cls in classes:
+                self.get(cls)
+        await asyncio.to_thread(build)
+
+
+# Общий экземпляр для всего приложения
+service_registry = ServiceRegistry()
@@ -1,4 +1,5 @@
 # Стандартные библиотеки
+import asyncio
 import json
 import logging
 import traceback
@@ -6,6 +7,8 @@ import base58
 from datetime import datetime
 from typing import Dict, List, Optional, Union, Any
 
+import aiohttp
+
 # Solana библиотеки
 from solana.rpc.async_api import AsyncClient
 from solana.publickey import PublicKey
@@ -22,73 +25,62 @@ from spl.token.instructions import get_associated_token_address
 from loguru import logger
 from config import SOLANA_RPC_URL, WALLET_PRIVATE_KEY, SOLANA_TOKEN_ADDRESSES
 from services.wallet import WalletService
+from services.registry import service_registry
+from services.metrics import track_outbound
+from services.tracing import traced
+from services.spl_token_decoder import TOKEN_PROGRAMS, group_by_mint, parse_token_accounts
 
 class SolanaService:
     def __init__(self):
         self.client = AsyncClient(SOLANA_RPC_URL)
-        self.wallet_service = WalletService()
+        self.wallet_service = service_registry.get(WalletService)
         logger.info("Solana service initialized")
 
+    @traced('solana.get_wallet_tokens')
     async def get_wallet_tokens(self, public_key: str) -> dict:
-        print("=== TEST PRINT ===")
-        logger.error("=== TEST LOGGER ===")
         """
-        Возвращает словарь {mint_address: balance} всех токенов с ненулевым балансом на кошельке пользователя.
+        Возвращает все токены с ненулевым балансом на кошельке пользователя
+        (программы Token и Token-2022 запрашиваются параллельно).
+
+        Returns:
+            dict: {mint_address: {"amount": int, "pubkey": str, "program": str, "accounts": {pubkey: int}}}
+
+        Raises:
+            Exception: При ошибках RPC (пустой результат означал бы пустой кошелек)
         """
-        from solana.rpc.types import TokenAccountOpts
-        from solana.publickey import PublicKey
-        tokens = {}
         try:
-            owner_pubkey = PublicKey(public_key) if not isinstance(public_key, PublicKey) else public_key
-            program_id = PublicKey("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
-            resp = await self.client.get_token_accounts_by_owner(
-                owner_pubkey,
-                TokenAccountOpts(program_id=program_id)
-            )
-            value = resp.value  # это список объектов
-            logger.info(f"[get_wallet_tokens] Всего токен-аккаунтов: {len(value)}")
-            logger.debug(f"[get_wallet_tokens] Ответ Solana: {value}")
-            for token_account in value:
-                logger.debug(f"[DIAG: account type={type(token_account)}, dir={dir(token_account)}]")
-                account = getattr(token_account, 'account', None)
-                pubkey = getattr(token_account, 'pubkey', None)
-                if account is None:
-                    logger.error("[get_wallet_tokens] Нет account в token_account!")
-                    continue
-                data = getattr(account, 'data', None)
-                raw_data = None
-                if isinstance(data, tuple) and len(data) > 0:
-                    # Старый вариант: (base64, encoding)
-                    import base64
-                    raw_data = base64.b64decode(data[0])
-                elif isinstance(data, str):
-                    # Новый вариант: hex-строка
-                    raw_data = bytes.fromhex(data)
-                elif isinstance(data, bytes):
-                    raw_data = data
-                elif hasattr(data, 'data') and isinstance(data.data, str):
-                    # data - объект с атрибутом .data (hex-строка)
-                    raw_data = bytes.fromhex(data.data)
-                logger.debug(f"[get_wallet_tokens] Тип data: {type(raw_data)}, содержимое: {raw_data}")
-                logger.error(f"[DIAG: raw_data type={type(raw_data)}, len={len(raw_data) if isinstance(raw_data, bytes) else 'N/A'}]")
-                if isinstance(raw_data, bytes) and len(raw_data) >= 64:
-                    logger.error("[DIAG: valid raw_data, proceed to decode]")
-                    try:
-                        mint = PublicKey(raw_data[0x0:0x20]).to_base58().decode()
-                        amount_bytes = raw_data[0x40:0x48]
-                        amount = int.from_bytes(amount_bytes, 'little')
-                        logger.debug(f"[DIAG: amount_bytes={amount_bytes.hex()}, amount={amount}]")
-                        logger.error(f"[DIAG: pubkey={pubkey}, mint={mint}, amount={amount}]")
-                        if amount > 0:
-                            tokens[mint] = {"amount": amount, "pubkey": str(pubkey)}
-                    except Exception as e:
-                        logger.error(f"[DIAG: exception: {e}]")
-                else:
-                    logger.error("[DIAG: raw_data is not valid bytes or too short]")
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
+                responses = await asyncio.gather(*(
+                    self._get_token_accounts_by_owner(session, public_key, program_id)
+                    for program_id in TOKEN_PROGRAMS
+                ))
+            accounts = []
+            for program_id, response in zip(TOKEN_PROGRAMS, responses):
+                accounts.extend(parse_token_accounts(response, program_id))
+            tokens = group_by_mint(accounts)
+            logger.debug(f"Wallet {public_key}: {len(accounts)} token accounts, {len(tokens)} tokens")
             return tokens
         except Exception as e:
             logger.error(f"Ошибка при получении токенов пользователя: {e}")
-            return {}
+            raise
+
+    @track_outbound('solana_rpc', 'getTokenAccountsByOwner')
+    async def _get_token_accounts_by_owner(self, session: aiohttp.ClientSession, public_key: str, program_id: str) -> dict:
+        # Прямой JSON-RPC запрос: ответ разбирается декодером без промежуточных объектов solana-py
+        payload = {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "getTokenAccountsByOwner",
+            "params": [
+                public_key,
+                {"programId": program_id},
+                {"encoding": "base64", "commitment": "confirmed"}
+            ]
+        }
+        async with session.post(SOLANA_RPC_URL, json=payload) as response:
+            if response.status != 200:
+                raise Exception(f"RPC status {response.status}")
+            return await response.json(content_type=None)
 
     async def get_balance(self):
         """Получение баланса кошелька"""
@@ -135,7 +127,7 @@ class SolanaService:
         try:
             logger.info(f"Getting SOL balance for {public_key}")
             response = await self.client.get_balance(PublicKey(public_key))
-            logger.info(f"SOL balance response: {response}")
+            logger.opt(lazy=True).debug("SOL balance response: {}", lambda: response)
             
             if not response:
                 logger.warning(f"Empty response for SOL balance: {response}")
@@ -162,6 +154,44 @@ class SolanaService:
             logger.error(f"Error getting SOL balance for {public_key}: {e}")
             return 0.0
 
+    @track_outbound('solana_rpc', 'getBalance')
+    async def get_sol_lamports(self, public_key: str) -> int:
+        """
+        Получение баланса SOL в lamports (без округления)
+
+        Args:
+            public_key: Публичный ключ кошелька
+
+        Returns:
+            int: Баланс в lamports
+
+        Raises:
+            Exception: При ошибках RPC
+        """
+        response = await self.client.get_balance(PublicKey(public_key))
+        if hasattr(response, 'value'):
+            return int(response.value)
+        return int(response['result']['value'])
+
+    @track_outbound('solana_rpc', 'getTokenSupply')
+    async def get_token_decimals(self, token_mint: str) -> int:
+        """
+        Получение количества decimals токена через getTokenSupply
+
+        Args:
+            token_mint: Адрес токена
+
+        Returns:
+            int: Количество decimals
+
+        Raises:
+            Exception: При ошибках RPC
+        """
+        response = await self.client.get_token_supply(PublicKey(token_mint))
+        if hasattr(response, 'value'):
+            return int(response.value.decimals)
+        return int(response['result']['value']['decimals'])
+
     async def get_token_balance(self, public_key: str, token_mint: str) -> float:
         """
         Получение баланса SPL токена
@@ -201,7 +231,7 @@ class SolanaService:
                 
                 # Получаем баланс
                 response = await self.client.get_token_account_balance(token_account)
-                logger.info(f"Token balance response: {response}")
+                logger.opt(lazy=True).debug("Token balance response: {}", lambda: response)
                 
                 if not response:
                     logger.warning(f"Empty response for token {token_mint}")
@@ -294,6 +324,7 @@ class SolanaService:
         """
         return SOLANA_TOKEN_ADDRESSES.get(token_name)
         
+    @traced('solana.send_sol')
     async def send_sol(self, from_private_key: str, to_address: str, amount: float) -> str:
         """
         Отправка SOL на указанный адрес
@@ -424,6 +455,7 @@ class SolanaService:
             logger.error(f"Error sending SOL: {e}")
             raise
         
+    @traced('solana.send_spl_token')
     async def send_spl_token(self, from_private_key: str, to_address: str, token_mint: str, amount: float) -> str:
         """
         Отправляет SPL токены (не SOL) с одного адреса на другой.
@@ -456,7 +488,7 @@ class SolanaService:
             
             # Получаем информацию о токене (в первую очередь количество десятичных знаков)
             token_supply_response = await self.client.get_token_supply(mint_pubkey)
-            logger.info(f"Token supply response type: {type(token_supply_response)}, response: {token_supply_response}")
+            logger.opt(lazy=True).debug("Token supply response: {}", lambda: token_supply_response)
             
             # Определяем decimals токена из ответа
             token_decimals = None
@@ -543,7 +575,7 @@ class SolanaService:
             # Отправляем транзакцию
             opts = types.TxOpts(skip_preflight=False, skip_confirmation=False)
             tx_response = await self.client.send_transaction(transaction, keypair, opts=opts)
-            logger.info(f"Transaction response type: {type(tx_response)}, value: {tx_response}")
+            logger.opt(lazy=True).debug("Transaction response: {}", lambda: tx_response)
             
             # Обрабатываем ответ в разных форматах
             transfer_signature = None
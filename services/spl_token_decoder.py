@@ -0,0 +1,138 @@
+import base64
+import struct
+from typing import Dict, Iterable, List, Optional
+
+import base58
+
+TOKEN_PROGRAM_ID = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+TOKEN_2022_PROGRAM_ID = 'TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb'
+TOKEN_PROGRAMS = (TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID)
+
+# Базовая раскладка аккаунта SPL токена (одинакова для Token и Token-2022):
+# mint(32) owner(32) amount(u64) delegate(COption<Pubkey>) state(u8)
+# is_native(COption<u64>) delegated_amount(u64) close_authority(COption<Pubkey>)
+TOKEN_ACCOUNT_LAYOUT = struct.Struct('<32s32sQI32sBIQQI32s')
+TOKEN_ACCOUNT_SIZE = TOKEN_ACCOUNT_LAYOUT.size  # 165
+TOKEN_OWNER_OFFSET = 32
+
+# Укороченная раскладка для массового разбора: mint, owner, amount, delegate, state
+_HEAD_LAYOUT = struct.Struct('<32s32sQI32sB')
+
+# Состояния аккаунта
+STATE_UNINITIALIZED = 0
+STATE_INITIALIZED = 1
+STATE_FROZEN = 2
+
+# Кэш base58 для mint-адресов: в кошельках часто одни и те же токены
+_MINT_CACHE_SIZE = 4096
+_mint_cache: Dict[bytes, str] = {}
+
+
+def _mint_to_base58(raw: bytes) -> str:
+    mint = _mint_cache.get(raw)
+    if mint is None:
+        if len(_mint_cache) >= _MINT_CACHE_SIZE:
+            _mint_cache.clear()
+        mint = base58.b58encode(raw).decode()
+        _mint_cache[raw] = mint
+    return mint
+
+
+def decode_token_account(data: bytes, full: bool = False) -> Optional[dict]:
+    """
+    Разбирает данные аккаунта SPL токена (Token или Token-2022) без копирования
+
+    Args:
+        data: Данные аккаунта (для Token-2022 - вместе с расширениями)
+        full: Разобрать также is_native, delegated_amount и close_authority
+
+    Returns:
+        Optional[dict]: {"mint", "owner", "amount", "state", "delegate"} или None,
+        если данные не похожи на токен-аккаунт
+    """
+    view = memoryview(data)
+    if len(view) < TOKEN_ACCOUNT_SIZE:
+        return None
+    if full:
+        (mint, owner, amount, delegate_tag, delegate, state,
+         native_tag, native, delegated_amount, close_tag, close_authority) = TOKEN_ACCOUNT_LAYOUT.unpack_from(view)
+    else:
+        mint, owner, amount, delegate_tag, delegate, state = _HEAD_LAYOUT.unpack_from(view)
+    account = {
+        "mint": _mint_to_base58(mint),
+        "owner": base58.b58encode(owner).decode(),
+        "amount": amount,
+        "state": state,
+        "delegate": base58.b58encode(delegate).decode() if delegate_tag else None
+    }
+    if full:
+        account["is_native"] = native if native_tag else None
+        account["delegated_amount"] = delegated_amount
+        account["close_authority"] = base58.b58encode(close_authority).decode() if close_tag else None
+    return account
+
+
+def parse_token_accounts(response: dict, program_id: str = TOKEN_PROGRAM_ID, skip_empty: bool = True) -> List[dict]:
+    """
+    Разбирает JSON-ответ getTokenAccountsByOwner (encoding base64) за один проход
+
+    Владелец не декодируется - он совпадает с запрошенным кошельком.
+
+    Args:
+        response: Ответ JSON-RPC
+        program_id: Программа, для которой выполнялся запрос
+        skip_empty: Пропускать аккаунты с нулевым балансом и неинициализированные
+
+    Returns:
+        List[dict]: [{"pubkey", "mint", "amount", "state", "delegate", "program"}]
+    """
+    if 'error' in response:
+        raise Exception(response['error'].get('message', response['error']))
+    accounts = []
+    unpack_head = _HEAD_LAYOUT.unpack_from
+    b64decode = base64.b64decode
+    for item in response['result']['value']:
+        data = b64decode(item['account']['data'][0])
+        if len(data) < TOKEN_ACCOUNT_SIZE:
+            continue
+        mint, _, amount, delegate_tag, delegate, state = unpack_head(data)
+        if skip_empty and (amount == 0 or state == STATE_UNINITIALIZED):
+            continue
+        accounts.append({
+            "pubkey": item['pubkey'],
+            "mint": _mint_to_base58(mint),
+            "amount": amount,
+            "state": state,
+            "delegate": base58.b58encode(delegate).decode() if delegate_tag else None,
+            "program": program_id
+        })
+    return accounts
+
+
+def group_by_mint(accounts: Iterable[dict]) -> Dict[str, dict]:
+    """
+    Сводит токен-аккаунты к балансам по mint: {mint: {"amount", "pubkey", "program", "accounts"}}.
+    Если у токена несколько аккаунтов, суммы складываются, а pubkey берется у крупнейшего;
+    accounts - балансы отдельных аккаунтов {pubkey: amount}.
+    """
+    tokens: Dict[str, dict] = {}
+    largest: Dict[str, int] = {}
+    for account in accounts:
+        mint = account['mint']
+        token = tokens.get(mint)
+        if token is None:
+            tokens[mint] = {
+                "amount": account['amount'],
+                "pubkey": account['pubkey'],
+                "program": account['program'],
+                "accounts": {account['pubkey']: account['amount']}
+            }
+            largest[mint] = account['amount']
+            continue
+        token['amount'] += account['amount']
+        token['accounts'][account['pubkey']] = account['amount']
+        if account['amount'] > largest[mint]:
+            largest[mint] = account['amount']
+            token['pubkey'] = account['pubkey']
+            token['program'] = account['program']
+    return tokens
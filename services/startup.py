@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+class StartupError(Exception):
+    """Критичная фаза запуска завершилась ошибкой"""
+
+
+class Phase:
+    def __init__(self, name: str, action: Callable[[], Awaitable], critical: bool = True, timeout: Optional[float] = None):
+        self.name = name
+        self.action = action
+        self.critical = critical
+        self.timeout = timeout
+
+
+class StartupOrchestrator:
+    """
+    Запуск приложения по этапам. Фазы одного этапа выполняются параллельно,
+    этапы - последовательно. Для каждой фазы запоминается длительность и
+    результат; ошибка критичной фазы останавливает запуск (StartupError).
+    """
+    def __init__(self):
+        self._stages: List[List[Phase]] = []
+        # имя фазы -> {"seconds", "ok", "error"}
+        self.timings: Dict[str, dict] = {}
+        self.total: float = 0.0
+
+    def stage(self, *phases: Phase) -> 'StartupOrchestrator':
+        self._stages.append(list(phases))
+        return self
+
+    async def _run_phase(self, phase: Phase):
+        started = time.perf_counter()
+        error = None
+        try:
+            if phase.timeout:
+                await asyncio.wait_for(phase.action(), phase.timeout)
+            else:
+                await phase.action()
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - started
+        self.timings[phase.name] = {"seconds": round(elapsed, 3), "ok": error is None, "error": str(error) if error else None}
+        if error is None:
+            logger.info(f"Startup phase {phase.name}: {elapsed:.3f}s")
+        elif phase.critical:
+            logger.error(f"Startup phase {phase.name} failed after {elapsed:.3f}s: {error!r}")
+            raise StartupError(f"{phase.name}: {error}") from error
+        else:
+            logger.warning(f"Startup phase {phase.name} failed after {elapsed:.3f}s (non-critical): {error!r}")
+
+    async def run(self):
+        started = time.perf_counter()
+        try:
+            for phases in self._stages:
+                await asyncio.gather(*(self._run_phase(phase) for phase in phases))
+        finally:
+            self.total = time.perf_counter() - started
+            summary = ', '.join(f"{name}={t['seconds']}s" for name, t in self.timings.items())
+            logger.info(f"Startup finished in {self.total:.3f}s: {summary}")
+
+
+# Общий экземпляр для всего приложения
+startup = StartupOrchestrator()
@@ -0,0 +1,411 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import Message
+from loguru import logger
+
+from config import (
+    TELEGRAM_GLOBAL_BURST,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_MAX_RETRIES,
+    TELEGRAM_PER_CHAT_BURST,
+    TELEGRAM_PER_CHAT_INTERVAL,
+    TELEGRAM_SEND_CONCURRENCY,
+    TELEGRAM_SEND_QUEUE_SIZE
+)
+from services.metrics import TELEGRAM_MESSAGES, TELEGRAM_QUEUE_WAIT
+
+# Приоритеты: меньше - раньше
+PRIORITY_HIGH = 0    # результаты сделок
+PRIORITY_NORMAL = 1  # уведомления: алерты, ордера, DCA
+PRIORITY_LOW = 2     # рассылки
+
+# Сколько чатов держать в памяти до очистки неактивных
+MAX_IDLE_BUCKETS = 10_000
+
+
+class TokenBucket:
+    """Маркерная корзина: rate маркеров в секунду, не больше capacity"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд будет доступен маркер (0 - уже доступен)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def drain(self, now: float, seconds: float):
+        """Маркеров не будет seconds секунд (ответ 429 от Telegram)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+    @property
+    def full(self) -> bool:
+        return self.tokens >= self.capacity
+
+
+class _Outgoing:
+    """Сообщение в очереди: вызов метода Bot с параметрами"""
+    __slots__ = ('chat_id', 'priority', 'seq', 'method', 'kwargs', 'queued_at', 'retries', 'edit_key', 'future')
+
+    def __init__(self, chat_id: int, priority: int, seq: int, method: str, kwargs: dict, edit_key=None, future=None):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.seq = seq
+        self.method = method
+        self.kwargs = kwargs
+        self.queued_at = time.monotonic()
+        self.retries = 0
+        self.edit_key = edit_key
+        self.future = future
+
+    def __lt__(self, other: '_Outgoing') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _Chat:
+    __slots__ = ('queue', 'bucket', 'ready_priority', 'waiting', 'sending')
+
+    def __init__(self, bucket: TokenBucket):
+        self.queue: List[_Outgoing] = []
+        self.bucket = bucket
+        # Приоритет, с которым чат стоит в очереди готовых (None - не стоит)
+        self.ready_priority: Optional[int] = None
+        # Чат ждет маркер своей корзины
+        self.waiting = False
+        # Сообщение в этот чат сейчас отправляется - следующее ждет его, чтобы сохранить порядок
+        self.sending = False
+
+
+class TelegramSender:
+    """
+    Диспетчер исходящих сообщений бота с учетом лимитов Bot API.
+
+    Telegram ограничивает бота примерно 30 сообщениями в секунду и одним
+    сообщением в секунду в один чат, а при превышении отвечает 429 (RetryAfter).
+    Отправки проходят через маркерные корзины: общую (TELEGRAM_GLOBAL_RATE) и
+    по корзине на чат (TELEGRAM_PER_CHAT_INTERVAL). Очередь каждого чата
+    упорядочена по приоритету: результаты сделок (PRIORITY_HIGH) уходят раньше
+    уведомлений и рассылок. Чаты, у которых есть маркер, стоят в очереди
+    готовых по приоритету первого сообщения; остальные ждут в куче по
+    времени появления маркера. Повторные правки одного сообщения,
+    еще не отправленные, схлопываются в одну - уходит последний текст.
+    На RetryAfter сообщение возвращается в очередь, а чат и общая корзина
+    ждут указанное Telegram время.
+
+    Запросы к Bot API выполняются отдельными задачами, не больше
+    TELEGRAM_SEND_CONCURRENCY одновременно, и не больше одного на чат:
+    медленный ответ Telegram не задерживает отправку в другие чаты, а
+    сообщения одного чата уходят по порядку.
+    """
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        global_burst: float = TELEGRAM_GLOBAL_BURST,
+        per_chat_interval: float = TELEGRAM_PER_CHAT_INTERVAL,
+        per_chat_burst: float = TELEGRAM_PER_CHAT_BURST,
+        max_queue: int = TELEGRAM_SEND_QUEUE_SIZE,
+        max_retries: int = TELEGRAM_MAX_RETRIES,
+        concurrency: int = TELEGRAM_SEND_CONCURRENCY
+    ):
+        self.per_chat_rate = 1.0 / per_chat_interval
+        self.per_chat_burst = per_chat_burst
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.concurrency = concurrency
+        self.bot: Optional[Bot] = None
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats: Dict[int, _Chat] = {}
+        # (приоритет, порядковый номер, chat_id) - чаты с маркером
+        self._ready: List[Tuple[int, int, int]] = []
+        # (когда появится маркер, порядковый номер, chat_id)
+        self._waiting: List[Tuple[float, int, int]] = []
+        # (chat_id, message_id) -> неотправленная правка
+        self._pending_edits: Dict[Tuple[int, int], _Outgoing] = {}
+        self._size = 0
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Задачи отправки, которые сейчас ждут ответа Bot API
+        self._in_flight: Set[asyncio.Task] = set()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending(self) -> int:
+        return self._size
+
+    async def start(self, bot: Bot):
+        if self._task is not None:
+            return
+        self.bot = bot
+        self._task = asyncio.create_task(self._run(), name="telegram-sender")
+        logger.info(
+            f"Telegram sender started: {self._global.rate:.0f} msg/s, "
+            f"{1 / self.per_chat_rate}s per chat"
+        )
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight:
+            # Уже начатые отправки дожидаемся
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self._size:
+            logger.warning(f"Telegram sender stopped with {self._size} unsent messages")
+
+    async def drain(self, timeout: float) -> bool:
+        """Ждет, пока очередь опустеет и ответят все начатые отправки; False по таймауту"""
+        deadline = time.monotonic() + timeout
+        while self._size or self._in_flight:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def send(self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL, wait: bool = False, **kwargs):
+        """
+        Ставит сообщение в очередь на отправку
+
+        Args:
+            chat_id: ID чата
+            text: Текст сообщения
+            priority: PRIORITY_HIGH / PRIORITY_NORMAL / PRIORITY_LOW
+            wait: Дождаться отправки и вернуть отправленное сообщение
+            **kwargs: Параметры Bot.send_message (reply_markup, ...)
+
+        Returns:
+            bool (Message при wait=True): False если очередь переполнена и сообщение отброшено
+        """
+        return await self._enqueue(chat_id, priority, wait, 'send_message', {'chat_id': chat_id, 'text': text, **kwargs})
+
+    async def answer(self, message: Message, text: str, priority: int = PRIORITY_NORMAL, wait: bool = False, **kwargs):
+        """send в чат сообщения message (аналог message.answer)"""
+        return await self.send(message.chat.id, text, priority=priority, wait=wait, **kwargs)
+
+    async def edit_text(self, message: Message, text: str, priority: int = PRIORITY_NORMAL, wait: bool = False, **kwargs):
+        """edit_message_text для сообщения message (аналог message.edit_text)"""
+        return await self.edit_message_text(
+            message.chat.id, message.message_id, text, priority=priority, wait=wait, **kwargs
+        )
+
+    async def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        priority: int = PRIORITY_NORMAL,
+        wait: bool = False,
+        **kwargs
+    ):
+        """
+        Правка текста сообщения. Если предыдущая правка этого сообщения еще
+        в очереди, она заменяется новой.
+        """
+        edit_key = (chat_id, message_id)
+        params = {'chat_id': chat_id, 'message_id': message_id, 'text': text, **kwargs}
+        pending = self._pending_edits.get(edit_key)
+        if pending is not None:
+            pending.kwargs = params
+            TELEGRAM_MESSAGES.inc(status='coalesced')
+            if pending.priority > priority:
+                # Правка стала срочнее - переставляем ее в очереди чата
+                chat = self._chats[chat_id]
+                pending.priority = priority
+                heapq.heapify(chat.queue)
+                self._schedule(chat_id, chat)
+            if wait:
+                if pending.future is None:
+                    pending.future = asyncio.get_running_loop().create_future()
+                return await pending.future
+            return True
+        return await self._enqueue(chat_id, priority, wait, 'edit_message_text', params, edit_key)
+
+    async def _enqueue(self, chat_id: int, priority: int, wait: bool, method: str, params: dict, edit_key=None):
+        if self._size >= self.max_queue:
+            TELEGRAM_MESSAGES.inc(status='dropped')
+            logger.warning(f"Telegram send queue is full ({self.max_queue}), message to {chat_id} dropped")
+            return None if wait else False
+        future = asyncio.get_running_loop().create_future() if wait else None
+        item = _Outgoing(chat_id, priority, next(self._seq), method, params, edit_key, future)
+        if edit_key is not None:
+            self._pending_edits[edit_key] = item
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(TokenBucket(self.per_chat_rate, self.per_chat_burst))
+        heapq.heappush(chat.queue, item)
+        self._size += 1
+        self._schedule(chat_id, chat)
+        self._wakeup.set()
+        return await future if wait else True
+
+    def _schedule(self, chat_id: int, chat: _Chat):
+        """Ставит чат в очередь готовых или ожидающих маркер"""
+        if not chat.queue or chat.waiting or chat.sending:
+            return
+        now = time.monotonic()
+        delay = chat.bucket.delay(now)
+        if delay > 0:
+            chat.waiting = True
+            chat.ready_priority = None
+            heapq.heappush(self._waiting, (now + delay, next(self._seq), chat_id))
+            return
+        priority = chat.queue[0].priority
+        # Запись с прежним приоритетом останется в куче и будет пропущена
+        if chat.ready_priority is None or priority < chat.ready_priority:
+            chat.ready_priority = priority
+            heapq.heappush(self._ready, (priority, next(self._seq), chat_id))
+
+    def _promote_waiting(self, now: float):
+        while self._waiting and self._waiting[0][0] <= now:
+            _, _, chat_id = heapq.heappop(self._waiting)
+            chat = self._chats.get(chat_id)
+            if chat is not None and chat.waiting:
+                chat.waiting = False
+                self._schedule(chat_id, chat)
+
+    def _pop_ready(self) -> Optional[Tuple[int, _Chat]]:
+        while self._ready:
+            priority, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats.get(chat_id)
+            if chat is not None and chat.ready_priority == priority and chat.queue:
+                chat.ready_priority = None
+                return chat_id, chat
+        return None
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            self._promote_waiting(now)
+            global_delay = self._global.delay(now)
+            busy = len(self._in_flight) >= self.concurrency
+            if busy or global_delay > 0 or not self._ready:
+                # Занятый слот освобождается завершением отправки (она будит цикл)
+                if busy:
+                    timeout = None
+                elif self._ready:
+                    timeout = global_delay
+                else:
+                    timeout = self._waiting[0][0] - now if self._waiting else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            ready = self._pop_ready()
+            if ready is None:
+                continue
+            chat_id, chat = ready
+            item = heapq.heappop(chat.queue)
+            self._size -= 1
+            if item.edit_key is not None:
+                self._pending_edits.pop(item.edit_key, None)
+            self._global.take(now)
+            chat.bucket.take(now)
+            if item.retries == 0:
+                TELEGRAM_QUEUE_WAIT.observe(now - item.queued_at)
+            chat.sending = True
+            self._in_flight.add(asyncio.create_task(self._send(chat_id, chat, item)))
+
+    async def _send(self, chat_id: int, chat: _Chat, item: _Outgoing):
+        try:
+            await self._deliver(chat_id, chat, item)
+        finally:
+            # Слот освобождается до пробуждения цикла, иначе он увидит его занятым
+            self._in_flight.discard(asyncio.current_task())
+            chat.sending = False
+            if chat.queue:
+                self._schedule(chat_id, chat)
+            elif len(self._chats) > MAX_IDLE_BUCKETS:
+                self._forget_idle(time.monotonic())
+            self._wakeup.set()
+
+    async def _deliver(self, chat_id: int, chat: _Chat, item: _Outgoing):
+        try:
+            result = await getattr(self.bot, item.method)(**item.kwargs)
+        except TelegramRetryAfter as e:
+            now = time.monotonic()
+            if item.retries >= self.max_retries:
+                self._fail(item, 'error', e)
+                return
+            item.retries += 1
+            TELEGRAM_MESSAGES.inc(status='retry_after')
+            logger.warning(f"Telegram flood wait {e.retry_after}s for chat {chat_id}, message requeued")
+            chat.bucket.drain(now, e.retry_after)
+            self._global.drain(now, e.retry_after)
+            if item.edit_key is not None and item.edit_key in self._pending_edits:
+                # Пока ждали, пришла новая правка - она заменяет эту
+                self._resolve(item, None)
+                return
+            if item.edit_key is not None:
+                self._pending_edits[item.edit_key] = item
+            heapq.heappush(chat.queue, item)
+            self._size += 1
+            return
+        except TelegramForbiddenError as e:
+            # Пользователь заблокировал бота - повторять бессмысленно
+            self._fail(item, 'forbidden', e, level='info')
+            return
+        except TelegramBadRequest as e:
+            if item.method == 'edit_message_text' and 'message is not modified' in str(e):
+                TELEGRAM_MESSAGES.inc(status='sent')
+                self._resolve(item, None)
+                return
+            self._fail(item, 'error', e)
+            return
+        except Exception as e:
+            self._fail(item, 'error', e)
+            return
+        TELEGRAM_MESSAGES.inc(status='sent')
+        self._resolve(item, result)
+
+    def _forget_idle(self, now: float):
+        """Удаляет чаты без сообщений, чьи корзины уже полны - они ничего не ограничивают"""
+        idle = [
+            chat_id for chat_id, chat in self._chats.items()
+            if not chat.queue and not chat.waiting and not chat.sending
+            and chat.bucket.delay(now) == 0 and chat.bucket.full
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def _fail(self, item: _Outgoing, status: str, error: Exception, level: str = 'error'):
+        TELEGRAM_MESSAGES.inc(status=status)
+        logger.log(level.upper(), f"Failed to {item.method} to {item.chat_id}: {error}")
+        if item.future is not None and not item.future.done():
+            item.future.set_exception(error)
+
+    @staticmethod
+    def _resolve(item: _Outgoing, result):
+        if item.future is not None and not item.future.done():
+            item.future.set_result(result)
+
+
+# Общий экземпляр для всего приложения
+telegram_sender = TelegramSender()
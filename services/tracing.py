@@ -0,0 +1,285 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+from config import (
+    TRACE_EXPORT_BACKUPS,
+    TRACE_EXPORT_FILE,
+    TRACE_EXPORT_MAX_BYTES,
+    TRACE_OTLP_ENDPOINT,
+    TRACE_SAMPLE_RATIO,
+    TRACING_ENABLED
+)
+
+SERVICE_NAME = 'solana-trading-bot'
+
+# Текущий span задачи; asyncio копирует контекст в дочерние задачи
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+# Коды статуса OpenTelemetry
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """
+    Один замер в трассе. Поля соответствуют модели OpenTelemetry, поэтому
+    экспорт можно читать любым OTLP-совместимым коллектором.
+    """
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'status_message', 'sampled', '_token')
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        if parent is not None:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.sampled = parent.sampled
+        else:
+            self.trace_id = f'{random.getrandbits(128):032x}'
+            self.parent_id = None
+            self.sampled = random.random() < TRACE_SAMPLE_RATIO
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.start_ns = 0
+        self.end_ns = 0
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = STATUS_UNSET
+        self.status_message = ''
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self) -> 'Span':
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            self.status = STATUS_ERROR
+            self.status_message = f'{exc_type.__name__}: {exc}'
+        _current_span.reset(self._token)
+        if self.sampled:
+            exporter.add(self)
+        return False
+
+    async def __aenter__(self) -> 'Span':
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class _NoopSpan:
+    """Заглушка, когда трассировка выключена"""
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def start_span(name: str, **attributes):
+    """
+    Создает span - дочерний для текущего или корневой, если текущего нет.
+    Используется как контекстный менеджер: with start_span("jupiter.quote"): ...
+    """
+    if not TRACING_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, _current_span.get(), attributes)
+
+
+def traced(name: str):
+    """Декоратор корутины: выполняет ее внутри дочернего span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with start_span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_attribute(key: str, value: Any):
+    """Добавляет атрибут к текущему span (если он есть)"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def current_trace_id() -> str:
+    span = _current_span.get()
+    return span.trace_id if span is not None else '-'
+
+
+def log_patcher(record):
+    """Patcher loguru: добавляет trace_id текущего апдейта в extra каждой записи"""
+    record["extra"]["trace_id"] = current_trace_id()
+
+
+class SpanExporter:
+    """
+    Буферизует завершенные span и периодически выгружает их в формате OTLP/JSON:
+    строками в файл (TRACE_EXPORT_FILE) и/или POST на коллектор (TRACE_OTLP_ENDPOINT).
+    Запись выполняется вне event loop. Файл ротируется по размеру
+    (TRACE_EXPORT_MAX_BYTES): traces.jsonl -> traces.jsonl.1 -> ..., хранится
+    TRACE_EXPORT_BACKUPS старых файлов.
+    """
+    def __init__(self, path: str = TRACE_EXPORT_FILE, endpoint: str = TRACE_OTLP_ENDPOINT,
+                 interval: float = 5.0, max_buffer: int = 10000,
+                 max_bytes: int = TRACE_EXPORT_MAX_BYTES, backups: int = TRACE_EXPORT_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.endpoint = endpoint
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self._buffer: List[Span] = []
+        self._dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add(self, span: Span):
+        if len(self._buffer) >= self.max_buffer:
+            self._dropped += 1
+            return
+        self._buffer.append(span)
+
+    async def start(self):
+        if not TRACING_ENABLED or self._task is not None:
+            return
+        if self.endpoint:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        self._task = asyncio.create_task(self._run(), name="trace-exporter")
+        logger.info(f"Tracing enabled, sample ratio {TRACE_SAMPLE_RATIO}, file: {self.path or '-'}, collector: {self.endpoint or '-'}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Failed to export spans: {e}")
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        if self._dropped:
+            logger.warning(f"Trace buffer overflow, dropped {self._dropped} spans")
+            self._dropped = 0
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "services.tracing"},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+        if self.path:
+            await asyncio.to_thread(self._write, json.dumps(payload, ensure_ascii=False))
+        if self._session is not None:
+            async with self._session.post(self.endpoint, json=payload) as response:
+                if response.status >= 300:
+                    logger.warning(f"Trace collector responded with {response.status}")
+
+    def _write(self, line: str):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.max_bytes > 0 and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+# Общий экспортер для всего приложения
+exporter = SpanExporter()
@@ -0,0 +1,68 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Tuple
+
+# Больше любого ID документа Firestore - для поиска границы по цене в (цена, id)
+_MAX_ID = '\uffff'
+
+
+class TriggerIndex:
+    """
+    Индекс ценовых триггеров по токенам для ордеров и алертов.
+
+    Для каждого токена два отсортированных списка (цена, id): "below" -
+    срабатывает, когда цена опускается до порога или ниже, "above" - когда
+    поднимается до порога или выше. Сработавшие при новой цене записи
+    находятся бинарным поиском и вырезаются одним срезом, поэтому проверка
+    стоит O(log n + k) на токен, где k - число сработавших.
+    """
+    def __init__(self):
+        self._below: Dict[str, List[Tuple[float, str]]] = {}
+        self._above: Dict[str, List[Tuple[float, str]]] = {}
+
+    def __contains__(self, mint: str) -> bool:
+        return mint in self._below or mint in self._above
+
+    def __len__(self) -> int:
+        return len(set(self._below) | set(self._above))
+
+    def add(self, mint: str, price: float, item_id: str, below: bool):
+        """ValueError для NaN и бесконечной цены - такие записи нарушили бы порядок списка"""
+        if not math.isfinite(price):
+            raise ValueError(f"Trigger price must be finite, got {price}")
+        book = self._below if below else self._above
+        insort(book.setdefault(mint, []), (price, item_id))
+
+    def remove(self, mint: str, price: float, item_id: str, below: bool):
+        book = self._below if below else self._above
+        entries = book.get(mint)
+        if entries:
+            entry = (price, item_id)
+            i = bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+        self._drop_empty(mint)
+
+    def match(self, mint: str, price: float) -> List[str]:
+        """Извлекает id всех записей токена, сработавших при цене price"""
+        triggered = []
+        below = self._below.get(mint)
+        if below:
+            # порог >= цены: хвост списка начиная с первого порога не ниже цены
+            i = bisect_left(below, (price, ''))
+            triggered.extend(item_id for _, item_id in below[i:])
+            del below[i:]
+        above = self._above.get(mint)
+        if above:
+            # порог <= цены: начало списка до первого порога выше цены
+            i = bisect_right(above, (price, _MAX_ID))
+            triggered.extend(item_id for _, item_id in above[:i])
+            del above[:i]
+        if triggered:
+            self._drop_empty(mint)
+        return triggered
+
+    def _drop_empty(self, mint: str):
+        for book in (self._below, self._above):
+            if mint in book and not book[mint]:
+                del book[mint]
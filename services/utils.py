@@ -1,32 +1,110 @@
-from cryptography.fernet import Fernet
+import hashlib
 import os
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import base58
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
 from loguru import logger
 
-def get_encryption_cipher():
-    key = os.getenv("ENCRYPTION_KEY")
-    if not key:
+# Формат зашифрованной записи: enc:v1:<id ключа>:<токен Fernet>.
+# Записи старого формата - голый токен Fernet - по-прежнему расшифровываются.
+RECORD_PREFIX = 'enc:v1:'
+
+
+def key_id(key: str) -> str:
+    """Короткий идентификатор ключа шифрования (сам ключ в записи не хранится)"""
+    return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+
+def get_encryption_keys() -> List[str]:
+    """
+    Ключи шифрования из окружения: ENCRYPTION_KEYS (через запятую, первым - новейший)
+    или единственный ENCRYPTION_KEY
+    """
+    keys = [key.strip() for key in os.getenv("ENCRYPTION_KEYS", "").split(',') if key.strip()]
+    if not keys and os.getenv("ENCRYPTION_KEY"):
+        keys = [os.getenv("ENCRYPTION_KEY")]
+    return keys
+
+
+class KeyRing:
+    """
+    Набор ключей Fernet для приватных ключей кошельков.
+
+    Новые записи шифруются первым (новейшим) ключом и помечаются его id, так
+    что расшифровка версионированной записи - одна попытка нужным ключом.
+    Старые записи без id расшифровываются MultiFernet любым из ключей.
+    """
+    def __init__(self, keys: Sequence[str]):
+        if not keys:
+            raise ValueError("Не задан ни один ключ шифрования")
+        self._fernets = [Fernet(key) for key in keys]
+        self._by_id = {key_id(key): fernet for key, fernet in zip(keys, self._fernets)}
+        self._multi = MultiFernet(self._fernets)
+        self.current_id = key_id(keys[0])
+
+    def encrypt(self, plaintext: str) -> str:
+        token = self._fernets[0].encrypt(plaintext.encode()).decode()
+        return f"{RECORD_PREFIX}{self.current_id}:{token}"
+
+    def decrypt(self, record: str) -> str:
+        """Расшифровывает запись; InvalidToken, если ни один ключ не подходит"""
+        parsed = parse_record(record)
+        if parsed:
+            record_key_id, token = parsed
+            fernet = self._by_id.get(record_key_id)
+            if fernet is not None:
+                return fernet.decrypt(token.encode()).decode()
+            # Ключ с таким id не задан - запись могла быть перемечена вручную, пробуем все
+            record = token
+        return self._multi.decrypt(record.encode()).decode()
+
+    def is_current(self, record: str) -> bool:
+        """Запись зашифрована новейшим ключом (проверка метки, без расшифровки)"""
+        parsed = parse_record(record)
+        return parsed is not None and parsed[0] == self.current_id
+
+
+def parse_record(record: str) -> Optional[Tuple[str, str]]:
+    """(id ключа, токен Fernet) версионированной записи или None для старого формата"""
+    if not record.startswith(RECORD_PREFIX):
+        return None
+    record_key_id, _, token = record[len(RECORD_PREFIX):].partition(':')
+    return record_key_id, token
+
+
+@lru_cache(maxsize=1)
+def get_encryption_cipher() -> KeyRing:
+    keys = get_encryption_keys()
+    if not keys:
         logger.error("ENCRYPTION_KEY не найден в переменных окружения. Шифрование невозможно.")
         raise ValueError("ENCRYPTION_KEY не найден в переменных окружения")
-    logger.debug(f"Using encryption key: {key[:5]}...")
-    return Fernet(key)
+    cipher = KeyRing(keys)
+    logger.info(f"Encryption keys loaded: {len(keys)}, current key id {cipher.current_id}")
+    return cipher
+
+
+def is_plaintext_key(key: str) -> bool:
+    """Строка - незашифрованный секретный ключ Solana (base58, 64 байта)"""
+    try:
+        return len(base58.b58decode(key)) == 64
+    except ValueError:
+        return False
+
 
 def encrypt_private_key(private_key: str) -> str:
     """
-    Шифрует приватный ключ и возвращает строку для сохранения
-    
+    Шифрует приватный ключ новейшим ключом и возвращает строку для сохранения
+
     Args:
         private_key: Строка приватного ключа в формате base58
-        
+
     Returns:
-        str: Зашифрованная строка
+        str: Зашифрованная запись enc:v1:<id ключа>:<токен>
     """
     try:
-        logger.debug(f"Encrypting private key, length: {len(private_key)}")
-        cipher = get_encryption_cipher()
-        encrypted = cipher.encrypt(private_key.encode())
-        result = encrypted.decode()
-        logger.debug(f"Key encrypted successfully, result length: {len(result)}")
-        return result
+        return get_encryption_cipher().encrypt(private_key)
     except Exception as e:
         logger.error(f"Error encrypting private key: {e}")
         raise
@@ -34,41 +112,46 @@ def encrypt_private_key(private_key: str) -> str:
 def decrypt_private_key(encrypted_key: str) -> str:
     """
     Расшифровывает приватный ключ для использования
-    
+
     Args:
-        encrypted_key: Зашифрованная строка приватного ключа
-        
+        encrypted_key: Зашифрованная запись приватного ключа (любым из ключей,
+            в новом или старом формате) или незашифрованный ключ base58
+
     Returns:
         str: Расшифрованный приватный ключ
     """
     try:
-        logger.debug(f"Decrypting private key, encrypted length: {len(encrypted_key)}")
-        # Проверка, зашифрован ли ключ
-        if not encrypted_key.startswith('g'):
-            logger.warning("The key doesn't appear to be encrypted with Fernet (doesn't start with 'g')")
-            
-        cipher = get_encryption_cipher()
-        decrypted = cipher.decrypt(encrypted_key.encode())
-        result = decrypted.decode()
-        logger.debug(f"Key decrypted successfully, result length: {len(result)}")
-        return result
-    except Exception as e:
-        logger.error(f"Error decrypting private key: {e}, key length: {len(encrypted_key)}")
-        # Проверка, не является ли ключ уже расшифрованным
-        if len(encrypted_key) >= 40 and len(encrypted_key) <= 90:
-            logger.warning("The key might already be decrypted (looks like a base58 key)")
+        return get_encryption_cipher().decrypt(encrypted_key)
+    except InvalidToken:
+        # Ключ, сохраненный до включения шифрования
+        if not encrypted_key.startswith(RECORD_PREFIX) and is_plaintext_key(encrypted_key):
+            logger.warning("The key is not encrypted, using as is")
             return encrypted_key
+        logger.error(f"Error decrypting private key: no matching encryption key, key length: {len(encrypted_key)}")
         raise
 
 def is_encrypted(key: str) -> bool:
     """
     Проверяет, является ли ключ зашифрованным с помощью Fernet
-    
+
     Args:
         key: Ключ для проверки
-        
+
     Returns:
-        bool: True если ключ зашифрован, False если нет
+        bool: True если ключ зашифрован одним из ключей, False если нет
     """
-    # Fernet-зашифрованные строки обычно начинаются с 'g'
-    return key.startswith('g') and len(key) > 100
+    if key.startswith(RECORD_PREFIX):
+        return True
+    try:
+        get_encryption_cipher().decrypt(key)
+        return True
+    except InvalidToken:
+        return False
+
+def needs_reencryption(key: str) -> bool:
+    """Запись нужно перезаписать: она не зашифрована или зашифрована не новейшим ключом"""
+    return not get_encryption_cipher().is_current(key)
+
+def reencrypt_private_key(key: str) -> str:
+    """Перешифровывает запись (или шифрует незашифрованный ключ) новейшим ключом"""
+    return encrypt_private_key(decrypt_private_key(key))
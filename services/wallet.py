@@ -7,17 +7,14 @@ from config import SOLANA_RPC_URL, WALLET_PRIVATE_KEY
 from typing import Dict, Optional, Tuple
 from .firebase_service import FirebaseService
 from datetime import datetime
-from .utils import encrypt_private_key, decrypt_private_key, get_encryption_cipher
-import os
+from .utils import encrypt_private_key, decrypt_private_key, get_encryption_cipher, get_encryption_keys
 
 class WalletService:
     def __init__(self):
-        # Проверка наличия ENCRYPTION_KEY перед инициализацией
-        if not os.getenv("ENCRYPTION_KEY"):
+        # Проверка наличия и валидности ключей шифрования (ENCRYPTION_KEYS или ENCRYPTION_KEY)
+        if not get_encryption_keys():
             logger.error("ENCRYPTION_KEY не найден в переменных окружения. Шифрование невозможно.")
             raise ValueError("ENCRYPTION_KEY отсутствует в .env файле. Добавьте ENCRYPTION_KEY для шифрования приватных ключей.")
-            
-        # Проверка валидности ENCRYPTION_KEY
         try:
             get_encryption_cipher()
             logger.info("Ключ шифрования валиден")
@@ -99,48 +96,12 @@ class WalletService:
         try:
             wallet_data = await self.firebase.get_user_wallet(user_id)
             if wallet_data:
-                try:
-                    private_key = wallet_data['private_key']
-                    logger.debug(f"Got private key for user {user_id}, length: {len(private_key)}")
-                    
-                    # Проверка, зашифрован ли ключ
-                    from .utils import is_encrypted
-                    
-                    if is_encrypted(private_key):
-                        # Расшифровываем приватный ключ
-                        decrypted_private_key = decrypt_private_key(private_key)
-                        logger.debug(f"Приватный ключ расшифрован для пользователя {user_id}")
-                    else:
-                        # Ключ не зашифрован, используем как есть
-                        logger.warning(f"Key for user {user_id} is not encrypted, using as is")
-                        decrypted_private_key = private_key
-                        
-                        # Шифруем и сохраняем для будущего использования
-                        try:
-                            encrypted_key = encrypt_private_key(private_key)
-                            await self.firebase.save_user_wallet(user_id, {
-                                'public_key': wallet_data['public_key'],
-                                'private_key': encrypted_key,
-                                'updated_at': datetime.utcnow().isoformat()
-                            })
-                            logger.info(f"Encrypted and saved key for user {user_id}")
-                        except Exception as e:
-                            logger.error(f"Failed to encrypt and save key for user {user_id}: {e}")
-                    
-                    return {
-                        'public_key': wallet_data['public_key'],
-                        'private_key': decrypted_private_key
-                    }
-                except Exception as e:
-                    logger.error(f"Ошибка обработки ключа для пользователя {user_id}: {e}")
-                    # Если произошла ошибка, пробуем вернуть ключ как есть
-                    if len(wallet_data['private_key']) >= 40 and len(wallet_data['private_key']) <= 90:
-                        logger.warning(f"Returning raw key for user {user_id} after decryption error")
-                        return {
-                            'public_key': wallet_data['public_key'],
-                            'private_key': wallet_data['private_key']
-                        }
-                    raise
+                # Ключ в любом формате (старым ключом, без шифрования) перешифровывается
+                # в фоне services/key_rotation.py, здесь только расшифровка
+                return {
+                    'public_key': wallet_data['public_key'],
+                    'private_key': decrypt_private_key(wallet_data['private_key'])
+                }
             return None
         except Exception as e:
             logger.error(f"Error getting wallet for user {user_id}: {e}")
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from services import dca_scheduler as scheduler_module
+from services.dca_scheduler import DcaScheduler
+
+
+class _Firebase:
+    """Firestore, в котором не сохраняются переносы отдельных планов"""
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    async def update_dca_plan(self, plan_id, fields):
+        return plan_id not in self.failing
+
+
+@pytest.fixture
+def firebase(monkeypatch):
+    firebase = _Firebase()
+    monkeypatch.setattr(scheduler_module, 'firebase', firebase)
+    return firebase
+
+
+def _plan(plan_id: str, mint: str, next_run: float):
+    return {
+        'id': plan_id, 'user_id': 1, 'mint': mint, 'symbol': 'TOKEN',
+        'amount': 10 ** 8, 'interval': 600.0, 'next_run': next_run
+    }
+
+
+def test_tick_runs_only_rescheduled_plans(firebase):
+    firebase.failing.add('b')
+    started = []
+
+    async def scenario():
+        scheduler = DcaScheduler()
+
+        async def execute_group(mint, plans):
+            started.append((mint, [plan['id'] for plan in plans]))
+
+        scheduler._execute_group = execute_group
+        due = time.time() - 1
+        for plan in (_plan('a', 'mint-1', due), _plan('b', 'mint-1', due), _plan('c', 'mint-2', due)):
+            scheduler._add(plan)
+        await scheduler.tick()
+        await asyncio.gather(*scheduler._executing)
+        return scheduler, due
+
+    scheduler, due = asyncio.run(scenario())
+    assert sorted(started) == [('mint-1', ['a']), ('mint-2', ['c'])]
+    # План с несохраненным переносом сохраняет прежнее время и снова наступает на следующем тике
+    assert scheduler._plans['b']['next_run'] == due
+    assert [plan['id'] for plan in scheduler.pop_due(time.time())] == ['b']
@@ -0,0 +1,101 @@
+import json
+from datetime import datetime
+
+from log_analytics import Analyzer, normalize_reason, parse_records
+
+TRACE_ID = '0123456789abcdef0123456789abcdef'
+SIGNATURE = '5' * 64
+
+
+def test_parse_app_log_line():
+    line = (f"2025-04-18 12:30:05 | INFO     | {TRACE_ID} | "
+            f"services.jupiter_service:execute_swap:120 - Транзакция отправлена: {SIGNATURE}")
+    [record] = parse_records([line])
+    assert record.time == datetime(2025, 4, 18, 12, 30, 5)
+    assert record.level == 'INFO'
+    assert record.trace_id == TRACE_ID
+    assert record.name == 'services.jupiter_service'
+    assert record.message == f"Транзакция отправлена: {SIGNATURE}"
+
+
+def test_parse_transaction_log_line():
+    line = "2025-04-18 12:30:05 | ERROR    | User: 42 | Type: buy | Token: BONK | Amount: 1.5 | Status: error | Error: No route"
+    [record] = parse_records([line])
+    assert record.level == 'ERROR'
+    assert record.trace_id == '-'
+    assert record.name == ''
+    assert record.message.startswith('User: 42')
+
+
+def test_parse_old_format_with_milliseconds():
+    line = "2025-04-18 12:30:05.123 | INFO | main:main:10 - Bot started"
+    [record] = parse_records([line])
+    assert record.time == datetime(2025, 4, 18, 12, 30, 5)
+    assert record.name == 'main'
+    assert record.message == 'Bot started'
+
+
+def test_parse_json_line():
+    line = json.dumps({"record": {
+        "time": {"timestamp": datetime(2025, 4, 18, 12, 0).timestamp()},
+        "level": {"name": "WARNING"},
+        "message": "Slow request",
+        "name": "services.price_service",
+        "extra": {"trace_id": TRACE_ID}
+    }})
+    [record] = parse_records([line])
+    assert record.time == datetime(2025, 4, 18, 12, 0)
+    assert record.level == 'WARNING'
+    assert record.name == 'services.price_service'
+    assert record.trace_id == TRACE_ID
+
+
+def test_parse_skips_continuations_and_broken_json():
+    lines = [
+        "Traceback (most recent call last):",
+        '  File "main.py", line 1, in <module>',
+        '{"record": {"message": "no time"}}',
+        "",
+        "2025-04-18 12:30:05 | INFO     | main:main:10 - ok",
+    ]
+    assert [r.message for r in parse_records(lines)] == ['ok']
+
+
+def test_analyzer_counts_trades_and_latency():
+    lines = [
+        f"2025-04-18 12:00:00 | INFO     | {TRACE_ID} | services.jupiter_service:execute_swap:90 - Начало выполнения свопа",
+        f"2025-04-18 12:00:02 | INFO     | {TRACE_ID} | services.jupiter_service:execute_swap:120 - Транзакция отправлена: {SIGNATURE}",
+        f"2025-04-18 12:00:07 | INFO     | {TRACE_ID} | services.jupiter_service:execute_swap:130 - Транзакция подтверждена: {SIGNATURE}",
+        "2025-04-18 12:00:08 | INFO     | User: 42 | Type: buy | Token: BONK | Amount: 1.5 | Status: success",
+        "2025-04-18 12:10:00 | ERROR    | User: 42 | Type: sell | Token: BONK | Amount: 2 | Status: error | Error: Slippage 150 exceeded",
+    ]
+    analyzer = Analyzer()
+    for record in parse_records(lines):
+        analyzer.feed(record)
+    report = analyzer.report(top=5)
+
+    assert report['trades'] == 2
+    assert report['errors'] == 1
+    assert report['hourly']['2025-04-18 12:00'] == {'trades': 2, 'buy': 1, 'sell': 1, 'success': 1, 'error': 1}
+    assert report['failure_reasons'] == [('Slippage N exceeded', 1)]
+    assert report['swap_latency']['count'] == 1
+    assert report['swap_latency']['max_s'] == 2.0
+    assert report['confirm_latency']['max_s'] == 5.0
+    assert report['unconfirmed'] == 0
+
+
+def test_normalize_reason():
+    assert normalize_reason(f"❌ Transaction {SIGNATURE} failed: code 6001.") == 'Transaction <key> failed: code N'
+    assert normalize_reason('...') == 'unknown'
+
+
+def test_pending_trade_is_not_an_error():
+    line = "2025-04-18 12:00:00 | INFO     | User: 42 | Type: sell | Token: BONK | Amount: 2 | Status: pending"
+    analyzer = Analyzer()
+    for record in parse_records([line]):
+        analyzer.feed(record)
+    report = analyzer.report(top=5)
+    assert report['trades'] == 1
+    assert report['errors'] == 0
+    assert report['failure_reasons'] == []
+    assert report['hourly']['2025-04-18 12:00']['pending'] == 1
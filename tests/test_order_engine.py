@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from services import order_engine as engine_module
+from services.order_engine import STATUS_FILLED, STATUS_OPEN, STATUS_TRIGGERED, OrderEngine
+
+MINT = 'DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263'
+
+
+class _Firebase:
+    """Firestore, в котором первые записи по каждому статусу не проходят"""
+    def __init__(self):
+        self.failures = {}
+        self.updates = []
+
+    async def update_order(self, order_id, fields):
+        self.updates.append(fields['status'])
+        if self.failures.get(fields['status']):
+            self.failures[fields['status']] -= 1
+            return False
+        return True
+
+    async def get_user_wallet(self, user_id):
+        return {'public_key': 'wallet', 'private_key': 'key'}
+
+
+class _Jupiter:
+    def __init__(self):
+        self.swaps = 0
+
+    async def perform_swap(self, **kwargs):
+        self.swaps += 1
+        return 'signature'
+
+
+@pytest.fixture
+def services(monkeypatch):
+    firebase, jupiter = _Firebase(), _Jupiter()
+    monkeypatch.setattr(engine_module, 'firebase', firebase)
+    monkeypatch.setattr(engine_module, 'jupiter', jupiter)
+    monkeypatch.setattr(engine_module, 'RESULT_SAVE_DELAY', 0)
+    monkeypatch.setattr(engine_module, 'log_transaction', lambda *args, **kwargs: None)
+    return firebase, jupiter
+
+
+def _order():
+    return {
+        'id': 'order-1', 'user_id': 1, 'mint': MINT, 'symbol': 'BONK',
+        'side': 'buy', 'kind': 'limit', 'trigger_price': 1.0,
+        'amount': 10 ** 8, 'ui_amount': 0.1, 'slippage': 1.0,
+        'status': STATUS_OPEN, 'created_at': None
+    }
+
+
+def _trigger(engine: OrderEngine, price: float):
+    [order] = engine.match(MINT, price)
+    order['status'] = STATUS_TRIGGERED
+    return order
+
+
+def test_swap_skipped_when_trigger_not_saved(services):
+    firebase, jupiter = services
+    engine = OrderEngine()
+    engine._add(_order())
+    order = _trigger(engine, 0.5)
+    firebase.failures[STATUS_TRIGGERED] = 1
+
+    asyncio.run(engine._execute(order, 0.5))
+
+    assert jupiter.swaps == 0
+    assert order['status'] == STATUS_OPEN
+    # Ордер вернулся в индекс и сработает на следующей цене
+    assert [o['id'] for o in engine.match(MINT, 0.5)] == ['order-1']
+
+
+def test_result_write_is_retried(services):
+    firebase, jupiter = services
+    engine = OrderEngine()
+    engine._add(_order())
+    order = _trigger(engine, 0.5)
+    firebase.failures[STATUS_FILLED] = 2
+
+    asyncio.run(engine._execute(order, 0.5))
+
+    assert jupiter.swaps == 1
+    assert firebase.updates == [STATUS_TRIGGERED, STATUS_FILLED, STATUS_FILLED, STATUS_FILLED]
+    assert 'order-1' not in engine._orders
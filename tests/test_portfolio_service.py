@@ -0,0 +1,59 @@
+import time
+
+from services.portfolio_service import PortfolioService
+
+USER = 1
+MINT = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v'  # USDC, decimals известны
+
+
+def _service(accounts):
+    service = PortfolioService()
+    service._snapshots[USER] = {
+        "public_key": 'wallet',
+        "sol": 0,
+        "tokens": {MINT: {
+            "amount": sum(accounts.values()),
+            "decimals": 6,
+            "pubkey": max(accounts, key=accounts.get),
+            "accounts": dict(accounts)
+        }},
+        "updated_at": time.monotonic(),
+        "refresh_at": None
+    }
+    return service
+
+
+def _token(service):
+    return service._snapshots[USER]['tokens'].get(MINT)
+
+
+def test_account_update_recomputes_mint_total():
+    service = _service({'acc1': 70, 'acc2': 30})
+    service.set_token_account(USER, MINT, 50, 'acc2')
+    assert _token(service)['amount'] == 120
+    assert _token(service)['pubkey'] == 'acc1'
+
+
+def test_empty_account_keeps_other_balances():
+    service = _service({'acc1': 70, 'acc2': 30})
+    service.set_token_account(USER, MINT, 0, 'acc1')
+    assert _token(service)['amount'] == 30
+    assert _token(service)['pubkey'] == 'acc2'
+    service.set_token_account(USER, MINT, 0, 'acc2')
+    assert _token(service) is None
+
+
+def test_new_token_account():
+    service = _service({'acc1': 70})
+    service.set_token_account(USER, MINT, 5, 'acc3')
+    assert _token(service)['amount'] == 75
+    service._snapshots[USER]['tokens'].clear()
+    service.set_token_account(USER, MINT, 5, 'acc3')
+    assert _token(service)['accounts'] == {'acc3': 5}
+
+
+def test_notification_without_pubkey_schedules_refresh():
+    service = _service({'acc1': 70, 'acc2': 30})
+    service.set_token_account(USER, MINT, 1, None)
+    assert _token(service)['amount'] == 100
+    assert service._snapshots[USER]['refresh_at'] is not None
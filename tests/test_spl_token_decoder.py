@@ -0,0 +1,111 @@
+import base64
+import struct
+
+import base58
+import pytest
+
+from services.spl_token_decoder import (
+    STATE_INITIALIZED,
+    STATE_UNINITIALIZED,
+    TOKEN_2022_PROGRAM_ID,
+    TOKEN_ACCOUNT_LAYOUT,
+    TOKEN_ACCOUNT_SIZE,
+    TOKEN_PROGRAM_ID,
+    decode_token_account,
+    group_by_mint,
+    parse_token_accounts
+)
+
+MINT_A = bytes(range(1, 33))
+MINT_B = bytes(range(33, 65))
+OWNER = bytes([7] * 32)
+DELEGATE = bytes([9] * 32)
+
+
+def _account(mint: bytes, amount: int, state: int = STATE_INITIALIZED, delegate: bytes = None, extra: bytes = b'') -> bytes:
+    return TOKEN_ACCOUNT_LAYOUT.pack(
+        mint, OWNER, amount,
+        1 if delegate else 0, delegate or bytes(32),
+        state,
+        0, 0,   # is_native
+        0,      # delegated_amount
+        0, bytes(32)
+    ) + extra
+
+
+def _response(*accounts):
+    return {"result": {"value": [
+        {"pubkey": f"acc{i}", "account": {"data": [base64.b64encode(data).decode(), "base64"]}}
+        for i, data in enumerate(accounts)
+    ]}}
+
+
+def test_layout_is_165_bytes():
+    assert TOKEN_ACCOUNT_SIZE == 165
+
+
+def test_decode_token_account():
+    account = decode_token_account(_account(MINT_A, 12345, delegate=DELEGATE))
+    assert account == {
+        "mint": base58.b58encode(MINT_A).decode(),
+        "owner": base58.b58encode(OWNER).decode(),
+        "amount": 12345,
+        "state": STATE_INITIALIZED,
+        "delegate": base58.b58encode(DELEGATE).decode()
+    }
+
+
+def test_decode_rejects_short_data():
+    assert decode_token_account(b'\x00' * (TOKEN_ACCOUNT_SIZE - 1)) is None
+
+
+def test_decode_token_2022_with_extensions():
+    account = decode_token_account(_account(MINT_A, 5, extra=b'\x02' + b'\xff' * 40))
+    assert account['amount'] == 5
+    assert account['mint'] == base58.b58encode(MINT_A).decode()
+
+
+def test_parse_token_accounts_skips_empty_and_short():
+    response = _response(
+        _account(MINT_A, 2 ** 64 - 1),
+        _account(MINT_B, 0),
+        _account(MINT_B, 10, state=STATE_UNINITIALIZED),
+        b'\x01' * 100
+    )
+    accounts = parse_token_accounts(response, TOKEN_2022_PROGRAM_ID)
+    assert accounts == [{
+        "pubkey": "acc0",
+        "mint": base58.b58encode(MINT_A).decode(),
+        "amount": 2 ** 64 - 1,
+        "state": STATE_INITIALIZED,
+        "delegate": None,
+        "program": TOKEN_2022_PROGRAM_ID
+    }]
+    assert len(parse_token_accounts(response, skip_empty=False)) == 3
+
+
+def test_parse_token_accounts_raises_on_rpc_error():
+    with pytest.raises(Exception, match="rate limited"):
+        parse_token_accounts({"error": {"code": -32005, "message": "rate limited"}})
+
+
+def test_group_by_mint_sums_and_keeps_largest_pubkey():
+    accounts = parse_token_accounts(_response(
+        _account(MINT_A, 3),
+        _account(MINT_A, 7),
+        _account(MINT_B, 1)
+    ), TOKEN_PROGRAM_ID)
+    tokens = group_by_mint(accounts)
+    mint_a = base58.b58encode(MINT_A).decode()
+    assert tokens[mint_a] == {
+        "amount": 10,
+        "pubkey": "acc1",
+        "program": TOKEN_PROGRAM_ID,
+        "accounts": {"acc0": 3, "acc1": 7}
+    }
+    assert tokens[base58.b58encode(MINT_B).decode()]['amount'] == 1
+
+
+def test_amount_is_little_endian_u64():
+    data = _account(MINT_A, 1)
+    assert struct.unpack_from('<Q', data, 64)[0] == 1
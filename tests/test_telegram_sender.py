@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from services.telegram_sender import PRIORITY_HIGH, PRIORITY_LOW, TelegramSender, TokenBucket
+
+
+def test_bucket_starts_full():
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    now = bucket.updated
+    for _ in range(3):
+        assert bucket.delay(now) == 0
+        bucket.take(now)
+    assert bucket.delay(now) == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    now = bucket.updated
+    for _ in range(3):
+        bucket.take(now)
+    assert bucket.delay(now + 0.5) == 0
+    assert bucket.tokens == pytest.approx(1.0)
+    bucket.delay(now + 100)
+    assert bucket.full
+    assert bucket.tokens == 3
+
+
+def test_bucket_drain_blocks_for_retry_after():
+    bucket = TokenBucket(rate=1.0, capacity=3)
+    now = bucket.updated
+    bucket.drain(now, 5)
+    assert bucket.delay(now) == pytest.approx(6.0)
+    assert bucket.delay(now + 6.01) == 0
+
+
+class _Bot:
+    """Bot API с управляемой задержкой ответа"""
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_per_chat = 0
+        self._per_chat = {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_flight += 1
+        self._per_chat[chat_id] = self._per_chat.get(chat_id, 0) + 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.max_per_chat = max(self.max_per_chat, self._per_chat[chat_id])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+            self._per_chat[chat_id] -= 1
+        self.sent.append((chat_id, text))
+        return text
+
+
+def _sender(**kwargs) -> TelegramSender:
+    params = dict(global_rate=1000, global_burst=1000, per_chat_interval=0.001, per_chat_burst=100)
+    params.update(kwargs)
+    return TelegramSender(**params)
+
+
+def test_slow_chat_does_not_block_others():
+    async def scenario():
+        bot = _Bot(delay=0.05)
+        sender = _sender(concurrency=8)
+        await sender.start(bot)
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(sender.send(chat_id, 'hi', wait=True) for chat_id in range(8))), 1.0
+            )
+        finally:
+            await sender.stop()
+        return bot, results
+
+    bot, results = asyncio.run(scenario())
+    assert results == ['hi'] * 8
+    assert bot.max_in_flight == 8
+
+
+def test_one_send_in_flight_per_chat_in_order():
+    async def scenario():
+        bot = _Bot(delay=0.01)
+        sender = _sender(concurrency=8)
+        await sender.start(bot)
+        try:
+            await sender.send(1, 'low', priority=PRIORITY_LOW)
+            await asyncio.gather(*(sender.send(1, str(i), wait=True) for i in range(5)))
+            await sender.send(1, 'high', priority=PRIORITY_HIGH, wait=True)
+            while sender.pending:
+                await asyncio.sleep(0.01)
+        finally:
+            await sender.stop()
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert bot.max_per_chat == 1
+    texts = [text for _, text in bot.sent]
+    assert texts[:6] == ['low', '0', '1', '2', '3', '4']
+    assert texts[-1] == 'high'
+
+
+def test_concurrency_limit():
+    async def scenario():
+        bot = _Bot(delay=0.02)
+        sender = _sender(concurrency=3)
+        await sender.start(bot)
+        try:
+            await asyncio.gather(*(sender.send(chat_id, 'hi', wait=True) for chat_id in range(10)))
+        finally:
+            await sender.stop()
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert len(bot.sent) == 10
+    assert bot.max_in_flight == 3
+
+
+def test_drain_waits_for_queue_and_in_flight_sends():
+    async def scenario():
+        bot = _Bot(delay=0.05)
+        sender = _sender(per_chat_interval=0.02, per_chat_burst=1)
+        await sender.start(bot)
+        try:
+            for i in range(3):
+                await sender.send(1, str(i))
+            drained = await sender.drain(2.0)
+        finally:
+            await sender.stop()
+        return bot, drained
+
+    bot, drained = asyncio.run(scenario())
+    assert drained
+    assert [text for _, text in bot.sent] == ['0', '1', '2']
+
+
+def test_drain_timeout():
+    async def scenario():
+        bot = _Bot(delay=0.5)
+        sender = _sender()
+        await sender.start(bot)
+        try:
+            await sender.send(1, 'slow')
+            return await sender.drain(0.1)
+        finally:
+            await sender.stop()
+
+    assert not asyncio.run(scenario())
@@ -0,0 +1,69 @@
+import math
+
+import pytest
+
+from services.trigger_index import TriggerIndex
+
+MINT = 'mint-a'
+OTHER = 'mint-b'
+
+
+def _index():
+    index = TriggerIndex()
+    index.add(MINT, 1.0, 'below-1', below=True)
+    index.add(MINT, 2.0, 'below-2', below=True)
+    index.add(MINT, 3.0, 'above-3', below=False)
+    index.add(MINT, 4.0, 'above-4', below=False)
+    index.add(OTHER, 10.0, 'other', below=True)
+    return index
+
+
+def test_match_between_thresholds_triggers_nothing():
+    index = _index()
+    assert index.match(MINT, 2.5) == []
+    assert index.match('unknown', 2.5) == []
+
+
+def test_match_below_includes_threshold():
+    index = _index()
+    assert index.match(MINT, 2.0) == ['below-2']
+    assert sorted(index.match(MINT, 0.5)) == ['below-1']
+
+
+def test_match_above_includes_threshold():
+    index = _index()
+    assert index.match(MINT, 3.0) == ['above-3']
+    assert index.match(MINT, 100.0) == ['above-4']
+
+
+def test_matched_entries_are_removed():
+    index = _index()
+    assert sorted(index.match(MINT, 0.1)) == ['below-1', 'below-2']
+    assert sorted(index.match(MINT, 5.0)) == ['above-3', 'above-4']
+    assert MINT not in index
+    assert OTHER in index
+    assert len(index) == 1
+
+
+def test_same_price_different_ids():
+    index = TriggerIndex()
+    index.add(MINT, 1.0, 'b', below=False)
+    index.add(MINT, 1.0, 'a', below=False)
+    assert index.match(MINT, 1.0) == ['a', 'b']
+
+
+def test_remove():
+    index = _index()
+    index.remove(MINT, 2.0, 'below-2', below=True)
+    index.remove(MINT, 2.0, 'missing', below=True)
+    assert index.match(MINT, 0.1) == ['below-1']
+    index.remove(OTHER, 10.0, 'other', below=True)
+    assert OTHER not in index
+
+
+@pytest.mark.parametrize('price', [math.nan, math.inf, -math.inf])
+def test_add_rejects_non_finite_price(price):
+    index = TriggerIndex()
+    with pytest.raises(ValueError):
+        index.add(MINT, price, 'bad', below=True)
+    assert MINT not in index
@@ -0,0 +1,59 @@
+import base58
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from services.utils import RECORD_PREFIX, KeyRing, is_plaintext_key, key_id, parse_record
+
+OLD_KEY = Fernet.generate_key().decode()
+NEW_KEY = Fernet.generate_key().decode()
+SECRET = base58.b58encode(bytes(range(64))).decode()
+
+
+def test_encrypt_tags_record_with_current_key():
+    ring = KeyRing([NEW_KEY, OLD_KEY])
+    record = ring.encrypt(SECRET)
+    assert record.startswith(f"{RECORD_PREFIX}{key_id(NEW_KEY)}:")
+    assert parse_record(record)[0] == key_id(NEW_KEY)
+    assert ring.is_current(record)
+    assert ring.decrypt(record) == SECRET
+
+
+def test_rotation_keeps_old_records_readable():
+    old_record = KeyRing([OLD_KEY]).encrypt(SECRET)
+    ring = KeyRing([NEW_KEY, OLD_KEY])
+    assert not ring.is_current(old_record)
+    assert ring.decrypt(old_record) == SECRET
+    rotated = ring.encrypt(ring.decrypt(old_record))
+    assert ring.is_current(rotated)
+    assert KeyRing([NEW_KEY]).decrypt(rotated) == SECRET
+
+
+def test_legacy_untagged_token():
+    token = Fernet(OLD_KEY.encode()).encrypt(SECRET.encode()).decode()
+    ring = KeyRing([NEW_KEY, OLD_KEY])
+    assert parse_record(token) is None
+    assert not ring.is_current(token)
+    assert ring.decrypt(token) == SECRET
+
+
+def test_unknown_key_id_falls_back_to_all_keys():
+    token = Fernet(OLD_KEY.encode()).encrypt(SECRET.encode()).decode()
+    record = f"{RECORD_PREFIX}deadbeef:{token}"
+    assert KeyRing([NEW_KEY, OLD_KEY]).decrypt(record) == SECRET
+
+
+def test_decrypt_without_matching_key():
+    record = KeyRing([OLD_KEY]).encrypt(SECRET)
+    with pytest.raises(InvalidToken):
+        KeyRing([NEW_KEY]).decrypt(record)
+
+
+def test_keyring_requires_a_key():
+    with pytest.raises(ValueError):
+        KeyRing([])
+
+
+def test_is_plaintext_key():
+    assert is_plaintext_key(SECRET)
+    assert not is_plaintext_key(base58.b58encode(bytes(32)).decode())
+    assert not is_plaintext_key('not base58 0OIl')
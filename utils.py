@@ -4,8 +4,8 @@ import decimal
 
 from loguru import logger
 from datetime import datetime
-import sys
-from config import LOG_FILE
+from config import SOLANA_TOKEN_ADDRESSES
+from logging_setup import sampled_logger
 
 # Константы
 DEFAULT_SLIPPAGE = 1.0  # 1%
@@ -13,25 +13,44 @@ MIN_SLIPPAGE = 0.1     # 0.1%
 MAX_SLIPPAGE = 10.0    # 10%
 LAMPORTS_PER_SOL = 1_000_000_000  # 1 SOL = 10^9 lamports
 
-# Настройка логирования транзакций
-logger.remove()  # Удаляем стандартный обработчик
+TransactionType = Literal["buy", "sell", "withdraw"]
 
-# Добавляем обработчик для вывода в консоль
-logger.add(
-    sys.stderr,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
-)
+# Символы известных токенов без пробелов в верхнем регистре: (нормализованный символ, символ, адрес)
+_NORMALIZED_SYMBOLS = [
+    (symbol.replace(' ', '').upper(), symbol, address)
+    for symbol, address in SOLANA_TOKEN_ADDRESSES.items()
+]
+_EXACT_SYMBOLS = {}
+for _normalized, _symbol, _address in _NORMALIZED_SYMBOLS:
+    _EXACT_SYMBOLS.setdefault(_normalized, (_symbol, _address))
 
-# Добавляем обработчик для записи транзакций в файл
-logger.add(
-    LOG_FILE,
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {message}",
-    filter=lambda record: "transaction" in record["extra"],
-    rotation="1 day",
-    retention="30 days"
-)
 
-TransactionType = Literal["buy", "sell", "withdraw"]
+def resolve_token_symbol(token_input: str) -> Optional[Tuple[str, str]]:
+    """
+    Ищет известный токен по введенному пользователем тексту
+    
+    Сначала точное совпадение символа (без учета регистра и пробелов),
+    затем вхождение введенного текста в символ.
+    
+    Args:
+        token_input: Символ токена, введенный пользователем
+        
+    Returns:
+        Optional[Tuple[str, str]]: (символ, адрес) или None, если токен не найден
+    """
+    normalized_input = token_input.replace(' ', '').upper()
+    exact = _EXACT_SYMBOLS.get(normalized_input)
+    if exact:
+        return exact
+    for normalized, symbol, address in _NORMALIZED_SYMBOLS:
+        if normalized_input in normalized:
+            return symbol, address
+    # Совместимость со старой логикой: вхождение в символ как есть
+    upper_input = token_input.upper()
+    for _, symbol, address in _NORMALIZED_SYMBOLS:
+        if upper_input in symbol:
+            return symbol, address
+    return None
 
 def validate_slippage(slippage: Union[float, str, None] = None) -> float:
     """
@@ -90,11 +109,11 @@ def to_lamports(amount: Union[float, str, Decimal], decimals: int = 9) -> int:
         # Проверяем что значение положительное
         if value <= 0:
             # Возвращаем 0, чтобы бизнес-логика могла обработать "пыль"
-            logger.debug(f"to_lamports: amount <= 0, возвращаю 0 (amount={amount})")
+            sampled_logger.debug("to_lamports: amount <= 0, возвращаю 0 (amount={})", amount)
             return 0
         # Конвертируем в минимальные единицы
         lamports = int(value * Decimal(10 ** decimals))
-        logger.debug(f"Converted {amount} tokens to {lamports} lamports (decimals={decimals})")
+        sampled_logger.debug("Converted {} tokens to {} lamports (decimals={})", amount, lamports, decimals)
         return lamports
         
     except (ValueError, decimal.InvalidOperation) as e:
@@ -122,7 +141,7 @@ def from_lamports(lamports: int, decimals: int = 9) -> float:
         # Конвертируем в токены
         amount = Decimal(lamports) / Decimal(10 ** decimals)
         
-        logger.debug(f"Converted {lamports} lamports to {float(amount)} tokens (decimals={decimals})")
+        sampled_logger.debug("Converted {} lamports to {} tokens (decimals={})", lamports, amount, decimals)
         return float(amount)
         
     except (ValueError, decimal.InvalidOperation) as e:
@@ -171,7 +190,7 @@ def log_transaction(
         tx_type: Тип транзакции (buy/sell/withdraw)
         token: Название или адрес токена
         amount: Количество токенов
-        status: Статус транзакции (success/error)
+        status: Статус транзакции (success/error/pending)
         tx_signature: Подпись транзакции в Solana (опционально)
         error: Описание ошибки если статус error (опционально)
     """